@@ -1,5 +1,28 @@
-from .cv_data import *
+"""
+CV agent package.
 
-from .chatbot import *
+Importing the package loads nothing else: submodules (and with them Flask,
+LangChain, scikit-learn and the embedding model) are imported on first use.
+Names the package used to re-export from cv_data, chatbot and api
+(e.g. `from app import handle_recruiter_questions`) still work; their module
+is imported when the name is first looked up.
+"""
+import importlib
+import importlib.util
 
-from .api import *
\ No newline at end of file
+# Searched in this order, cheapest first
+_REEXPORTED_MODULES = ("cv_data", "chatbot", "api")
+
+
+def __getattr__(name):
+    # `from . import endpoints` asks for the attribute before importing the
+    # submodule; don't load the re-exporting modules (and Flask) to look for it
+    if name.startswith("_") or importlib.util.find_spec(f"{__name__}.{name}") is not None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    for module_name in _REEXPORTED_MODULES:
+        module = importlib.import_module(f".{module_name}", __name__)
+        if hasattr(module, name):
+            value = getattr(module, name)
+            globals()[name] = value
+            return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
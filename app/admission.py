@@ -0,0 +1,269 @@
+"""
+Admission control for the LLM-bound endpoints of a worker.
+
+Requests that need Gemini (answer-cache misses on /ask, /ask/stream and
+/ask/batch) take a slot before running. At most ADMISSION_MAX_CONCURRENCY run
+at once; the rest wait in a FIFO queue of at most ADMISSION_MAX_QUEUE for up
+to ADMISSION_MAX_WAIT_SECONDS. A request is turned away with
+AdmissionRejected (429 + Retry-After) straight away when the queue is full,
+when its client already has ADMISSION_PER_CLIENT requests admitted or
+queued, or when the expected queueing time (queue position x recent service
+time / concurrency) exceeds the maximum wait, rather than after it has
+waited in vain.
+
+A batch holds one slot per Gemini call it has in flight: it queues for the
+first like any request, then takes as many more as are free (try_acquire) up
+to its own fan-out, so it can't run more calls than the limits allow.
+
+Answer-cache hits, /health and /metrics never take a slot, so they stay fast
+while cold requests queue. Under gunicorn every admitted or queued request
+holds a worker thread, so the limits only apply if a worker has more threads
+than they allow: worker_threads() is that thread count, and
+gunicorn.conf.py uses it unless GUNICORN_THREADS is set.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Optional
+
+from .metrics import CallbackMetric, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_REJECTIONS = Counter(
+    "cv_agent_admission_rejections_total",
+    "LLM-bound requests turned away with 429, by reason",
+    ["reason"],
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "cv_agent_admission_wait_seconds",
+    "Time admitted requests spent queued for a slot",
+)
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; retry after `retry_after` seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server busy ({reason}); retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """An admitted request; release() when it is done (safe to call twice)"""
+
+    def __init__(self, controller: "AdmissionController", client: str):
+        self._controller = controller
+        self._client = client
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._client, time.monotonic() - self._started)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        max_wait: float,
+        per_client: int,
+        initial_service_seconds: float = 2.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_client = per_client
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue = deque()
+        self._clients = defaultdict(int)
+        # Exponentially weighted mean time a slot is held
+        self._service_seconds = initial_service_seconds
+
+    def _expected_wait(self, position: int) -> float:
+        return position * self._service_seconds / self.max_concurrency
+
+    def _reject(self, reason: str, retry_after: float):
+        ADMISSION_REJECTIONS.inc(reason)
+        return AdmissionRejected(reason, max(1.0, retry_after))
+
+    def acquire(self, client: str) -> Slot:
+        """
+        Wait for a slot for `client`.
+
+        Raises:
+            AdmissionRejected: if the request should be retried later instead
+        """
+        with self._cond:
+            if self.per_client > 0 and self._clients[client] >= self.per_client:
+                raise self._reject("client_limit", self._service_seconds)
+            if self._active < self.max_concurrency and not self._queue:
+                self._active += 1
+                self._clients[client] += 1
+                ADMISSION_WAIT_SECONDS.observe(0.0)
+                return Slot(self, client)
+            if len(self._queue) >= self.max_queue:
+                raise self._reject("queue_full", self._expected_wait(len(self._queue) + 1))
+            expected = self._expected_wait(len(self._queue) + 1)
+            if expected > self.max_wait:
+                raise self._reject("deadline", expected)
+
+            ticket = object()
+            self._queue.append(ticket)
+            self._clients[client] += 1
+            queued_at = time.monotonic()
+            deadline = queued_at + self.max_wait
+            while not (self._queue[0] is ticket and self._active < self.max_concurrency):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue.remove(ticket)
+                    self._drop_client(client)
+                    self._cond.notify_all()
+                    raise self._reject("timeout", self._expected_wait(len(self._queue) + 1))
+                self._cond.wait(remaining)
+            self._queue.popleft()
+            self._active += 1
+            # The next in line may be able to go too
+            self._cond.notify_all()
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - queued_at)
+        return Slot(self, client)
+
+    def try_acquire(self, client: str) -> Optional[Slot]:
+        """A slot for `client` if one is free now and nobody is queued, else None (never waits)"""
+        with self._cond:
+            if self.per_client > 0 and self._clients[client] >= self.per_client:
+                return None
+            if self._active >= self.max_concurrency or self._queue:
+                return None
+            self._active += 1
+            self._clients[client] += 1
+        ADMISSION_WAIT_SECONDS.observe(0.0)
+        return Slot(self, client)
+
+    def _drop_client(self, client: str) -> None:
+        self._clients[client] -= 1
+        if self._clients[client] <= 0:
+            del self._clients[client]
+
+    def _release(self, client: str, held_seconds: float) -> None:
+        with self._cond:
+            self._active -= 1
+            self._drop_client(client)
+            self._service_seconds += 0.2 * (held_seconds - self._service_seconds)
+            self._cond.notify_all()
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "expected_wait_seconds": round(self._expected_wait(len(self._queue) + 1), 2)
+                if self._active >= self.max_concurrency else 0.0,
+            }
+
+
+def admission_settings() -> dict:
+    return {
+        "max_concurrency": int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8")),
+        "max_queue": int(os.getenv("ADMISSION_MAX_QUEUE", "16")),
+        "max_wait": float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10")),
+        "per_client": int(os.getenv("ADMISSION_PER_CLIENT", "4")),
+    }
+
+
+def worker_threads() -> int:
+    """
+    Threads a gunicorn worker needs for admission control to take effect:
+    ADMISSION_MAX_CONCURRENCY running plus ADMISSION_MAX_QUEUE queued
+    requests, plus ADMISSION_SPARE_THREADS (default 4) left free for cache
+    hits, /health and /metrics. 1 (gunicorn's own default) when admission
+    control is off.
+    """
+    settings = admission_settings()
+    if settings["max_concurrency"] <= 0:
+        return 1
+    spare = max(1, int(os.getenv("ADMISSION_SPARE_THREADS", "4")))
+    return settings["max_concurrency"] + settings["max_queue"] + spare
+
+
+def check_worker_threads(threads: int) -> None:
+    """Warn when `threads` per worker leave the admission limits unreachable (see worker_threads())."""
+    needed = worker_threads()
+    if needed > 1 and threads < needed:
+        logger.warning(
+            "GUNICORN_THREADS=%d is below the %d threads admission control needs "
+            "(ADMISSION_MAX_CONCURRENCY + ADMISSION_MAX_QUEUE + ADMISSION_SPARE_THREADS); "
+            "requests will wait for a thread instead of queueing or getting 429",
+            threads, needed,
+        )
+
+
+def client_key(get_header: Callable[[str], Optional[str]], remote_addr: Optional[str]) -> str:
+    """
+    Who a request counts against for ADMISSION_PER_CLIENT.
+
+    In order: the value of ADMISSION_CLIENT_HEADER (e.g. an API key header);
+    the X-Forwarded-For hop appended by the outermost of
+    ADMISSION_TRUSTED_PROXIES proxies, since earlier hops are whatever the
+    client sent; then the peer address. Behind a proxy such as Heroku's router
+    the peer address is the proxy's, so without one of the settings every user
+    shares a single budget.
+    """
+    header = os.getenv("ADMISSION_CLIENT_HEADER", "").strip()
+    trusted = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "0"))
+    if header and header.lower() != "x-forwarded-for":
+        value = (get_header(header) or "").strip()
+        if value:
+            return value
+    elif header:
+        # Older configs named X-Forwarded-For here: trust the last hop only
+        trusted = max(trusted, 1)
+    if trusted > 0:
+        hops = [hop.strip() for hop in (get_header("X-Forwarded-For") or "").split(",")]
+        hops = [hop for hop in hops if hop]
+        if len(hops) >= trusted:
+            return hops[-trusted]
+    return remote_addr or "unknown"
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """The worker's controller, or None when ADMISSION_MAX_CONCURRENCY is 0 (no limit)"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                settings = admission_settings()
+                if settings["max_concurrency"] <= 0:
+                    return None
+                _controller = AdmissionController(**settings)
+    return _controller
+
+
+def _admission_gauge():
+    controller = _controller
+    if controller is None:
+        return {}
+    status = controller.status()
+    return {("active",): status["active"], ("queued",): status["queued"]}
+
+
+CallbackMetric(
+    "cv_agent_admission_requests",
+    "LLM-bound requests holding a slot (active) or waiting for one (queued)",
+    ["state"],
+    _admission_gauge,
+)
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .cv_data import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question: str) -> str:
+    question = _WHITESPACE_RE.sub(" ", question.strip().lower())
+    return _TRAILING_PUNCT_RE.sub("", question)
+
+
+def answer_cache_key(question: str, candidate_id: Optional[str] = None) -> str:
+    """Key on the normalized question, the candidate, the CV contents and the model/prompt version."""
+    from .chatbot import PROMPT_VERSION, _llm_settings, index_fingerprint
+
+    model_name, temperature, _transport, endpoint = _llm_settings()
+    parts = [
+        normalize_question(question),
+        candidate_id or "",
+        index_fingerprint(),
+        model_name,
+        str(temperature),
+        PROMPT_VERSION,
+    ]
+    if endpoint:
+        # Answers from another endpoint (e.g. the load-test stand-in) must not leak into production
+        parts.append(endpoint)
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryAnswerCache:
+    """Per-process LRU cache with a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, answer = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def set(self, key: str, answer: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self._ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteAnswerCache:
+    """LRU cache with a TTL in a SQLite file, shared by every worker on the machine."""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self._path = path
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY,"
+                " answer TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS answers_last_access ON answers (last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            return self._get(key)
+        except sqlite3.Error:
+            logger.exception("Answer cache read failed")
+            return None
+
+    def set(self, key: str, answer: str) -> None:
+        try:
+            self._set(key, answer)
+        except sqlite3.Error:
+            logger.exception("Answer cache write failed")
+
+    def _get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT answer, expires_at FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        answer, expires_at = row
+        with conn:
+            if expires_at < now:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+            conn.execute(
+                "UPDATE answers SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return answer
+
+    def _set(self, key: str, answer: str) -> None:
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, answer, now + self._ttl, now),
+            )
+            conn.execute("DELETE FROM answers WHERE expires_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                " SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM answers")
+
+
+class NullAnswerCache:
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, answer: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def build_answer_cache():
+    backend = os.getenv("ANSWER_CACHE_BACKEND", "memory").strip().lower()
+    max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+    ttl_seconds = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "21600"))
+
+    if backend in ("none", "off", "disabled"):
+        return NullAnswerCache()
+    if backend == "sqlite":
+        path = os.getenv("ANSWER_CACHE_PATH") or os.path.join(
+            get_cache_dir(), "answers.sqlite3"
+        )
+        try:
+            return SQLiteAnswerCache(path, max_entries, ttl_seconds)
+        except sqlite3.Error:
+            logger.exception(
+                "Failed to open SQLite answer cache at %s; falling back to memory", path
+            )
+    return MemoryAnswerCache(max_entries, ttl_seconds)
+
+
+def get_answer_cache():
+    global _answer_cache
+
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = build_answer_cache()
+    return _answer_cache
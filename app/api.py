@@ -1,88 +1,217 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from .chatbot import handle_recruiter_questions
-import os
+from .chatbot import (
+    handle_recruiter_questions,
+    handle_recruiter_questions_batch,
+    stream_recruiter_answer,
+    warm_up,
+)
+import json
+import time
 from dotenv import load_dotenv
 from pathlib import Path  # Add this import
-from .chatbot import FRIENDLY_API_ERROR_MESSAGE
+from . import endpoints
+from .admission import client_key
+from .metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REQUEST_SECONDS,
+    end_request,
+    render as render_metrics,
+    server_timing,
+    server_timing_enabled,
+    start_request,
+)
 
 
 env_path = Path('.') / '.env' 
 load_dotenv(dotenv_path=env_path)
 app = Flask(__name__)
-CORS(app) 
+CORS(app, expose_headers=["X-Cache", "X-Prompt-Tokens", "X-Intent", "Server-Timing", "Retry-After"])
+
+
+@app.before_request
+def _start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.stage_timings, g.stage_timings_token = start_request()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    # A stream's stages run after the headers are sent, so only buffered responses get the header
+    if server_timing_enabled() and response.mimetype != "text/event-stream":
+        response.headers["Server-Timing"] = server_timing(
+            g.stage_timings, time.perf_counter() - started
+        )
+    endpoint = request.url_rule.rule if request.url_rule is not None else "other"
+    status = str(response.status_code)
+    # Observed once the last byte is out, so streamed answers count in full
+    response.call_on_close(
+        lambda: REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, status)
+    )
+    return response
+
+
+@app.teardown_request
+def _end_request_metrics(exc):
+    token = g.pop("stage_timings_token", None)
+    if token is not None:
+        end_request(token)
+
+def _respond(reply):
+    """A Flask response for an endpoints.Reply"""
+    response = jsonify(reply.payload)
+    response.status_code = reply.status
+    response.headers.update(reply.headers)
+    return response
+
+
+def _request_data():
+    if endpoints.reads_query_string(request.method, request.args):
+        return request.args
+    return request.get_json(silent=True)
+
+
+def _client_id():
+    """Who a request counts against for ADMISSION_PER_CLIENT (see admission.client_key)"""
+    return client_key(request.headers.get, request.remote_addr)
+
+
+def _sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
 
 @app.route('/ask', methods=['GET', 'POST'])
 def ask_question():
     try:
-        api_key = os.getenv('GEMINI_API_KEY')
-        DEFAULT_PLACEHOLDER = "your-default-key-here" 
-        if not api_key or api_key == DEFAULT_PLACEHOLDER:
-            return jsonify({
-                "error": "Gemini API key not configured. Please set GEMINI_API_KEY in your .env file."
-            }), 500
-        
-        # Get question from request
-        data = request.json
-        if not data or 'question' not in data:
-            return jsonify({
-                "error": "Missing 'question' field in request body"
-            }), 400
-        
-        question = data.get('question', '').strip()
-        if not question:
-            return jsonify({
-                "error": "Question cannot be empty"
-            }), 400
-        
-        # session_id = data.get('session_id')
-        # if not session_id:
-        #     session_id = str(uuid.uuid4())
+        if endpoints.wants_event_stream(request.headers.get('Accept')):
+            return ask_question_stream()
+
+        ask, error_reply = endpoints.prepare_ask(_request_data())
+        if error_reply is not None:
+            return _respond(error_reply)
+
+        # Repeated questions are answered from the cache, skipping retrieval and the LLM
+        if ask.cached_answer is not None:
+            return _respond(endpoints.cached_reply(ask))
+
+        # Only requests that need Gemini queue for a slot; cache hits never wait
+        slot, error_reply = endpoints.admit(_client_id())
+        if error_reply is not None:
+            return _respond(error_reply)
 
         # Process the question
-        answer = handle_recruiter_questions(question=question, api_key=api_key)
-
-        # If the chatbot hit an internal error, return a friendly message
-        if answer == FRIENDLY_API_ERROR_MESSAGE:
-            return (
-                jsonify(
-                    {
-                        "answer": FRIENDLY_API_ERROR_MESSAGE,
-                        "message": FRIENDLY_API_ERROR_MESSAGE,
-                        "status": "error",
-                    }
-                ),
-                503,
+        trace = {}
+        try:
+            answer = handle_recruiter_questions(
+                question=ask.question, api_key=ask.api_key, candidate_id=ask.candidate_id,
+                trace=trace, session=ask.session,
             )
-        
-        return jsonify({
-            "answer": answer,
-            "status": "success"
-        })
-        
+        finally:
+            if slot is not None:
+                slot.release()
+        return _respond(endpoints.answer_reply(ask, answer, trace))
+
     except Exception as e:
-        return (
-            jsonify(
-                {
-                    "status": "error",
-                    "answer": FRIENDLY_API_ERROR_MESSAGE,
-                    "message": FRIENDLY_API_ERROR_MESSAGE,
-                    "error": str(e),
-                }
-            ),
-            500,
-        )
+        return _respond(endpoints.error_reply(e))
+
+
+@app.route('/ask/stream', methods=['GET', 'POST'])
+def ask_question_stream():
+    """Stream the answer as server-sent events: start, token..., then done or error"""
+    try:
+        ask, error_reply = endpoints.prepare_ask(_request_data())
+        if error_reply is not None:
+            return _respond(error_reply)
+    except Exception as e:
+        return _respond(endpoints.error_reply(e))
+
+    slot = None
+    if ask.cached_answer is None:
+        # Rejected before the stream starts, so the client still gets a 429
+        slot, error_reply = endpoints.admit(_client_id())
+        if error_reply is not None:
+            return _respond(error_reply)
+
+    def generate():
+        # Flush headers straight away so the client's time-to-first-byte
+        # doesn't include retrieval
+        yield _sse_event("start", endpoints.stream_start_event(ask))
+
+        if ask.cached_answer is not None:
+            endpoints.record_cached_turn(ask)
+            yield _sse_event("token", {"text": ask.cached_answer})
+            yield _sse_event("done", {"status": "success", "answer": ask.cached_answer})
+            return
+
+        for event, payload in stream_recruiter_answer(
+            question=ask.question, api_key=ask.api_key, candidate_id=ask.candidate_id,
+            session=ask.session,
+        ):
+            yield _sse_event(*endpoints.stream_event(ask, event, payload))
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop nginx-style proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    response.headers["X-Cache"] = "HIT" if ask.cached_answer is not None else "MISS"
+    if slot is not None:
+        # Held until the last event is sent
+        response.call_on_close(slot.release)
+    return response
+
+@app.route('/ask/batch', methods=['POST'])
+def ask_questions_batch():
+    """
+    Answer a list of questions in one request.
+    
+    Body: {"questions": ["...", ...], "candidate_id": "..."}. Results come back in
+    input order, each with its own status; the response is 200 even if some items failed.
+    """
+    try:
+        batch, error_reply = endpoints.prepare_batch(request.get_json(silent=True))
+        if error_reply is not None:
+            return _respond(error_reply)
+
+        answers = []
+        if batch.pending:
+            fan_out = endpoints.batch_fan_out(batch)
+            slots, error_reply = endpoints.admit_batch(_client_id(), fan_out)
+            if error_reply is not None:
+                return _respond(error_reply)
+            try:
+                answers = handle_recruiter_questions_batch(
+                    [question for _, question, _ in batch.pending],
+                    api_key=batch.api_key,
+                    # One Gemini call in flight per slot held
+                    max_concurrency=len(slots) or fan_out,
+                    candidate_id=batch.candidate_id,
+                )
+            finally:
+                for slot in slots:
+                    slot.release()
+        return _respond(endpoints.batch_reply(batch, answers))
+
+    except Exception as e:
+        return _respond(endpoints.error_reply(e, answer=False))
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "message": "CV RAG API is running"
-    })
+    """Health check endpoint; 503 until the index and embedding model are loaded"""
+    return _respond(endpoints.health_reply())
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of this process: per-stage and request latency histograms, counters"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
 @app.route('/')
 def home():
-    return jsonify({"message": "CV Agent API is running. Go to /ask to ask questions about Ahlam's CV", "status": "healthy"})
+    return _respond(endpoints.home_reply())
 
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,431 @@
+"""
+Async (ASGI) serving path for the CV RAG API.
+
+Serves the same endpoints as the Flask app, with the same logic
+(app/endpoints.py), but one event loop handles every in-flight request:
+retrieval and the blocking endpoint logic (index build, SQLite answer cache
+and sessions) run in a small thread pool and the Gemini call is awaited, so a
+single process can hold hundreds of concurrent /ask requests without one OS
+thread per request.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+
+from . import endpoints
+from .admission import admission_settings, client_key
+from .chatbot import (
+    ahandle_recruiter_questions,
+    ahandle_recruiter_questions_batch,
+    astream_recruiter_answer,
+    import_llm_client_in_background,
+    warm_up,
+)
+from .metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    REQUEST_SECONDS,
+    end_request,
+    render as render_metrics,
+    server_timing,
+    server_timing_enabled,
+    start_request,
+)
+
+env_path = Path('.') / '.env'
+load_dotenv(dotenv_path=env_path)
+logger = logging.getLogger(__name__)
+
+# Upper bound on Gemini calls in flight from this process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Threads for CPU-bound retrieval (TF-IDF + query embedding)
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_retrieval_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+)
+# Requests queued for an admission slot wait in these threads, off the event loop
+_admission_executor = ThreadPoolExecutor(
+    max_workers=max(1, admission_settings()["max_queue"]) + 1, thread_name_prefix="admission"
+)
+_llm_semaphore = None
+
+
+def _get_llm_semaphore():
+    # Created lazily so it belongs to the server's running loop
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+_CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", b"X-Cache, X-Prompt-Tokens, X-Intent, Server-Timing, Retry-After"),
+]
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *_CORS_HEADERS,
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _run_in_executor(executor, fn, *args):
+    """loop.run_in_executor, but `fn` sees the request's context, so its stage timings reach Server-Timing"""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+
+
+async def _blocking(fn, *args):
+    """Run endpoint logic that may block (index build, SQLite stores) on the executor"""
+    return await _run_in_executor(_retrieval_executor, fn, *args)
+
+
+def _release_slots(slots):
+    for slot in slots:
+        slot.release()
+
+
+async def _admit(scope, calls=None):
+    """
+    Take admission slots (see endpoints.admit and endpoints.admit_batch): one,
+    or up to `calls` for a batch
+
+    Returns:
+        tuple: (slots, error_reply) where slots is empty when admission control is off
+    """
+    client = client_key(lambda name: _header(scope, name.lower().encode()) or None,
+                        (scope.get("client") or [None])[0])
+
+    def admit():
+        if calls is not None:
+            return endpoints.admit_batch(client, calls)
+        slot, error_reply = endpoints.admit(client)
+        return [slot] if slot is not None else [], error_reply
+
+    future = _run_in_executor(_admission_executor, admit)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # The client went away while queued: give back whatever it is granted
+        future.add_done_callback(
+            lambda f: f.cancelled() or f.exception() or _release_slots(f.result()[0])
+        )
+        raise
+
+
+async def _send_reply(send, reply):
+    headers = [(name.lower().encode(), value.encode("latin-1")) for name, value in reply.headers.items()]
+    await _send_json(send, reply.status, reply.payload, headers=headers)
+
+
+async def _request_data(scope, receive):
+    query = {
+        key: values[0]
+        for key, values in parse_qs(scope.get("query_string", b"").decode("utf-8")).items()
+    }
+    if endpoints.reads_query_string(scope["method"], query):
+        return query
+    try:
+        return json.loads(await _read_body(receive) or b"null")
+    except ValueError:
+        return None
+
+
+async def ask_question(scope, receive, send):
+    try:
+        ask, error_reply = await _blocking(endpoints.prepare_ask, await _request_data(scope, receive))
+        if error_reply is not None:
+            await _send_reply(send, error_reply)
+            return
+
+        if ask.cached_answer is not None:
+            await _send_reply(send, await _blocking(endpoints.cached_reply, ask))
+            return
+
+        # Only requests that need Gemini queue for a slot; cache hits never wait
+        slots, error_reply = await _admit(scope)
+        if error_reply is not None:
+            await _send_reply(send, error_reply)
+            return
+
+        trace = {}
+        try:
+            answer = await ahandle_recruiter_questions(
+                question=ask.question,
+                api_key=ask.api_key,
+                llm_semaphore=_get_llm_semaphore(),
+                executor=_retrieval_executor,
+                candidate_id=ask.candidate_id,
+                trace=trace,
+                session=ask.session,
+            )
+        finally:
+            _release_slots(slots)
+        await _send_reply(send, await _blocking(endpoints.answer_reply, ask, answer, trace))
+
+    except Exception as e:
+        logger.exception("ask_question failed")
+        await _send_reply(send, endpoints.error_reply(e))
+
+
+def _sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+async def ask_question_stream(scope, receive, send):
+    try:
+        ask, error_reply = await _blocking(endpoints.prepare_ask, await _request_data(scope, receive))
+        if error_reply is not None:
+            await _send_reply(send, error_reply)
+            return
+    except Exception as e:
+        logger.exception("ask_question_stream failed")
+        await _send_reply(send, endpoints.error_reply(e))
+        return
+
+    slots = []
+    if ask.cached_answer is None:
+        # Rejected before the stream starts, so the client still gets a 429
+        slots, error_reply = await _admit(scope)
+        if error_reply is not None:
+            await _send_reply(send, error_reply)
+            return
+    try:
+        await _stream_answer(ask, send)
+    finally:
+        # Held until the last event is sent
+        _release_slots(slots)
+
+
+async def _stream_answer(ask, send):
+    """Send the start event, then the cached answer or the chatbot's stream"""
+    cache_status = b"HIT" if ask.cached_answer is not None else b"MISS"
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+            (b"x-cache", cache_status),
+            *_CORS_HEADERS,
+        ],
+    })
+
+    async def emit(event, payload, more=True):
+        await send({
+            "type": "http.response.body",
+            "body": _sse_event(event, payload),
+            "more_body": more,
+        })
+
+    await emit("start", endpoints.stream_start_event(ask))
+
+    if ask.cached_answer is not None:
+        await _blocking(endpoints.record_cached_turn, ask)
+        await emit("token", {"text": ask.cached_answer})
+        await emit("done", {"status": "success", "answer": ask.cached_answer}, more=False)
+        return
+
+    async for event, payload in astream_recruiter_answer(
+        question=ask.question,
+        api_key=ask.api_key,
+        llm_semaphore=_get_llm_semaphore(),
+        executor=_retrieval_executor,
+        candidate_id=ask.candidate_id,
+        session=ask.session,
+    ):
+        if event == "done":
+            # Writes the answer cache
+            await emit(*await _blocking(endpoints.stream_event, ask, event, payload))
+        else:
+            await emit(*endpoints.stream_event(ask, event, payload))
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def ask_questions_batch(scope, receive, send):
+    """Same request and response shape as the Flask /ask/batch endpoint"""
+    try:
+        try:
+            data = json.loads(await _read_body(receive) or b"null")
+        except ValueError:
+            data = None
+        batch, error_reply = await _blocking(endpoints.prepare_batch, data)
+        if error_reply is not None:
+            await _send_reply(send, error_reply)
+            return
+
+        answers = []
+        if batch.pending:
+            fan_out = endpoints.batch_fan_out(batch)
+            slots, error_reply = await _admit(scope, fan_out)
+            if error_reply is not None:
+                await _send_reply(send, error_reply)
+                return
+            try:
+                answers = await ahandle_recruiter_questions_batch(
+                    [question for _, question, _ in batch.pending],
+                    api_key=batch.api_key,
+                    llm_semaphore=_get_llm_semaphore(),
+                    executor=_retrieval_executor,
+                    # One Gemini call in flight per slot held
+                    max_concurrency=len(slots) or fan_out,
+                    candidate_id=batch.candidate_id,
+                )
+            finally:
+                _release_slots(slots)
+        await _send_reply(send, await _blocking(endpoints.batch_reply, batch, answers))
+
+    except Exception as e:
+        logger.exception("ask_questions_batch failed")
+        await _send_reply(send, endpoints.error_reply(e, answer=False))
+
+
+async def health_check(scope, receive, send):
+    await _send_reply(send, endpoints.health_reply())
+
+
+async def metrics(scope, receive, send):
+    body = render_metrics().encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", METRICS_CONTENT_TYPE.encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def home(scope, receive, send):
+    await _send_reply(send, endpoints.home_reply())
+
+
+_ROUTES = {
+    "/ask": (ask_question, {"GET", "POST"}),
+    "/ask/stream": (ask_question_stream, {"GET", "POST"}),
+    "/ask/batch": (ask_questions_batch, {"POST"}),
+    "/health": (health_check, {"GET"}),
+    "/metrics": (metrics, {"GET"}),
+    "/": (home, {"GET"}),
+}
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Load the index before accepting traffic
+            await asyncio.get_running_loop().run_in_executor(_retrieval_executor, warm_up)
+            import_llm_client_in_background()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _retrieval_executor.shutdown(wait=False)
+            _admission_executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    route = _ROUTES.get(scope["path"].rstrip("/") or "/")
+    if route is None:
+        await _send_json(send, 404, {"error": "Not found"})
+        return
+
+    handler, methods = route
+    if scope["method"] == "OPTIONS":
+        # CORS preflight
+        await send({
+            "type": "http.response.start",
+            "status": 204,
+            "headers": [
+                *_CORS_HEADERS,
+                (b"access-control-allow-methods", ", ".join(sorted(methods)).encode()),
+                (b"access-control-allow-headers",
+                 (_header(scope, b"access-control-request-headers") or "Content-Type").encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if scope["method"] not in methods:
+        await _send_json(send, 405, {"error": "Method not allowed"})
+        return
+
+    if handler is ask_question and endpoints.wants_event_stream(_header(scope, b"accept")):
+        handler = ask_question_stream
+    await _instrumented(handler, scope["path"].rstrip("/") or "/", scope, receive, send)
+
+
+async def _instrumented(handler, endpoint, scope, receive, send):
+    """
+    Run `handler` collecting its stage timings: a Server-Timing header on
+    buffered responses, and the request latency once the last byte is sent
+    """
+    started = time.perf_counter()
+    timings, token = start_request()
+    status = "500"
+
+    async def send_with_metrics(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = str(message["status"])
+            headers = list(message.get("headers", []))
+            streaming = (b"content-type", b"text/event-stream") in headers
+            if server_timing_enabled() and not streaming:
+                value = server_timing(timings, time.perf_counter() - started)
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_with_metrics)
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, status)
+        end_request(token)
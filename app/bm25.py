@@ -0,0 +1,233 @@
+"""
+BM25 keyword retriever over an array-backed inverted index.
+
+An alternative to TfidfRetriever for the lexical half of HybridRetriever
+(RETRIEVER_MODE=bm25 or hybrid-bm25). Postings are three flat NumPy arrays,
+like a CSR matrix stored by term: `indptr` (where each term's postings start),
+`doc_ids` and `impacts` (the precomputed BM25 score contribution of the term to
+that document). A query only reads the postings of its own terms, so its cost
+depends on how many documents contain those terms, not on the corpus size or
+the vocabulary.
+
+Term frequencies are weighted by the field a word comes from, using the chunk
+metadata from app/chunking.py: the bracketed company label, the job header
+(position), skills, and responsibility/achievement bullets, so a query naming
+a company or a skill ranks those chunks above bullets that merely mention it.
+Boosts are set with BM25_FIELD_BOOSTS, e.g. "company=2,position=2,skills=1.5".
+"""
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .metrics import stage
+from .vector_index import Hits
+
+# Same tokens as TfidfVectorizer's default pattern, so the two modes compare fairly
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")
+_LABEL = re.compile(r"^\[([^\]]*)\]\s*")
+
+_STOP_WORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been
+before being below between both but by can could did do does doing down during each
+few for from further had has have having he her here hers herself him himself his how
+i if in into is it its itself just me more most my myself no nor not now of off on
+once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+DEFAULT_FIELD_BOOSTS = {
+    "company": 2.0,
+    "position": 2.0,
+    "skills": 1.5,
+    "responsibilities": 1.0,
+    "section": 1.0,
+    "text": 1.0,
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOP_WORDS]
+
+
+def document_fields(doc: Document) -> Iterable[Tuple[str, str]]:
+    """(field, text) parts of a chunk, named as in BM25_FIELD_BOOSTS."""
+    text = doc.page_content
+    metadata = doc.metadata
+    match = _LABEL.match(text)
+    if match:
+        # "[Work experience | Omantel]": the company for job chunks, else just the section
+        yield ("company" if metadata.get("company") else "section"), match.group(1)
+        text = text[match.end():]
+
+    field = metadata.get("field")
+    if field == "role":
+        yield "position", text
+    elif field == "skills" or "skills" in str(metadata.get("section", "")):
+        yield "skills", text
+    elif field in ("responsibilities", "achievements"):
+        yield "responsibilities", text
+    else:
+        yield "text", text
+
+
+def _parse_boosts(value: str) -> Dict[str, float]:
+    boosts = dict(DEFAULT_FIELD_BOOSTS)
+    for part in value.split(","):
+        if "=" in part:
+            name, weight = part.split("=", 1)
+            boosts[name.strip().lower()] = float(weight)
+    return boosts
+
+
+def bm25_settings() -> dict:
+    """BM25 parameters from the environment."""
+    return {
+        "k1": float(os.getenv("BM25_K1", "1.2")),
+        "b": float(os.getenv("BM25_B", "0.75")),
+        "field_boosts": _parse_boosts(os.getenv("BM25_FIELD_BOOSTS", "")),
+    }
+
+
+class BM25Retriever:
+    def __init__(
+        self,
+        documents: Sequence[Document],
+        k1: float = 1.2,
+        b: float = 0.75,
+        field_boosts: Optional[Dict[str, float]] = None,
+        postings: Optional[Dict[str, np.ndarray]] = None,
+        vocabulary: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Index `documents`, or adopt `postings` and `vocabulary` from
+        postings_state() (e.g. loaded from an index snapshot).
+        """
+        self._documents = list(documents)
+        self._k1 = k1
+        self._b = b
+        self._field_boosts = dict(field_boosts or DEFAULT_FIELD_BOOSTS)
+        if postings is None or vocabulary is None:
+            vocabulary, postings = self._index(self._documents)
+        self._vocabulary = vocabulary
+        self._indptr = postings["indptr"]
+        self._doc_ids = postings["doc_ids"]
+        # Field-weighted term frequencies and document lengths; kept so a
+        # snapshot can be reloaded with different k1/b
+        self._tf = postings["tf"]
+        self._doc_len = postings["doc_len"]
+        self._impacts = self._score_postings()
+
+    def _index(self, documents: Sequence[Document]) -> Tuple[Dict[str, int], Dict[str, np.ndarray]]:
+        vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, tfs = [], [], []
+        doc_len = np.zeros(len(documents), dtype=np.float32)
+        for i, doc in enumerate(documents):
+            counts: Dict[str, float] = {}
+            length = 0
+            for field, text in document_fields(doc):
+                tokens = tokenize(text)
+                length += len(tokens)
+                boost = self._field_boosts.get(field, 1.0)
+                for token, count in Counter(tokens).items():
+                    counts[token] = counts.get(token, 0.0) + count * boost
+            doc_len[i] = length
+            term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in counts)
+            doc_ids.extend([i] * len(counts))
+            tfs.extend(counts.values())
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        # Stable, so each term's postings stay in document order
+        order = np.argsort(term_ids, kind="stable")
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=indptr[1:])
+        postings = {
+            "indptr": indptr,
+            "doc_ids": np.asarray(doc_ids, dtype=np.int32)[order],
+            "tf": np.asarray(tfs, dtype=np.float32)[order],
+            "doc_len": doc_len,
+        }
+        return vocabulary, postings
+
+    def _score_postings(self) -> np.ndarray:
+        n_docs = len(self._documents)
+        df = np.diff(self._indptr).astype(np.float64)
+        # Lucene's idf: never negative, even for terms in most documents
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        avg_len = float(self._doc_len.mean()) if n_docs else 1.0
+        norm = self._k1 * (1 - self._b + self._b * self._doc_len / max(avg_len, 1e-9))
+        tf = self._tf.astype(np.float64)
+        saturated = tf * (self._k1 + 1) / (tf + norm[self._doc_ids])
+        return (np.repeat(idf, np.diff(self._indptr)) * saturated).astype(np.float32)
+
+    @property
+    def documents(self) -> List[Document]:
+        return self._documents
+
+    @property
+    def vocabulary(self) -> Dict[str, int]:
+        return self._vocabulary
+
+    @property
+    def field_boosts(self) -> Dict[str, float]:
+        return self._field_boosts
+
+    def postings_state(self) -> Dict[str, np.ndarray]:
+        """The index arrays, to persist and pass back as `postings`."""
+        return {
+            "indptr": self._indptr,
+            "doc_ids": self._doc_ids,
+            "tf": self._tf,
+            "doc_len": self._doc_len,
+        }
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self._indptr, self._doc_ids, self._tf, self._doc_len, self._impacts))
+
+    def _score_query(self, query: str, mask: Optional[np.ndarray]) -> Hits:
+        slices = []
+        for token, count in Counter(tokenize(query)).items():
+            term = self._vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self._indptr[term], self._indptr[term + 1]
+            slices.append((start, end, count))
+        if not slices:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        ids = np.concatenate([self._doc_ids[s:e] for s, e, _ in slices])
+        weights = np.concatenate([
+            self._impacts[s:e] if count == 1 else self._impacts[s:e] * count
+            for s, e, count in slices
+        ])
+        if mask is not None:
+            keep = mask[ids]
+            ids, weights = ids[keep], weights[keep]
+        # Accumulate per document over the touched postings only
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        return unique_ids.astype(np.int64), np.bincount(inverse, weights=weights)
+
+    def search_batch(
+        self, queries: Sequence[str], k: int, rows: Optional[np.ndarray] = None
+    ) -> List[Hits]:
+        """Top-k per query, optionally only among the document indices in `rows`."""
+        with stage("bm25"):
+            mask = None
+            if rows is not None:
+                mask = np.zeros(len(self._documents), dtype=bool)
+                mask[rows] = True
+            results = []
+            for query in queries:
+                ids, scores = self._score_query(query, mask)
+                if k < ids.size:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    ids, scores = ids[top], scores[top]
+                # Best first; ties in document order
+                order = np.lexsort((ids, -scores))[:max(k, 0)]
+                results.append((ids[order], scores[order]))
+            return results
@@ -1,14 +1,40 @@
+import asyncio
+import contextlib
+import contextvars
 import json
 import os
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+import threading
+import time
 from langchain_core.documents import Document
-from langchain_core.messages import HumanMessage
-from .cv_data import load_cv_data
-from .retrieval import build_retriever
+from .chunking import NeighborIndex, chunk_cv, chunker_mode, chunker_version, neighbor_window, retrieval_k
+from .cv_data import cv_data_fingerprint, get_cv_corpus_dir, load_cv_corpus, load_cv_data
+from .embedding_cache import query_cache_stats
+from .index_snapshot import snapshot_key as index_snapshot_key
+from .metrics import ERRORS, FALLBACK_ANSWERS, INTENT_ANSWERS, CallbackMetric, stage
+from .llm_client import disable_library_retries, get_llm_client, llm_circuit_status
+from .intents import (
+    CandidateFacts,
+    CurrentJob,
+    FactsTable,
+    as_of_date,
+    get_intent_router,
+    intent_router_settings,
+    organizations,
+    skills,
+)
+from .prompt_context import context_token_budget, estimate_tokens, pack_context
+from .rerank import get_reranker, reranker_status
+from .retrieval import build_retriever, reciprocal_rank_fusion, semantic_model_name, sparse_retriever_name
+from .sessions import (
+    SESSION_RETRIEVALS,
+    follow_up_query,
+    is_follow_up,
+    record_turn,
+    refers_back,
+    render_conversation,
+    session_rows,
+)
 from dotenv import load_dotenv
 from datetime import datetime
 # from google.genai import Client, types, Chat
@@ -18,8 +44,24 @@ load_dotenv()
 
 # Global vector store (initialized once)
 _vector_store = None
+_vector_store_lock = threading.Lock()
 logger = logging.getLogger(__name__)
 
+# Seconds between checks of the CV file(s) for edits; 0 disables hot reload
+CV_RELOAD_INTERVAL_SECONDS = float(os.getenv("CV_RELOAD_INTERVAL_SECONDS", "5"))
+# How often date-dependent facts (total experience, current jobs) are recomputed
+FACTS_REFRESH_SECONDS = float(os.getenv("FACTS_REFRESH_SECONDS", "3600"))
+_last_reload_check = 0.0
+_reload_lock = threading.Lock()
+_reload_thread = None
+# Fingerprint whose reload failed, so a broken cv.json isn't re-parsed every interval
+_failed_reload_fingerprint = None
+
+# Candidate id used for the single data/cv.json (no CV_CORPUS_DIR)
+DEFAULT_CANDIDATE_ID = "default"
+# Name used in the prompt when a CV has no "name" field
+DEFAULT_CANDIDATE_NAME = os.getenv("CANDIDATE_NAME", "Ahlam Yusuf")
+
 FRIENDLY_API_ERROR_MESSAGE = (
     "Sorry due to high volumn of request the server is expirencing ✨issues✨"
 )
@@ -191,22 +233,42 @@ def calculate_total_experience(experience_list):
         return "Less than a month of experience"
 
 
-def _create_vector_store(cv_data, api_key):
+def _build_documents(cv_data, candidate_id=DEFAULT_CANDIDATE_ID):
     """
-    Create an in-memory retriever from CV data (no external embeddings).
+    Convert CV data into retrieval documents
     
     Args:
         cv_data (dict): The CV data dictionary
+        candidate_id (str): Stored in every document's metadata, so one index can hold many CVs
     Returns:
-        dict: { "documents": [...], "retriever": retriever }
+        list: LangChain Documents (see app/chunking.py; CHUNKER_MODE=legacy for one per job / section)
     """
-    # Convert CV data into documents
-    documents = []
-    
     # Add total experience summary
     total_experience_str = calculate_total_experience(cv_data.get("experience", []))
     cv_data["total_experience_summary"] = total_experience_str
 
+    if chunker_mode() == "legacy":
+        documents = _build_legacy_documents(cv_data)
+    else:
+        documents = chunk_cv(cv_data)
+    
+    for doc in documents:
+        doc.metadata["candidate_id"] = candidate_id
+    return documents
+
+
+def _build_legacy_documents(cv_data):
+    """
+    One document per job / section, plus a current employment summary
+    
+    Args:
+        cv_data (dict): The CV data dictionary
+    Returns:
+        list: LangChain Documents, one per job / section
+    """
+    # Convert CV data into documents
+    documents = []
+    
     # Extract current employment information
     current_jobs = []
     experience_list = cv_data.get("experience", [])
@@ -295,8 +357,134 @@ def _create_vector_store(cv_data, api_key):
             )
             documents.append(doc)
     
-    retriever = build_retriever(documents)
-    return {"documents": documents, "retriever": retriever}
+    return documents
+
+
+def _candidate_name(cv_data, candidate_id):
+    name = cv_data.get("name") or (cv_data.get("contact") or {}).get("name")
+    if name:
+        return name
+    if candidate_id == DEFAULT_CANDIDATE_ID:
+        return DEFAULT_CANDIDATE_NAME
+    return candidate_id.replace("_", " ").replace("-", " ").title()
+
+
+def _job_dates(job):
+    dates = job.get("dates") or {}
+    start = dates.get("start") if dates else job.get("start_date")
+    end = dates.get("end") if dates else job.get("end_date")
+    return start, end
+
+
+def _candidate_facts(candidate_id, cv_data):
+    """
+    Facts the intent router answers from (see app/intents.py)
+    
+    Args:
+        candidate_id (str): The CV's candidate id
+        cv_data (dict): The CV data dictionary
+    
+    Returns:
+        CandidateFacts: Total experience and current jobs as of today, contact details, languages, skills
+    """
+    experience = [job for job in cv_data.get("experience") or [] if isinstance(job, dict)]
+    current_jobs = []
+    for job in experience:
+        start, end = _job_dates(job)
+        if isinstance(end, str) and end.strip().lower() == "present" and job.get("company"):
+            current_jobs.append(CurrentJob(
+                position=job.get("position") or "N/A",
+                company=job["company"],
+                start=start or "N/A",
+            ))
+    contact = cv_data.get("contact") if isinstance(cv_data.get("contact"), dict) else {}
+    languages = cv_data.get("languages") or {}
+    if isinstance(languages, list):
+        languages = {str(language): "" for language in languages}
+    education = cv_data.get("education") if isinstance(cv_data.get("education"), list) else []
+    return CandidateFacts(
+        name=_candidate_name(cv_data, candidate_id),
+        total_experience=calculate_total_experience(experience),
+        current_jobs=tuple(current_jobs),
+        contact={k: str(v) for k, v in contact.items() if v and k != "name"},
+        languages={str(k): str(v) for k, v in languages.items()},
+        organizations=organizations(experience, education),
+        skills=skills(cv_data),
+        as_of=as_of_date(),
+    )
+
+
+def _load_corpus(skip_invalid=True):
+    """
+    Load the CVs to index: every file in CV_CORPUS_DIR, or just data/cv.json
+    
+    Args:
+        skip_invalid (bool): Skip corpus files that fail to load; if False, raise instead
+    
+    Returns:
+        dict: {candidate_id: cv_data}
+    """
+    if get_cv_corpus_dir() is not None:
+        return load_cv_corpus(skip_invalid=skip_invalid)
+    cv_data = load_cv_data()
+    return {DEFAULT_CANDIDATE_ID: cv_data} if cv_data else {}
+
+
+def _build_corpus_documents(corpus):
+    documents = []
+    for candidate_id, cv_data in corpus.items():
+        documents.extend(_build_documents(cv_data, candidate_id))
+    return documents
+
+
+def current_snapshot_key(fingerprint=None):
+    """
+    Index snapshot key for the current cv.json, chunking code, keyword retriever and embedding model
+    
+    Args:
+        fingerprint (str): CV fingerprint to key on, if already computed
+    
+    Returns:
+        str: Snapshot key
+    """
+    if fingerprint is None:
+        fingerprint = cv_data_fingerprint()
+    return index_snapshot_key(
+        fingerprint, chunker_version(), semantic_model_name(), sparse_retriever_name()
+    )
+
+
+def _create_vector_store(corpus, api_key, snapshot_key=None, previous=None, fingerprint=""):
+    """
+    Create one in-memory retriever over every CV in the corpus (no external embeddings).
+    
+    All candidates share one vectorizer, one embedding model and one index;
+    per-candidate retrieval uses precomputed row masks.
+    
+    Args:
+        corpus (dict): {candidate_id: cv_data}
+        snapshot_key (str): Load/save a persisted index under this key, if given
+        previous (HybridRetriever): Retriever being replaced; its embeddings are reused
+        fingerprint (str): cv_data_fingerprint() the corpus was read at
+    Returns:
+        dict: { "documents": [...], "retriever": retriever, "neighbors": NeighborIndex,
+                "candidates": {candidate_id: name}, "facts": FactsTable, "fingerprint": str }
+    """
+    with stage("index_build"):
+        documents = _build_corpus_documents(corpus)
+        retriever = build_retriever(documents, snapshot_key=snapshot_key, previous=previous)
+    candidates = {
+        candidate_id: _candidate_name(cv_data, candidate_id)
+        for candidate_id, cv_data in corpus.items()
+    }
+    return {
+        "documents": retriever.documents,
+        "retriever": retriever,
+        "neighbors": NeighborIndex(retriever.documents),
+        "candidates": candidates,
+        "facts": FactsTable(corpus, _candidate_facts, FACTS_REFRESH_SECONDS),
+        "fingerprint": fingerprint,
+    }
 
 
 def _get_or_create_vector_store(api_key):
@@ -307,58 +495,370 @@ def _get_or_create_vector_store(api_key):
         api_key (str): Google API key for embeddings
     
     Returns:
-        dict: { "documents": [...], "retriever": retriever }
+        dict: { "documents": [...], "retriever": retriever, "candidates": {...} }
     """
-    global _vector_store
+    global _vector_store, _last_reload_check
     
-    if _vector_store is None:
-        cv_data = load_cv_data()
-        if not cv_data:
-            raise ValueError("Could not load CV data")
-        _vector_store = _create_vector_store(cv_data, api_key)
+    vector_store = _vector_store
+    if vector_store is not None:
+        _maybe_schedule_reload(vector_store)
+        return vector_store
+    
+    # Concurrent first requests must not each build the index
+    with _vector_store_lock:
+        if _vector_store is None:
+            fingerprint = cv_data_fingerprint()
+            corpus = _load_corpus()
+            if not corpus:
+                raise ValueError("Could not load CV data")
+            _vector_store = _create_vector_store(
+                corpus,
+                api_key,
+                snapshot_key=current_snapshot_key(fingerprint),
+                fingerprint=fingerprint,
+            )
+            _last_reload_check = time.monotonic()
     
     return _vector_store
 
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
 
-def handle_recruiter_questions(question: str, api_key:str ) -> str:
+def _maybe_schedule_reload(vector_store):
     """
-    Handle recruiter questions about the candidate's CV using LangChain and vector search
+    Start a background rebuild if the CV file(s) changed since `vector_store` was built,
+    or if a date-dependent fact in the indexed text (total experience) has changed.
+    
+    Checked at most every CV_RELOAD_INTERVAL_SECONDS; the check itself is an
+    os.stat per file (contents are only re-hashed when mtime or size change).
+    """
+    global _last_reload_check, _reload_thread
+    
+    if CV_RELOAD_INTERVAL_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    if now - _last_reload_check < CV_RELOAD_INTERVAL_SECONDS:
+        return
+    with _reload_lock:
+        if now - _last_reload_check < CV_RELOAD_INTERVAL_SECONDS:
+            return
+        _last_reload_check = now
+        if _reload_thread is not None and _reload_thread.is_alive():
+            return
+        fingerprint = cv_data_fingerprint()
+        if fingerprint == _failed_reload_fingerprint:
+            return
+        if fingerprint == vector_store["fingerprint"]:
+            facts = vector_store["facts"]
+            facts.refresh_if_due()
+            if not facts.differs_from_index():
+                return
+            logger.info("Total experience changed with the date; re-indexing")
+        _reload_thread = threading.Thread(
+            target=_reload_vector_store,
+            args=(vector_store, fingerprint),
+            name="cv-reload",
+            daemon=True,
+        )
+        _reload_thread.start()
+
+
+def _reload_vector_store(previous, fingerprint):
+    """
+    Rebuild the vector store for the changed CV data and swap it in.
+    
+    Requests keep using `previous` until the new store is assigned; on any
+    failure, including a corpus file that no longer parses, the old index
+    stays in service.
+    """
+    global _vector_store, _failed_reload_fingerprint
+    
+    started = time.perf_counter()
+    try:
+        corpus = _load_corpus(skip_invalid=False)
+        if not corpus:
+            raise ValueError("Could not load CV data")
+        vector_store = _create_vector_store(
+            corpus,
+            None,
+            snapshot_key=current_snapshot_key(fingerprint),
+            previous=previous["retriever"],
+            fingerprint=fingerprint,
+        )
+    except Exception:
+        _failed_reload_fingerprint = fingerprint
+        ERRORS.inc("reload")
+        logger.exception("CV reload failed; keeping the current index")
+        return
+    
+    # A single reference assignment: in-flight requests hold their own reference
+    _vector_store = vector_store
+    logger.info(
+        "Reloaded CV index (%d docs) in %.0f ms",
+        len(vector_store["documents"]), (time.perf_counter() - started) * 1000,
+    )
+
+
+class UnknownCandidateError(ValueError):
+    """The request named a candidate that is not in the corpus (or none, when one is required)"""
+
+
+def resolve_candidate_id(candidate_id=None):
+    """
+    Validate a requested candidate against the loaded corpus
     
     Args:
-        question (str): The question to answer
-        api_key (str): Gemini API key
+        candidate_id (str): Requested candidate, or None
     
     Returns:
-        str: The answer to the question
+        str: The candidate id to answer about
+    
+    Raises:
+        UnknownCandidateError: If the candidate is unknown, or missing while several CVs are loaded
     """
+    candidates = _get_or_create_vector_store(None)["candidates"]
+    if candidate_id is None:
+        if len(candidates) == 1:
+            return next(iter(candidates))
+        raise UnknownCandidateError("'candidate_id' is required when several CVs are loaded")
+    if candidate_id not in candidates:
+        raise UnknownCandidateError(f"Unknown candidate_id: {candidate_id}")
+    return candidate_id
+
+
+def warm_up():
+    """
+    Build the vector store and load the embedding model ahead of the first request.
+    
+    Called from wsgi.py, so under gunicorn with preload_app it runs once in the
+    master and forked workers share the index pages copy-on-write.
+    
+    Returns:
+        bool: True if the index is ready
+    """
+    started = time.perf_counter()
     try:
-        # Get or create local retriever store
-        vector_store = _get_or_create_vector_store(api_key)
-        
-        # Initialize Gemini LLM
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            google_api_key=api_key,
-            temperature=0.7
-        )
-        
-        # Get current date
-        current_date = datetime.now().strftime("%B %d, %Y")
-        
-        retriever = vector_store["retriever"]
-        
-        # Create prompt template (combining everything in one prompt since Gemini doesn't support system messages)
-        prompt_template = """You are an AI assistant helping to answer questions about Ahlam Yusuf's professional background and CV.
+        _get_or_create_vector_store(None)
+    except Exception:
+        ERRORS.inc("warm_up")
+        logger.exception("Warm-up failed; the index will be built on first request")
+        return False
+    reranker = get_reranker()
+    if reranker is not None:
+        # Otherwise the first requests spend their rerank budget loading it
+        reranker.load()
+    logger.info("Warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
+    return True
+
+
+def _import_llm_client():
+    started = time.perf_counter()
+    try:
+        import langchain_core.output_parsers  # noqa: F401
+        import langchain_core.prompts  # noqa: F401
+        import langchain_google_genai  # noqa: F401
+    except Exception:
+        logger.exception("Background import of the Gemini client failed")
+        return
+    logger.info("Gemini client imported in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+def import_llm_client_in_background():
+    """
+    Import the Gemini client libraries on a daemon thread.
+
+    They are not needed to build the index or answer /health, so they stay out
+    of startup; this makes sure the first question doesn't pay for them either.
+    Call it in a serving process (gunicorn's post_fork, the ASGI lifespan), not
+    in the gunicorn master: a fork in the middle of an import would leave the
+    worker with held import locks, and gRPC should not be initialized before fork.
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    thread = threading.Thread(target=_import_llm_client, name="llm-client-import", daemon=True)
+    thread.start()
+    return thread
+
+
+def index_status():
+    """
+    Readiness of the retrieval index, for health checks
+    
+    Returns:
+        dict: {"ready": bool, "index_loaded": bool, "semantic_model": str, "candidates": int,
+               "reloading": bool, "query_embedding_cache": dict or None, "llm_circuit": dict}
+    """
+    vector_store = _vector_store
+    if vector_store is None:
+        return {
+            "ready": False,
+            "index_loaded": False,
+            "semantic_model": "not_loaded",
+            "candidates": 0,
+            "reloading": False,
+            "query_embedding_cache": None,
+            "llm_circuit": llm_circuit_status(),
+            "reranker": reranker_status(),
+        }
+
+    if semantic_model_name() is None:
+        semantic_state = "disabled"
+    elif vector_store["retriever"].semantic is not None:
+        semantic_state = "loaded"
+    else:
+        semantic_state = "failed"
+    return {
+        "ready": True,
+        "index_loaded": True,
+        "semantic_model": semantic_state,
+        "candidates": len(vector_store["candidates"]),
+        "reloading": _reload_thread is not None and _reload_thread.is_alive(),
+        "query_embedding_cache": query_cache_stats(),
+        "llm_circuit": llm_circuit_status(),
+        "reranker": reranker_status(),
+    }
+
+
+def _query_cache_lookups():
+    stats = query_cache_stats()
+    if stats is None:
+        return {}
+    return {("hit",): stats["hits"], ("miss",): stats["misses"]}
+
+
+def _index_documents():
+    vector_store = _vector_store
+    return {(): len(vector_store["documents"])} if vector_store is not None else {}
+
+
+# Read from the components that already keep these numbers when /metrics is scraped
+CallbackMetric(
+    "cv_agent_query_embedding_cache_lookups_total",
+    "Query embedding cache lookups by result (hit or miss)",
+    ["result"], _query_cache_lookups, type="counter",
+)
+CallbackMetric("cv_agent_index_documents", "Chunks in the serving index", [], _index_documents)
+
+
+def index_fingerprint():
+    """
+    Fingerprint of the CV data the serving index was built from
+    
+    Differs from cv_data_fingerprint() while a reload is in progress, so answers
+    from the old index are never cached under the new CV's key.
+    
+    Returns:
+        str: Hex digest
+    """
+    vector_store = _vector_store
+    if vector_store is None:
+        return cv_data_fingerprint()
+    return vector_store["fingerprint"]
+
+def _retrieve_batch(vector_store, questions, candidate_id):
+    """
+    Context documents for each question: the top retrieval_k() chunks (or the
+    RERANK_TOP_N best of them, see app/rerank.py), each followed by its
+    CHUNK_NEIGHBOR_WINDOW neighbours
+    
+    Returns:
+        list: One list of Documents per question
+    """
+    return [docs for docs, _rows in _retrieve_rows(vector_store, questions, candidate_id)]
+
+
+def _retrieve_rows(vector_store, questions, candidate_id, rows=None):
+    """
+    Like _retrieve_batch, also returning the document indices
+    
+    Args:
+        rows (list): Only search these document indices, if given
+    
+    Returns:
+        list: One (Documents, document indices) tuple per question
+    """
+    retriever = vector_store["retriever"]
+    with stage("retrieval"):
+        hits = [
+            idx.tolist()
+            for idx, _scores in retriever.search_batch(
+                questions, retrieval_k(), candidate_id=candidate_id, rows=rows
+            )
+        ]
+    return _expand_hits(vector_store, questions, hits)
+
+
+def _expand_hits(vector_store, questions, hits):
+    """Rerank each question's hits (if RERANKER is on) and add their neighbours"""
+    documents = vector_store["retriever"].documents
+    window = neighbor_window()
+    reranker = get_reranker()
+    if reranker is not None:
+        hits = reranker.rerank(questions, hits, documents)
+    results = []
+    for idx in hits:
+        expanded = vector_store["neighbors"].expand(idx, window)
+        results.append(([documents[i] for i in expanded], expanded))
+    return results
 
-    **Current Date for Reference:** {current_date}
+
+def _retrieve_in_session(vector_store, question, candidate_id, session):
+    """
+    Context documents for one question, and the document indices they came from
+    
+    A follow-up question in a session (see sessions.is_follow_up) is ranked
+    only among the chunks already retrieved for the session. One that refers
+    back but names something new (sessions.refers_back) ranks those chunks and
+    the candidate's whole index, fused. Anything else, or a follow-up none of
+    the session's chunks match, searches the whole index.
+    
+    Returns:
+        tuple: (docs, rows)
+    """
+    if session is not None:
+        reusable = session_rows(session, vector_store["fingerprint"])
+        if reusable and refers_back(session, question):
+            query = follow_up_query(session, question)
+            if is_follow_up(session, question):
+                ((docs, rows),) = _retrieve_rows(vector_store, [query], candidate_id, rows=reusable)
+                if docs:
+                    SESSION_RETRIEVALS.inc("session")
+                    return docs, rows
+            else:
+                retriever = vector_store["retriever"]
+                k = retrieval_k()
+                with stage("retrieval"):
+                    (in_session, _), = retriever.search_batch([query], k, rows=reusable)
+                    (in_index, _), = retriever.search_batch([question], k, candidate_id=candidate_id)
+                    fused, _ = reciprocal_rank_fusion([in_session, in_index], [1.0, 1.0], k)
+                SESSION_RETRIEVALS.inc("fused")
+                ((docs, rows),) = _expand_hits(vector_store, [question], [fused.tolist()])
+                return docs, rows
+        SESSION_RETRIEVALS.inc("index")
+        session["topic"] = question
+    ((docs, rows),) = _retrieve_rows(vector_store, [question], candidate_id)
+    return docs, rows
+
+
+def format_docs(docs):
+    """Join chunks without a token budget (see prompt_context.pack_context)"""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+
+# Bump whenever the prompt or retrieval settings change, so cached answers are not reused
+PROMPT_VERSION = "4"
+
+# Prompt template (combining everything in one prompt since Gemini doesn't support system messages).
+# Everything before {candidate_name} is identical on every call, so Gemini can reuse it
+# as a cached prefix; per-request values (candidate, conversation, context, date, question)
+# come last. {conversation} is empty outside a multi-turn session.
+RECRUITER_PROMPT_TEMPLATE = """You are an AI assistant helping to answer questions about a candidate's professional background and CV.
 
     **IMPORTANT INSTRUCTIONS FOR CURRENT EMPLOYMENT QUESTIONS:**
     - When asked about "where is she working now", "current employment", "where does she work", or similar questions:
-    - Look for entries marked as "CURRENT EMPLOYMENT" or jobs with "Present" in the dates
+    - Look for entries marked as "CURRENT EMPLOYMENT" or "Current job", or jobs with "Present" in the dates
     - The CV information below contains current employment details - find them and list all current positions
-    - If you see "end": "Present" or "Period: X to Present", that means it's a current position
+    - If you see "end": "Present" or "X to Present", that means it's a current position
     - List ALL current companies and positions - someone can work at multiple places simultaneously
 
     **General Instructions:**
@@ -367,7 +867,7 @@ def handle_recruiter_questions(question: str, api_key:str ) -> str:
             - Use a natural tone relevant to the topic and add a little gen z slang to make it more friendly and approachable
     - Make it professional but with a joke here and there
             - Only answer based on the information provided in the CV
-            - If the question asks for information not in the CV, respond with "I don't have that information in Ahlam's CV"
+            - If the question asks for information not in the CV, respond with "I don't have that information in <candidate name>'s CV"
             - Focus on being helpful and accurate
             - Use specific details from the CV when possible
     - Be specific about company names, positions, and dates when available
@@ -375,52 +875,702 @@ def handle_recruiter_questions(question: str, api_key:str ) -> str:
             **Example of how to handle off-topic questions (e.g., code):**
     "Wooooowww there buddy, that's out of my scope. Let's focus on the main show."
 
-    **Question:** {question}
+    **Candidate:** {candidate_name}
 
-    **Relevant CV Information:**
+    {conversation}**Relevant CV Information:**
     {context}
 
+    **Current Date for Reference:** {current_date}
+
+    **Question:** {question}
+
         **Begin your answer now:**
         """
 
-        prompt = PromptTemplate(
-            template=prompt_template,
-            input_variables=["question", "context", "current_date"]
+# Used with INTENT_REPHRASE=on: restyles a templated answer without retrieval
+REPHRASE_PROMPT_TEMPLATE = """You are an AI assistant answering a recruiter's question about {candidate_name}.
+
+    Rewrite the factual answer below in a friendly, conversational tone with a touch of gen z slang,
+    in one or two sentences. Keep every name, number and date exactly as given and add no new facts.
+
+    **Question:** {question}
+
+    **Factual answer:** {answer}
+
+    **Rewritten answer:**
+    """
+
+
+def _llm_settings():
+    """
+    Read the Gemini model settings from the environment.
+
+    Returns:
+        tuple: (model_name, temperature, transport, endpoint)
+    """
+    model_name = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash").strip()
+    temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
+    transport = os.getenv("GEMINI_TRANSPORT", "").strip() or None
+    # Another Gemini-compatible server, e.g. benchmarks/fake_gemini.py for load tests
+    endpoint = os.getenv("GEMINI_API_ENDPOINT", "").strip() or None
+    if endpoint and transport is None and endpoint.startswith("http://"):
+        # Plain HTTP can only be spoken by the REST transport
+        transport = "rest"
+    return model_name, temperature, transport, endpoint
+
+
+class RecruiterPipeline:
+    """
+    Long-lived prompt -> Gemini -> string chain.
+
+    The Gemini client (and the connection it keeps open) and the compiled prompt
+    are built once; only the prompt inputs (see _prompt_inputs) change per call.
+    LCEL runnables hold no per-call state, so one instance is safe to share
+    between request threads.
+    """
+
+    def __init__(self, api_key, model_name, temperature, transport=None, endpoint=None):
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import PromptTemplate
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        self.model_name = model_name
+        self.llm = ChatGoogleGenerativeAI(
+            model=model_name,
+            google_api_key=api_key,
+            temperature=temperature,
+            transport=transport,
+            client_options={"api_endpoint": endpoint} if endpoint else None,
         )
+        self.prompt = PromptTemplate(
+            template=RECRUITER_PROMPT_TEMPLATE,
+            input_variables=["question", "context", "current_date", "candidate_name", "conversation"]
+        )
+        # PromptTemplate renders to a single human message, which is what Gemini expects
+        self.chain = self.prompt | self.llm | StrOutputParser()
+        self.rephrase_chain = (
+            PromptTemplate(
+                template=REPHRASE_PROMPT_TEMPLATE,
+                input_variables=["question", "answer", "candidate_name"],
+            )
+            | self.llm
+            | StrOutputParser()
+        )
+        # google-generativeai has no async REST client: its async methods need gRPC
+        self._sync_only = transport == "rest"
+        # Deadline, retries, hedging and the circuit breaker live in the client
+        # (see llm_client.py), so langchain must not retry on its own as well
+        disable_library_retries()
+        self._client = get_llm_client()
+
+    def invoke(self, inputs):
+        return self._client.call(self.chain.invoke, inputs)
+
+    def stream(self, inputs):
+        return self._client.stream(self.chain.stream, inputs)
+
+    def batch(self, inputs_list, max_concurrency):
+        """Run many prompt inputs concurrently; failures come back as exceptions."""
+        return self._client.map(self.chain.invoke, inputs_list, max_concurrency)
+
+    async def ainvoke(self, inputs):
+        return await self._client.acall(self._ainvoke_once, self.chain, inputs)
+
+    def astream(self, inputs):
+        return self._client.astream(self._astream_once, inputs)
+
+    def rephrase(self, inputs):
+        return self._client.call(self.rephrase_chain.invoke, inputs)
+
+    def rephrase_batch(self, inputs_list, max_concurrency):
+        return self._client.map(self.rephrase_chain.invoke, inputs_list, max_concurrency)
+
+    async def arephrase(self, inputs):
+        return await self._client.acall(self._ainvoke_once, self.rephrase_chain, inputs)
+
+    async def _ainvoke_once(self, chain, inputs):
+        if self._sync_only:
+            return await asyncio.to_thread(chain.invoke, inputs)
+        return await chain.ainvoke(inputs)
+
+    def _astream_once(self, inputs):
+        if self._sync_only:
+            return _iterate_in_thread(self.chain.stream(inputs))
+        return self.chain.astream(inputs)
+
+
+async def _iterate_in_thread(iterator):
+    """Async iteration over a blocking iterator, each next() in a worker thread"""
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+# One pipeline per (api key, model settings) in this worker
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_recruiter_pipeline(api_key):
+    """
+    Get or create the shared pipeline for this API key and the current model settings.
+
+    Args:
+        api_key (str): Gemini API key
+
+    Returns:
+        RecruiterPipeline: The cached pipeline
+    """
+    model_name, temperature, transport, endpoint = _llm_settings()
+    key = (api_key, model_name, temperature, transport, endpoint)
+
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        with _pipelines_lock:
+            pipeline = _pipelines.get(key)
+            if pipeline is None:
+                pipeline = RecruiterPipeline(api_key, model_name, temperature, transport, endpoint)
+                _pipelines[key] = pipeline
+    return pipeline
+
+
+def _prompt_inputs(vector_store, question, docs, candidate_id, trace=None, session=None):
+    """
+    Per-call prompt variables, with the retrieved chunks packed into CONTEXT_TOKEN_BUDGET
+    
+    Args:
+        docs (list): Retrieved chunks, best first
+        trace (dict): If given, filled with the prompt size (see _prompt_report)
+        session (dict): Conversation the question belongs to, if any (see sessions.py)
+    
+    Returns:
+        dict: question, context, current_date, candidate_name and conversation for the prompt
+    """
+    with stage("context"):
+        packed = pack_context(docs, context_token_budget())
+        inputs = {
+            "question": question,
+            "context": packed.text,
+            "current_date": datetime.now().strftime("%B %d, %Y"),
+            "candidate_name": vector_store["candidates"].get(candidate_id, DEFAULT_CANDIDATE_NAME),
+            "conversation": render_conversation(session),
+        }
+        report = _prompt_report(inputs, packed)
+    logger.info(
+        "Prompt ~%d tokens (context ~%d tokens in %d chunks, %d dropped%s)",
+        report["prompt_tokens"], report["context_tokens"], report["context_chunks"],
+        report["dropped_chunks"], ", 1 truncated" if report["truncated"] else "",
+    )
+    if trace is not None:
+        trace.update(report)
+    return inputs
+
+
+def _prompt_report(inputs, packed):
+    return {
+        "prompt_tokens": estimate_tokens(RECRUITER_PROMPT_TEMPLATE.format(**inputs)),
+        "context_tokens": packed.tokens,
+        "context_chunks": len(packed.docs),
+        "dropped_chunks": packed.dropped,
+        "truncated": packed.truncated,
+        "sections": [doc.metadata.get("section") for doc in packed.docs],
+    }
+
+
+def _route_intent(vector_store, question, candidate_id, trace=None):
+    """
+    Templated answer for a structured question (see app/intents.py), or None
+    to answer with retrieval + Gemini
+    
+    Args:
+        trace (dict): If given and the question was routed, gets "intent" and "intent_confidence"
+    
+    Returns:
+        IntentAnswer: The routed answer, or None
+    """
+    router = get_intent_router()
+    if router is None:
+        return None
+    facts = vector_store["facts"].get(candidate_id)
+    if facts is None:
+        return None
+    with stage("intent"):
+        routed = router.answer(question, facts, semantic=vector_store["retriever"].semantic)
+    if routed is None:
+        return None
+    INTENT_ANSWERS.inc(routed.intent)
+    logger.info(
+        "Answered %r from the CV facts (intent %s, confidence %.2f)",
+        question, routed.intent, routed.confidence,
+    )
+    if trace is not None:
+        trace.update(intent=routed.intent, intent_confidence=routed.confidence)
+    return routed
+
+
+def _route_intents(vector_store, questions, candidate_id):
+    """_route_intent for each question (None where retrieval + Gemini must answer)"""
+    return [_route_intent(vector_store, question, candidate_id) for question in questions]
+
+
+def _rephrase_inputs(vector_store, question, routed, candidate_id):
+    return {
+        "question": question,
+        "answer": routed.text,
+        "candidate_name": vector_store["candidates"].get(candidate_id, DEFAULT_CANDIDATE_NAME),
+    }
+
+
+def _intent_reply(vector_store, question, routed, candidate_id, api_key):
+    """The templated answer, reworded by Gemini with INTENT_REPHRASE=on (falls back to the template)"""
+    if not intent_router_settings()["rephrase"]:
+        return routed.text
+    try:
+        pipeline = get_recruiter_pipeline(api_key)
+        with stage("rephrase"):
+            answer = pipeline.rephrase(_rephrase_inputs(vector_store, question, routed, candidate_id))
+    except Exception:
+        ERRORS.inc("rephrase")
+        logger.exception("Rephrasing the templated answer failed; returning it as is")
+        return routed.text
+    return answer or routed.text
+
+
+async def _aintent_reply(vector_store, question, routed, candidate_id, api_key, llm_semaphore):
+    if not intent_router_settings()["rephrase"]:
+        return routed.text
+    try:
+        pipeline = get_recruiter_pipeline(api_key)
+        async with llm_semaphore:
+            with stage("rephrase"):
+                answer = await pipeline.arephrase(
+                    _rephrase_inputs(vector_store, question, routed, candidate_id)
+                )
+    except Exception:
+        ERRORS.inc("rephrase")
+        logger.exception("Rephrasing the templated answer failed; returning it as is")
+        return routed.text
+    return answer or routed.text
+
+
+def _resolve_in_store(vector_store, candidate_id):
+    if candidate_id is None and len(vector_store["candidates"]) == 1:
+        return next(iter(vector_store["candidates"]))
+    return candidate_id
+
+
+def handle_recruiter_questions(question: str, api_key:str, candidate_id=None, trace=None, session=None) -> str:
+    """
+    Handle recruiter questions about the candidate's CV using LangChain and vector search
+    
+    Args:
+        question (str): The question to answer
+        api_key (str): Gemini API key
+        candidate_id (str): Whose CV to answer about (see resolve_candidate_id)
+        trace (dict): If given, filled with the prompt's estimated token counts,
+            or the intent for a question answered from the CV facts
+        session (dict): Conversation to continue (see sessions.open_session); the
+            question and answer are added to it
+    
+    Returns:
+        str: The answer to the question
+    """
+    try:
+        # Get or create local retriever store
+        vector_store = _get_or_create_vector_store(api_key)
+        candidate_id = _resolve_in_store(vector_store, candidate_id)
+
+        # Structured questions are answered from the CV facts, skipping retrieval and Gemini
+        routed = _route_intent(vector_store, question, candidate_id, trace)
+        if routed is not None:
+            answer = _intent_reply(vector_store, question, routed, candidate_id, api_key)
+            if session is not None:
+                record_turn(session, question, answer)
+            return answer
+
+        pipeline = get_recruiter_pipeline(api_key)
+        docs, rows = _retrieve_in_session(vector_store, question, candidate_id, session)
+        inputs = _prompt_inputs(vector_store, question, docs, candidate_id, trace, session)
+        with stage("llm"):
+            answer = pipeline.invoke(inputs)
         
-        # Create the chain using LCEL (LangChain Expression Language)
-
-        def format_prompt_input(query):
-            docs = retriever.retrieve(query, k=7)
-            context = format_docs(docs)
-            return {
-                "question": query,
-                "context": context,
-                "current_date": current_date
-            }
-        
-        # Create the chain - convert prompt to chat message, then pass to LLM
-        def invoke_llm(inputs):
-            formatted_prompt = prompt.format(**inputs)
-            message = HumanMessage(content=formatted_prompt)
-            response = llm.invoke([message])
-            # Extract content from the response
-            if hasattr(response, 'content'):
-                return response.content
-            elif hasattr(response, 'text'):
-                return response.text
-            else:
-                return str(response)
-        
-        # Create the chain
-        chain = RunnablePassthrough() | format_prompt_input | invoke_llm
-        
-        # Generate answer
-        answer = chain.invoke(question)
-        
-        return answer if answer else "I'm sorry, I do not know what you're talking about buddy."
+        answer = answer if answer else "I'm sorry, I do not know what you're talking about buddy."
+        if session is not None:
+            record_turn(session, question, answer, rows)
+        return answer
         
     except Exception:
+        ERRORS.inc("handle_recruiter_questions")
+        FALLBACK_ANSWERS.inc("ask")
         logger.exception("handle_recruiter_questions failed")
         return FRIENDLY_API_ERROR_MESSAGE
 
+
+def handle_recruiter_questions_batch(questions, api_key, max_concurrency=None, candidate_id=None):
+    """
+    Answer many questions at once: retrieval for every question is vectorized
+    (one embedding call, one TF-IDF transform) and the Gemini calls fan out
+    concurrently.
+    
+    Args:
+        questions (list): The questions to answer
+        api_key (str): Gemini API key
+        max_concurrency (int): Gemini calls in flight at once (BATCH_LLM_CONCURRENCY by default)
+        candidate_id (str): Whose CV to answer about
+    
+    Returns:
+        list: One {"answer": str, "status": "success" | "error", "prompt_tokens": int}
+        per question, in input order; questions answered from the CV facts have
+        "intent" instead of "prompt_tokens"
+    """
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+    try:
+        vector_store = _get_or_create_vector_store(api_key)
+        candidate_id = _resolve_in_store(vector_store, candidate_id)
+        routed = _route_intents(vector_store, questions, candidate_id)
+        answers = [r.text if r is not None else None for r in routed]
+        traces = [{} for _ in questions]
+
+        # Only questions the intent router didn't answer need retrieval and Gemini
+        pending = [i for i, r in enumerate(routed) if r is None]
+        if pending:
+            pipeline = get_recruiter_pipeline(api_key)
+            docs_per_question = _retrieve_batch(
+                vector_store, [questions[i] for i in pending], candidate_id
+            )
+            inputs_list = [
+                _prompt_inputs(vector_store, questions[i], docs, candidate_id, traces[i])
+                for i, docs in zip(pending, docs_per_question)
+            ]
+            with stage("llm"):
+                llm_answers = pipeline.batch(inputs_list, max_concurrency=max_concurrency)
+            for i, answer in zip(pending, llm_answers):
+                answers[i] = answer
+
+        intent_indices = [i for i, r in enumerate(routed) if r is not None]
+        if intent_indices and intent_router_settings()["rephrase"]:
+            with stage("rephrase"):
+                rephrased = get_recruiter_pipeline(api_key).rephrase_batch(
+                    [
+                        _rephrase_inputs(vector_store, questions[i], routed[i], candidate_id)
+                        for i in intent_indices
+                    ],
+                    max_concurrency=max_concurrency,
+                )
+            for i, answer in zip(intent_indices, rephrased):
+                if isinstance(answer, Exception):
+                    # The templated answer still stands
+                    ERRORS.inc("rephrase")
+                    logger.error("Rephrasing a templated answer failed: %r", answer)
+                elif answer:
+                    answers[i] = answer
+    except Exception:
+        ERRORS.inc("handle_recruiter_questions_batch")
+        FALLBACK_ANSWERS.inc("batch", amount=len(questions))
+        logger.exception("handle_recruiter_questions_batch failed")
+        return [
+            {"answer": FRIENDLY_API_ERROR_MESSAGE, "status": "error"} for _ in questions
+        ]
+
+    results = []
+    for answer, trace, routed_answer in zip(answers, traces, routed):
+        if isinstance(answer, Exception):
+            ERRORS.inc("batch_question")
+            FALLBACK_ANSWERS.inc("batch")
+            logger.error("Batch question failed: %r", answer)
+            results.append({"answer": FRIENDLY_API_ERROR_MESSAGE, "status": "error"})
+        elif routed_answer is not None:
+            results.append({"answer": answer, "status": "success", "intent": routed_answer.intent})
+        else:
+            results.append({
+                "answer": answer or "I'm sorry, I do not know what you're talking about buddy.",
+                "status": "success",
+                "prompt_tokens": trace["prompt_tokens"],
+            })
+    return results
+
+
+def _stream_summary(answer, trace, started, retrieved, first_token, finished):
+    prompt = dict(trace)
+    sections = prompt.pop("sections", [])
+    summary = {}
+    if "intent" in prompt:
+        summary["intent"] = {
+            "name": prompt.pop("intent"),
+            "confidence": prompt.pop("intent_confidence"),
+        }
+    return {
+        **summary,
+        "answer": answer,
+        "sections": sections,
+        "prompt": prompt,
+        "timings_ms": {
+            "retrieval": round((retrieved - started) * 1000, 1),
+            "first_token": round(((first_token or finished) - started) * 1000, 1),
+            "llm": round((finished - retrieved) * 1000, 1),
+            "total": round((finished - started) * 1000, 1),
+        },
+    }
+
+
+def stream_recruiter_answer(question: str, api_key: str, candidate_id=None, session=None):
+    """
+    Streaming variant of handle_recruiter_questions
+    
+    Args:
+        question (str): The question to answer
+        api_key (str): Gemini API key
+        candidate_id (str): Whose CV to answer about
+        session (dict): Conversation to continue, if any
+    
+    Yields:
+        tuple: ("token", str) for each chunk of the answer as Gemini produces it,
+        then either ("done", dict) with the full answer, retrieved sections and
+        timings in milliseconds (and the intent, for a question answered from
+        the CV facts in a single token), or ("error", FRIENDLY_API_ERROR_MESSAGE)
+    """
+    started = time.perf_counter()
+    try:
+        vector_store = _get_or_create_vector_store(api_key)
+        candidate_id = _resolve_in_store(vector_store, candidate_id)
+
+        trace = {}
+        routed = _route_intent(vector_store, question, candidate_id, trace)
+        if routed is not None:
+            routed_at = time.perf_counter()
+            answer = _intent_reply(vector_store, question, routed, candidate_id, api_key)
+            yield "token", answer
+            finished = time.perf_counter()
+            if session is not None:
+                record_turn(session, question, answer)
+            yield "done", _stream_summary(answer, trace, started, routed_at, finished, finished)
+            return
+
+        pipeline = get_recruiter_pipeline(api_key)
+        docs, rows = _retrieve_in_session(vector_store, question, candidate_id, session)
+        retrieved = time.perf_counter()
+
+        parts = []
+        first_token = None
+        inputs = _prompt_inputs(vector_store, question, docs, candidate_id, trace, session)
+        with stage("llm"):
+            for chunk in pipeline.stream(inputs):
+                if not chunk:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter()
+                parts.append(chunk)
+                yield "token", chunk
+
+        finished = time.perf_counter()
+        answer = "".join(parts)
+        if not answer:
+            answer = "I'm sorry, I do not know what you're talking about buddy."
+            yield "token", answer
+
+        if session is not None:
+            record_turn(session, question, answer, rows)
+        yield "done", _stream_summary(answer, trace, started, retrieved, first_token, finished)
+
+    except Exception:
+        ERRORS.inc("stream_recruiter_answer")
+        FALLBACK_ANSWERS.inc("stream")
+        logger.exception("stream_recruiter_answer failed")
+        yield "error", FRIENDLY_API_ERROR_MESSAGE
+
+
+def _run_in_executor(executor, fn, *args):
+    """loop.run_in_executor, but `fn` sees the caller's context (the request's stage timings)"""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+
+
+async def ahandle_recruiter_questions(question: str, api_key: str, llm_semaphore=None, executor=None, candidate_id=None, trace=None, session=None) -> str:
+    """
+    Async variant of handle_recruiter_questions for the ASGI app
+    
+    Intent routing and retrieval are CPU-bound, so they run in `executor`; the
+    Gemini call is awaited on the event loop while holding `llm_semaphore`.
+    
+    Args:
+        question (str): The question to answer
+        api_key (str): Gemini API key
+        llm_semaphore (asyncio.Semaphore): Caps concurrent Gemini calls, if given
+        executor (concurrent.futures.Executor): Executor for routing and retrieval, or the loop default
+        candidate_id (str): Whose CV to answer about
+        trace (dict): If given, filled with the prompt's estimated token counts,
+            or the intent for a question answered from the CV facts
+        session (dict): Conversation to continue, if any
+    
+    Returns:
+        str: The answer to the question
+    """
+    if llm_semaphore is None:
+        llm_semaphore = contextlib.nullcontext()
+    try:
+        vector_store = await _run_in_executor(executor, _get_or_create_vector_store, api_key)
+        candidate_id = _resolve_in_store(vector_store, candidate_id)
+        # Matching may embed the question: CPU-bound like retrieval, so off the event loop
+        routed = await _run_in_executor(
+            executor, _route_intent, vector_store, question, candidate_id, trace
+        )
+        if routed is not None:
+            answer = await _aintent_reply(
+                vector_store, question, routed, candidate_id, api_key, llm_semaphore
+            )
+            if session is not None:
+                await _run_in_executor(executor, record_turn, session, question, answer)
+            return answer
+
+        docs, rows = await _run_in_executor(
+            executor, _retrieve_in_session, vector_store, question, candidate_id, session
+        )
+        pipeline = get_recruiter_pipeline(api_key)
+
+        inputs = _prompt_inputs(vector_store, question, docs, candidate_id, trace, session)
+        async with llm_semaphore:
+            with stage("llm"):
+                answer = await pipeline.ainvoke(inputs)
+
+        answer = answer if answer else "I'm sorry, I do not know what you're talking about buddy."
+        if session is not None:
+            await _run_in_executor(executor, record_turn, session, question, answer, rows)
+        return answer
+
+    except Exception:
+        ERRORS.inc("handle_recruiter_questions")
+        FALLBACK_ANSWERS.inc("ask")
+        logger.exception("ahandle_recruiter_questions failed")
+        return FRIENDLY_API_ERROR_MESSAGE
+
+
+async def ahandle_recruiter_questions_batch(questions, api_key, llm_semaphore=None, executor=None, max_concurrency=None, candidate_id=None):
+    """
+    Async variant of handle_recruiter_questions_batch; each Gemini call also
+    holds `llm_semaphore`, so a batch shares the process-wide cap
+    """
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+    fan_out = asyncio.Semaphore(max_concurrency)
+    if llm_semaphore is None:
+        llm_semaphore = contextlib.nullcontext()
+
+    try:
+        vector_store = await _run_in_executor(executor, _get_or_create_vector_store, api_key)
+        candidate_id = _resolve_in_store(vector_store, candidate_id)
+        routed = await _run_in_executor(
+            executor, _route_intents, vector_store, questions, candidate_id
+        )
+        pending = [q for q, r in zip(questions, routed) if r is None]
+        docs_per_question = iter(
+            await _run_in_executor(
+                executor, _retrieve_batch, vector_store, pending, candidate_id
+            )
+            if pending else []
+        )
+    except Exception:
+        ERRORS.inc("handle_recruiter_questions_batch")
+        FALLBACK_ANSWERS.inc("batch", amount=len(questions))
+        logger.exception("ahandle_recruiter_questions_batch failed")
+        return [
+            {"answer": FRIENDLY_API_ERROR_MESSAGE, "status": "error"} for _ in questions
+        ]
+
+    async def answer_routed(question, routed_answer):
+        async with fan_out:
+            answer = await _aintent_reply(
+                vector_store, question, routed_answer, candidate_id, api_key, llm_semaphore
+            )
+        return {"answer": answer, "status": "success", "intent": routed_answer.intent}
+
+    async def answer_one(question, docs):
+        trace = {}
+        try:
+            pipeline = get_recruiter_pipeline(api_key)
+            inputs = _prompt_inputs(vector_store, question, docs, candidate_id, trace)
+            async with fan_out, llm_semaphore:
+                with stage("llm"):
+                    answer = await pipeline.ainvoke(inputs)
+        except Exception as e:
+            ERRORS.inc("batch_question")
+            FALLBACK_ANSWERS.inc("batch")
+            logger.error("Batch question failed: %r", e)
+            return {"answer": FRIENDLY_API_ERROR_MESSAGE, "status": "error"}
+        return {
+            "answer": answer or "I'm sorry, I do not know what you're talking about buddy.",
+            "status": "success",
+            "prompt_tokens": trace["prompt_tokens"],
+        }
+
+    return await asyncio.gather(*(
+        answer_routed(q, r) if r is not None else answer_one(q, next(docs_per_question))
+        for q, r in zip(questions, routed)
+    ))
+
+
+async def astream_recruiter_answer(question: str, api_key: str, llm_semaphore=None, executor=None, candidate_id=None, session=None):
+    """
+    Async variant of stream_recruiter_answer; yields the same events
+    """
+    started = time.perf_counter()
+    if llm_semaphore is None:
+        llm_semaphore = contextlib.nullcontext()
+    try:
+        vector_store = await _run_in_executor(executor, _get_or_create_vector_store, api_key)
+        candidate_id = _resolve_in_store(vector_store, candidate_id)
+
+        trace = {}
+        routed = await _run_in_executor(
+            executor, _route_intent, vector_store, question, candidate_id, trace
+        )
+        if routed is not None:
+            routed_at = time.perf_counter()
+            answer = await _aintent_reply(
+                vector_store, question, routed, candidate_id, api_key, llm_semaphore
+            )
+            yield "token", answer
+            finished = time.perf_counter()
+            if session is not None:
+                await _run_in_executor(executor, record_turn, session, question, answer)
+            yield "done", _stream_summary(answer, trace, started, routed_at, finished, finished)
+            return
+
+        docs, rows = await _run_in_executor(
+            executor, _retrieve_in_session, vector_store, question, candidate_id, session
+        )
+        retrieved = time.perf_counter()
+        pipeline = get_recruiter_pipeline(api_key)
+
+        parts = []
+        first_token = None
+        inputs = _prompt_inputs(vector_store, question, docs, candidate_id, trace, session)
+        async with llm_semaphore:
+            with stage("llm"):
+                async for chunk in pipeline.astream(inputs):
+                    if not chunk:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    parts.append(chunk)
+                    yield "token", chunk
+
+        finished = time.perf_counter()
+        answer = "".join(parts)
+        if not answer:
+            answer = "I'm sorry, I do not know what you're talking about buddy."
+            yield "token", answer
+
+        if session is not None:
+            await _run_in_executor(executor, record_turn, session, question, answer, rows)
+        yield "done", _stream_summary(answer, trace, started, retrieved, first_token, finished)
+
+    except Exception:
+        ERRORS.inc("stream_recruiter_answer")
+        FALLBACK_ANSWERS.inc("stream")
+        logger.exception("astream_recruiter_answer failed")
+        yield "error", FRIENDLY_API_ERROR_MESSAGE
@@ -0,0 +1,252 @@
+"""
+Fine-grained chunking of a CV into retrieval documents.
+
+Every job becomes a header chunk (position, company, dates, location) plus one
+chunk per responsibility/achievement bullet and one for its skills. Other
+sections are split by field or by list item, and short lists stay together
+as one line. Each chunk starts with a short bracketed label
+("[Work experience | Omantel] ...") so it still reads correctly on its own in the
+prompt, and carries parent metadata:
+
+    section, parent_id, position (order within the parent), company, is_current
+
+Duplicate text (after whitespace/case normalization) under the same parent is
+indexed once; the same bullet under two employers is kept for each, since its
+label says where it applies.
+NeighborIndex expands a retrieved chunk to the chunks next to it under the
+same parent.
+
+CHUNKER_MODE=legacy keeps the original one-document-per-job/section layout.
+"""
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Bump whenever the chunk layout (here or the legacy builder in chatbot.py)
+# changes, so persisted index snapshots are rebuilt
+CHUNKER_VERSION = "4"
+
+# Lists/dicts whose items are all at most this long are kept as one chunk
+_SHORT_ITEM_CHARS = 80
+# Free-text fields are split into sentence groups of about this size
+_MAX_TEXT_CHARS = 400
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+
+
+def chunker_mode() -> str:
+    """`fine` (default) or `legacy`, from CHUNKER_MODE."""
+    mode = os.getenv("CHUNKER_MODE", "fine").strip().lower()
+    return "legacy" if mode == "legacy" else "fine"
+
+
+def chunker_version() -> str:
+    """Chunker version plus mode, for snapshot keys."""
+    return f"{CHUNKER_VERSION}-{chunker_mode()}"
+
+
+def retrieval_k() -> int:
+    """Chunks retrieved per question: RETRIEVAL_K, or a per-mode default."""
+    value = os.getenv("RETRIEVAL_K")
+    if value:
+        return int(value)
+    # Fine chunks are a fraction of a legacy document, so more of them fit the same budget
+    return 7 if chunker_mode() == "legacy" else 12
+
+
+def neighbor_window() -> int:
+    """Chunks added on each side of a hit (same parent): CHUNK_NEIGHBOR_WINDOW, default 0."""
+    return int(os.getenv("CHUNK_NEIGHBOR_WINDOW", "0"))
+
+
+def _label(section: str) -> str:
+    return section.replace("_", " ").strip().capitalize()
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _is_present(value) -> bool:
+    return isinstance(value, str) and value.strip().lower() == "present"
+
+
+def _split_text(text: str) -> List[str]:
+    """Sentence groups of at most ~_MAX_TEXT_CHARS characters."""
+    text = " ".join(text.split())
+    if len(text) <= _MAX_TEXT_CHARS:
+        return [text] if text else []
+    parts, current = [], ""
+    for sentence in _SENTENCE_END.split(text):
+        if current and len(current) + 1 + len(sentence) > _MAX_TEXT_CHARS:
+            parts.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _render_value(value) -> str:
+    if isinstance(value, dict):
+        return "; ".join(f"{_label(str(k))}: {_render_value(v)}" for k, v in value.items() if v)
+    if isinstance(value, list):
+        return ", ".join(_render_value(v) for v in value if v)
+    return str(value).strip()
+
+
+def _job_dates(job: dict) -> Tuple[str, str]:
+    dates = job.get("dates") or {}
+    start = dates.get("start") if dates else job.get("start_date")
+    end = dates.get("end") if dates else job.get("end_date")
+    return start or "N/A", end or "N/A"
+
+
+def _experience_chunks(jobs: Sequence[dict]) -> Iterable[Tuple[str, str, dict]]:
+    for idx, job in enumerate(jobs):
+        company = job.get("company", "") or "N/A"
+        position = job.get("position", "") or "N/A"
+        start, end = _job_dates(job)
+        is_current = _is_present(end)
+        parent = {
+            "section": "experience",
+            "parent_id": f"experience/{idx}",
+            "company": job.get("company", ""),
+            "is_current": is_current,
+        }
+        label = f"[Work experience | {company}]"
+
+        header = f"{label} {position}, {start} to {end}"
+        if job.get("location"):
+            header += f", {job['location']}"
+        # Stands in for the legacy "current employment" summary document
+        header += ". Current job." if is_current else "."
+        yield header, f"{position} {company} {start} {end}", {**parent, "field": "role"}
+
+        # Back-compat: some older CV schemas used `achievements` per job.
+        for field in ("achievements", "responsibilities"):
+            for bullet in job.get(field) or []:
+                yield f"{label} {bullet}", bullet, {**parent, "field": field}
+
+        skills = job.get("skills") or []
+        if skills:
+            text = ", ".join(skills)
+            yield f"{label} Skills used: {text}", text, {**parent, "field": "skills"}
+
+
+def _section_chunks(section: str, content) -> Iterable[Tuple[str, str, dict]]:
+    parent = {"section": section, "parent_id": section}
+    label = f"[{_label(section)}]"
+
+    if isinstance(content, list) and all(isinstance(item, dict) for item in content):
+        # e.g. education: one chunk per entry
+        for item in content:
+            body = _render_value(item)
+            yield f"{label} {body}", body, dict(parent)
+    elif isinstance(content, (list, dict)):
+        items = list(content.items()) if isinstance(content, dict) else list(enumerate(content))
+        rendered = [
+            (key, _render_value(value)) for key, value in items if _render_value(value)
+        ]
+        if not rendered:
+            return
+        if all(len(text) <= _SHORT_ITEM_CHARS for _, text in rendered):
+            if isinstance(content, dict):
+                body = "; ".join(f"{_label(str(key))}: {text}" for key, text in rendered)
+            else:
+                body = ", ".join(text for _, text in rendered)
+            yield f"{label} {body}", body, dict(parent)
+        else:
+            for key, text in rendered:
+                field_label = label if isinstance(key, int) else f"[{_label(section)} | {_label(key)}]"
+                yield f"{field_label} {text}", text, {**parent, "field": str(key)}
+    else:
+        for part in _split_text(str(content)):
+            yield f"{label} {part}", part, dict(parent)
+
+
+def chunk_cv(cv_data: dict) -> List[Document]:
+    """
+    Split a CV into small documents with parent metadata, dropping text repeated under one parent.
+
+    Args:
+        cv_data (dict): The CV data dictionary
+    Returns:
+        list: LangChain Documents in CV order
+    """
+    documents: List[Document] = []
+    seen = set()
+    positions: Dict[str, int] = {}
+
+    for section, content in cv_data.items():
+        if content in (None, "", [], {}):
+            continue
+        if section == "experience" and isinstance(content, list):
+            chunks = _experience_chunks(content)
+        else:
+            chunks = _section_chunks(section, content)
+
+        for text, body, metadata in chunks:
+            key = (metadata["parent_id"], _normalize(body))
+            if not key[1] or key in seen:
+                continue
+            seen.add(key)
+            parent_id = metadata["parent_id"]
+            metadata["position"] = positions.get(parent_id, 0)
+            positions[parent_id] = metadata["position"] + 1
+            documents.append(Document(page_content=text, metadata=metadata))
+
+    return documents
+
+
+class NeighborIndex:
+    """
+    Expands retrieved chunks to their neighbours under the same parent
+    (the bullets either side of a hit, within one job or section).
+    """
+
+    def __init__(self, documents: Sequence[Document]):
+        siblings: Dict[str, List[Tuple[int, int]]] = {}
+        for i, doc in enumerate(documents):
+            parent_id = doc.metadata.get("parent_id")
+            if parent_id is None:
+                continue
+            key = f"{doc.metadata.get('candidate_id', '')}\x1f{parent_id}"
+            siblings.setdefault(key, []).append((doc.metadata.get("position", 0), i))
+
+        # For each document: its parent's document indices in position order, and its slot there
+        self._parent_rows: List[Optional[np.ndarray]] = [None] * len(documents)
+        self._slot = np.zeros(len(documents), dtype=np.int64)
+        for members in siblings.values():
+            members.sort()
+            rows = np.asarray([i for _, i in members], dtype=np.int64)
+            for slot, i in enumerate(rows):
+                self._parent_rows[i] = rows
+                self._slot[i] = slot
+
+    def expand(self, indices: Sequence[int], window: int) -> List[int]:
+        """
+        Each hit followed by its neighbours in document order, without repeats.
+
+        Hits keep their rank order; a neighbour that is also a later hit is
+        emitted once, next to the first hit that pulled it in.
+        """
+        if window <= 0:
+            return list(indices)
+        out, seen = [], set()
+        for i in indices:
+            rows = self._parent_rows[i]
+            if rows is None:
+                group = [i]
+            else:
+                slot = self._slot[i]
+                group = rows[max(0, slot - window): slot + window + 1].tolist()
+            for j in group:
+                if j not in seen:
+                    seen.add(j)
+                    out.append(j)
+        return out
@@ -1,4 +1,5 @@
 # cv_data.py
+import hashlib
 import json
 import os
 import logging
@@ -7,6 +8,122 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# path -> (mtime_ns, size, sha256) of CV files
+_fingerprint_cache = {}
+
+
+def get_cv_path():
+    """
+    Absolute path of the CV JSON file
+    
+    Returns:
+        str: Path to data/cv.json
+    """
+    return os.path.join(_PROJECT_ROOT, 'data', 'cv.json')
+
+
+def get_cache_dir():
+    """
+    Directory for local caches shared by all workers on this machine
+    
+    Returns:
+        str: CV_AGENT_CACHE_DIR if set, otherwise <project>/.cache
+    """
+    cache_dir = os.getenv('CV_AGENT_CACHE_DIR') or os.path.join(_PROJECT_ROOT, '.cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_cv_corpus_dir():
+    """
+    Directory of CV JSON files for multi-candidate (corpus) mode
+    
+    Returns:
+        str: CV_CORPUS_DIR if set, otherwise None (single data/cv.json)
+    """
+    corpus_dir = os.getenv('CV_CORPUS_DIR', '').strip()
+    return os.path.abspath(corpus_dir) if corpus_dir else None
+
+
+def _list_corpus_files(corpus_dir):
+    return sorted(
+        os.path.join(corpus_dir, name)
+        for name in os.listdir(corpus_dir)
+        if name.endswith('.json')
+    )
+
+
+def _file_digest(path):
+    """SHA-256 of a file, re-hashed only when its mtime or size changes"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    
+    cached = _fingerprint_cache.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _fingerprint_cache[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def cv_data_fingerprint():
+    """
+    SHA-256 of the CV contents: data/cv.json, or every file in the corpus directory
+    
+    Returns:
+        str: Hex digest, or an empty string if there is no CV data
+    """
+    corpus_dir = get_cv_corpus_dir()
+    if corpus_dir is None:
+        return _file_digest(get_cv_path())
+    
+    try:
+        paths = _list_corpus_files(corpus_dir)
+    except OSError:
+        return ""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(path).encode('utf-8'))
+        h.update(_file_digest(path).encode('ascii'))
+    return h.hexdigest()
+
+
+def load_cv_corpus(skip_invalid=True):
+    """
+    Load every CV in CV_CORPUS_DIR, keyed by candidate id (the file name without .json)
+    
+    Args:
+        skip_invalid (bool): Skip files that fail to load; if False, raise instead
+            (a reload must not silently drop a candidate whose file is mid-edit)
+    
+    Returns:
+        dict: {candidate_id: cv_data}
+    """
+    corpus_dir = get_cv_corpus_dir()
+    if corpus_dir is None or not os.path.isdir(corpus_dir):
+        logger.error(f"CV corpus directory not found: {corpus_dir}")
+        return {}
+    
+    corpus = {}
+    for path in _list_corpus_files(corpus_dir):
+        candidate_id = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                corpus[candidate_id] = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            if not skip_invalid:
+                raise ValueError(f"Could not load CV {path}: {str(e)}") from e
+            logger.error(f"Skipping CV {path}: {str(e)}")
+    
+    logger.info(f"Loaded {len(corpus)} CVs from {corpus_dir}")
+    return corpus
+
+
 def load_cv_data():
     """
     Load CV data from the JSON file
@@ -15,12 +132,7 @@ def load_cv_data():
         dict: CV data if successful, empty dict if failed
     """
     try:
-        # Use a relative path to locate cv.json
-        current_dir = os.path.dirname(__file__)  # Get the directory of the current file
-        cv_path = os.path.join(current_dir, '..', 'data', 'cv.json')  # Go up one level and into the data folder
-        
-        # Convert to absolute path for better error reporting
-        cv_path = os.path.abspath(cv_path)
+        cv_path = get_cv_path()
         
         if not os.path.exists(cv_path):
             logger.error(f"CV file not found at path: {cv_path}")
@@ -0,0 +1,225 @@
+"""
+LRU cache of query embeddings, so repeated questions skip the transformer.
+
+Keys are the normalized question text (case, whitespace and trailing
+punctuation folded, as for the answer cache); the normalized text is also
+what gets encoded, so a cached vector doesn't depend on which variant of a
+question was seen first. The cache belongs to one embedding model and is
+emptied when SEMANTIC_MODEL_NAME changes.
+
+With QUERY_EMBEDDING_CACHE_PERSIST=on it is saved to an .npz file (at exit
+and every few dozen new entries) and loaded again at startup, unless the
+file was written for a different model.
+"""
+import atexit
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .answer_cache import normalize_question
+from .cv_data import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Save to disk after this many new entries (when persistence is on)
+_SAVE_EVERY = 64
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of normalized query text -> float32 embedding, for one model."""
+
+    def __init__(self, model_name: str, max_entries: int, path: Optional[str] = None):
+        self._model_name = model_name
+        self._max_entries = max_entries
+        self._path = path
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._unsaved = 0
+        if path:
+            self._load()
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    def encode(self, model, queries: Sequence[str]) -> np.ndarray:
+        """
+        Normalized embeddings for `queries`, encoding only those not cached.
+
+        Args:
+            model: SentenceTransformer used for cache misses
+            queries: Raw query texts
+        Returns:
+            np.ndarray: float32 (len(queries), dim) matrix
+        """
+        keys = [normalize_question(q) for q in queries]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, None] = {}
+        with self._lock:
+            for key in keys:
+                if key in missing:
+                    self._misses += 1
+                    continue
+                vec = found.get(key)
+                if vec is None:
+                    vec = self._entries.get(key)
+                if vec is None:
+                    missing[key] = None
+                    self._misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = vec
+                self._hits += 1
+
+        if missing:
+            texts = list(missing)
+            # One encode call for every miss in the batch
+            encoded = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+            encoded = np.asarray(encoded, dtype=np.float32)
+            for key, vec in zip(texts, encoded):
+                found[key] = vec
+            self._store(texts, encoded)
+
+        return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+    def _store(self, keys: Sequence[str], vecs: np.ndarray) -> None:
+        save = False
+        with self._lock:
+            for key, vec in zip(keys, vecs):
+                self._entries[key] = vec
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += len(keys)
+            if self._path and self._unsaved >= _SAVE_EVERY:
+                save = True
+        if save:
+            self.save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "persistent": bool(self._path),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = 0
+
+    def save(self) -> None:
+        """Write the cache atomically to its file; no-op without persistence."""
+        if not self._path:
+            return
+        with self._lock:
+            if not self._entries:
+                return
+            keys = np.asarray(list(self._entries), dtype=np.str_)
+            vecs = np.stack(list(self._entries.values())).astype(np.float32, copy=False)
+            self._unsaved = 0
+        try:
+            directory = os.path.dirname(self._path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".query_embeddings.", suffix=".npz", dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez(f, model_name=np.asarray(self._model_name), keys=keys, vecs=vecs)
+                os.replace(tmp_path, self._path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception:
+            logger.exception("Failed to save query embedding cache to %s", self._path)
+
+    def _load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        try:
+            with np.load(self._path, allow_pickle=False) as data:
+                stored_model = str(data["model_name"])
+                if stored_model != self._model_name:
+                    logger.info(
+                        "Ignoring query embedding cache for model %s (now %s)",
+                        stored_model, self._model_name,
+                    )
+                    return
+                keys, vecs = data["keys"], data["vecs"]
+        except Exception:
+            logger.exception("Failed to load query embedding cache from %s", self._path)
+            return
+        # Most recently used entries were saved last
+        for key, vec in list(zip(keys.tolist(), vecs))[-self._max_entries:]:
+            self._entries[key] = vec
+        logger.info("Loaded %d cached query embeddings from %s", len(self._entries), self._path)
+
+
+def query_cache_settings() -> dict:
+    """Size and persistence of the query embedding cache, from the environment."""
+    persist = os.getenv("QUERY_EMBEDDING_CACHE_PERSIST", "off").strip().lower() in (
+        "1", "on", "true", "yes",
+    )
+    path = None
+    if persist:
+        path = os.getenv("QUERY_EMBEDDING_CACHE_PATH") or os.path.join(
+            get_cache_dir(), "query_embeddings.npz"
+        )
+    return {
+        "max_entries": int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048")),
+        "path": path,
+    }
+
+
+_query_cache: Optional[QueryEmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache(model_name: str) -> Optional[QueryEmbeddingCache]:
+    """
+    The process-wide cache for `model_name`, or None when
+    QUERY_EMBEDDING_CACHE_SIZE is 0. A different model replaces the cache.
+    """
+    global _query_cache
+
+    cache = _query_cache
+    if cache is not None and cache.model_name == model_name:
+        return cache
+    with _query_cache_lock:
+        cache = _query_cache
+        if cache is None or cache.model_name != model_name:
+            settings = query_cache_settings()
+            if settings["max_entries"] <= 0:
+                return None
+            if cache is not None:
+                logger.info(
+                    "Embedding model changed from %s to %s; dropping cached query embeddings",
+                    cache.model_name, model_name,
+                )
+            cache = QueryEmbeddingCache(model_name, **settings)
+            _query_cache = cache
+    return cache
+
+
+def query_cache_stats() -> Optional[dict]:
+    """Hit/miss counters of the current cache, or None before the first semantic query."""
+    cache = _query_cache
+    return cache.stats() if cache is not None else None
+
+
+@atexit.register
+def _save_on_exit() -> None:
+    cache = _query_cache
+    if cache is not None:
+        cache.save()
@@ -0,0 +1,379 @@
+"""
+Endpoint logic shared by the Flask app (api.py) and the ASGI app (asgi_api.py).
+
+The functions here take plain request data (the JSON body, or the query
+string of a GET) and return a Reply, or the parsed request to carry on with,
+so each front end only translates HTTP in and out and calls Gemini its own
+way (blocking or awaited). They may block on the index build, the SQLite
+answer cache and session store, and the admission queue: the ASGI app runs
+them in an executor, never on its event loop.
+"""
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .admission import AdmissionRejected, get_admission_controller
+from .answer_cache import answer_cache_key, get_answer_cache
+from .chatbot import (
+    FRIENDLY_API_ERROR_MESSAGE,
+    UnknownCandidateError,
+    index_fingerprint,
+    index_status,
+    resolve_candidate_id,
+)
+from .llm_client import llm_retry_after
+from .metrics import ANSWER_CACHE_LOOKUPS
+from .sessions import has_history, open_session, record_turn
+
+BUSY_MESSAGE = "The assistant is busy right now. Please try again in a few seconds."
+DEFAULT_PLACEHOLDER = "your-default-key-here"
+
+
+@dataclass
+class Reply:
+    """A JSON response: status code, body and extra headers"""
+    status: int
+    payload: dict
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class AskRequest:
+    """A validated /ask or /ask/stream request and its answer-cache lookup"""
+    api_key: str
+    question: str
+    candidate_id: Optional[str]
+    session: Optional[dict]
+    use_cache: bool
+    cache_key: str
+    cached_answer: Optional[str]
+
+    def session_fields(self) -> dict:
+        return {"session_id": self.session["session_id"]} if self.session is not None else {}
+
+
+@dataclass
+class BatchRequest:
+    """A validated /ask/batch request: results so far and the questions still needing Gemini"""
+    api_key: str
+    candidate_id: Optional[str]
+    results: List[Optional[dict]]
+    # (index, question, cache_key)
+    pending: List[Tuple[int, str, str]]
+
+
+def get_api_key():
+    """
+    Returns:
+        tuple: (api_key, error_reply) where error_reply is None when a key is configured
+    """
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key or api_key == DEFAULT_PLACEHOLDER:
+        return None, Reply(500, {
+            "error": "Gemini API key not configured. Please set GEMINI_API_KEY in your .env file."
+        })
+    return api_key, None
+
+
+def reads_query_string(method: str, query) -> bool:
+    """A GET with a question (e.g. from an EventSource) carries its fields in the query string, not a JSON body"""
+    return method == 'GET' and 'question' in query
+
+
+def resolve_candidate(data):
+    """
+    Returns:
+        tuple: (candidate_id, error_reply) where error_reply is None when the
+        requested candidate (or the only one loaded) exists
+    """
+    candidate_id = data.get('candidate_id') if data else None
+    try:
+        return resolve_candidate_id(candidate_id or None), None
+    except UnknownCandidateError as e:
+        return None, Reply(400, {"error": str(e)})
+
+
+def prepare_ask(data):
+    """
+    Validate an /ask request, open its session and look its answer up in the cache
+
+    Returns:
+        tuple: (ask_request, error_reply) where error_reply is None when the request is valid
+    """
+    api_key, error_reply = get_api_key()
+    if error_reply is not None:
+        return None, error_reply
+
+    if not hasattr(data, 'get') or 'question' not in data:
+        return None, Reply(400, {"error": "Missing 'question' field in request body"})
+    question = (data.get('question') or '').strip()
+    if not question:
+        return None, Reply(400, {"error": "Question cannot be empty"})
+
+    candidate_id, error_reply = resolve_candidate(data)
+    if error_reply is not None:
+        return None, error_reply
+
+    session = None
+    if 'session_id' in data:
+        session = open_session(data.get('session_id') or None, candidate_id, index_fingerprint())
+
+    # Later turns of a conversation depend on what came before, so they skip the cache
+    use_cache = not has_history(session)
+    cache_key = answer_cache_key(question, candidate_id)
+    cached_answer = get_answer_cache().get(cache_key) if use_cache else None
+    if use_cache:
+        ANSWER_CACHE_LOOKUPS.inc("hit" if cached_answer is not None else "miss")
+    return AskRequest(
+        api_key, question, candidate_id, session, use_cache, cache_key, cached_answer
+    ), None
+
+
+def cached_reply(ask: AskRequest) -> Reply:
+    """Answer from the cache (recording the turn in the session)"""
+    record_cached_turn(ask)
+    return Reply(200, {
+        "answer": ask.cached_answer,
+        "status": "success",
+        **ask.session_fields(),
+    }, {"X-Cache": "HIT"})
+
+
+def record_cached_turn(ask: AskRequest) -> None:
+    if ask.session is not None:
+        record_turn(ask.session, ask.question, ask.cached_answer)
+
+
+def busy_reply(e: AdmissionRejected) -> Reply:
+    return Reply(429, {
+        "status": "error",
+        "answer": BUSY_MESSAGE,
+        "message": BUSY_MESSAGE,
+        "error": str(e),
+    }, {"Retry-After": str(math.ceil(e.retry_after))})
+
+
+def admit(client: str):
+    """
+    Take an admission slot before calling Gemini (see admission.py)
+
+    Returns:
+        tuple: (slot, error_reply) where slot is None when admission control is
+        off, and error_reply is a 429 with Retry-After when the request is not admitted
+    """
+    controller = get_admission_controller()
+    if controller is None:
+        return None, None
+    try:
+        return controller.acquire(client), None
+    except AdmissionRejected as e:
+        return None, busy_reply(e)
+
+
+def admit_batch(client: str, calls: int):
+    """
+    Take a slot for each of up to `calls` concurrent Gemini calls of a batch
+
+    Queues for the first slot like admit(), then takes only the slots that are
+    free straight away, so a batch never runs more calls than it holds slots.
+
+    Returns:
+        tuple: (slots, error_reply) where slots is empty when admission control is off
+    """
+    slot, error_reply = admit(client)
+    if slot is None:
+        return [], error_reply
+    slots = [slot]
+    controller = get_admission_controller()
+    while len(slots) < calls:
+        extra = controller.try_acquire(client)
+        if extra is None:
+            break
+        slots.append(extra)
+    return slots, None
+
+
+def batch_fan_out(batch: BatchRequest) -> int:
+    """Gemini calls a batch would like in flight at once"""
+    return min(len(batch.pending), int(os.getenv('BATCH_LLM_CONCURRENCY', '8')))
+
+
+def _unavailable_reply() -> Reply:
+    # While the Gemini circuit is open, tell clients when to come back
+    retry_after = llm_retry_after()
+    return Reply(503, {
+        "answer": FRIENDLY_API_ERROR_MESSAGE,
+        "message": FRIENDLY_API_ERROR_MESSAGE,
+        "status": "error",
+    }, {} if retry_after is None else {"Retry-After": str(math.ceil(retry_after))})
+
+
+def answer_reply(ask: AskRequest, answer: str, trace: dict) -> Reply:
+    """The /ask response for a fresh answer, caching it when it can be reused"""
+    # If the chatbot hit an internal error, return a friendly message
+    if answer == FRIENDLY_API_ERROR_MESSAGE:
+        return _unavailable_reply()
+
+    # Templated answers are cheap and date-dependent (total experience), so not cached
+    if "intent" not in trace and ask.use_cache:
+        get_answer_cache().set(ask.cache_key, answer)
+    headers = {"X-Cache": "MISS"}
+    if "prompt_tokens" in trace:
+        headers["X-Prompt-Tokens"] = str(trace["prompt_tokens"])
+    if "intent" in trace:
+        headers["X-Intent"] = trace["intent"]
+    return Reply(200, {"answer": answer, "status": "success", **ask.session_fields()}, headers)
+
+
+def error_reply(e: Exception, answer: bool = True) -> Reply:
+    """500 for an unexpected error; `answer` adds the friendly message as the answer, as /ask does"""
+    payload = {"status": "error"}
+    if answer:
+        payload["answer"] = FRIENDLY_API_ERROR_MESSAGE
+    payload["message"] = FRIENDLY_API_ERROR_MESSAGE
+    payload["error"] = str(e)
+    return Reply(500, payload)
+
+
+def wants_event_stream(accept: Optional[str]) -> bool:
+    """Whether the client's preferred type in an Accept header is text/event-stream"""
+    return best_mimetype(accept or '') == 'text/event-stream'
+
+
+def best_mimetype(accept: str) -> Optional[str]:
+    """The Accept header's highest-quality type; the more specific one, then the earlier one, on ties"""
+    best, best_rank = None, None
+    for part in accept.split(','):
+        mimetype, *params = [p.strip() for p in part.split(';')]
+        if not mimetype:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        rank = (quality, mimetype.count('*') == 0, not mimetype.startswith('*'))
+        if best_rank is None or rank > best_rank:
+            best, best_rank = mimetype.lower(), rank
+    return best
+
+
+def stream_start_event(ask: AskRequest) -> dict:
+    return {"cache": "HIT" if ask.cached_answer is not None else "MISS", **ask.session_fields()}
+
+
+def stream_event(ask: AskRequest, event: str, payload) -> Tuple[str, dict]:
+    """
+    The server-sent event for one (event, payload) from the chatbot's stream
+
+    A "done" answer is put in the answer cache, so call this off the event loop for it.
+    """
+    if event == "token":
+        return "token", {"text": payload}
+    if event == "done":
+        if "intent" not in payload and ask.use_cache:
+            get_answer_cache().set(ask.cache_key, payload["answer"])
+        return "done", {"status": "success", **payload}
+    return "error", {
+        "answer": FRIENDLY_API_ERROR_MESSAGE,
+        "message": FRIENDLY_API_ERROR_MESSAGE,
+        "status": "error",
+    }
+
+
+def prepare_batch(data):
+    """
+    Validate an /ask/batch request and answer what the cache can
+
+    Returns:
+        tuple: (batch_request, error_reply) where error_reply is None when the request is valid
+    """
+    api_key, error_reply = get_api_key()
+    if error_reply is not None:
+        return None, error_reply
+
+    questions = data.get('questions') if isinstance(data, dict) else None
+    if not isinstance(questions, list) or not questions:
+        return None, Reply(400, {"error": "'questions' must be a non-empty list"})
+
+    max_questions = int(os.getenv('BATCH_MAX_QUESTIONS', '100'))
+    if len(questions) > max_questions:
+        return None, Reply(400, {"error": f"At most {max_questions} questions per batch"})
+
+    candidate_id, error_reply = resolve_candidate(data)
+    if error_reply is not None:
+        return None, error_reply
+
+    results = [None] * len(questions)
+    pending = []
+    answer_cache = get_answer_cache()
+    for i, raw in enumerate(questions):
+        question = raw.strip() if isinstance(raw, str) else ''
+        if not question:
+            results[i] = {
+                "question": raw,
+                "status": "error",
+                "error": "Question cannot be empty"
+            }
+            continue
+        cache_key = answer_cache_key(question, candidate_id)
+        cached_answer = answer_cache.get(cache_key)
+        ANSWER_CACHE_LOOKUPS.inc("hit" if cached_answer is not None else "miss")
+        if cached_answer is not None:
+            results[i] = {
+                "question": question,
+                "answer": cached_answer,
+                "status": "success",
+                "cache": "HIT"
+            }
+        else:
+            pending.append((i, question, cache_key))
+    return BatchRequest(api_key, candidate_id, results, pending), None
+
+
+def batch_reply(batch: BatchRequest, answers: List[dict]) -> Reply:
+    """Merge the Gemini answers for the pending questions into the results, caching them"""
+    answer_cache = get_answer_cache()
+    results = list(batch.results)
+    for (i, question, cache_key), result in zip(batch.pending, answers):
+        if result["status"] == "success":
+            if "intent" not in result:
+                answer_cache.set(cache_key, result["answer"])
+            results[i] = {"question": question, **result, "cache": "MISS"}
+        else:
+            results[i] = {
+                "question": question,
+                **result,
+                "message": FRIENDLY_API_ERROR_MESSAGE,
+                "cache": "MISS"
+            }
+    return Reply(200, {"status": "success", "results": results})
+
+
+def health_reply() -> Reply:
+    """503 until the index and embedding model are loaded"""
+    status = index_status()
+    if not status["ready"]:
+        return Reply(503, {
+            "status": "starting",
+            "message": "CV RAG API is loading its index",
+            **status
+        })
+    return Reply(200, {
+        "status": "healthy",
+        "message": "CV RAG API is running",
+        **status
+    })
+
+
+def home_reply() -> Reply:
+    return Reply(200, {
+        "message": "CV Agent API is running. Go to /ask to ask questions about Ahlam's CV",
+        "status": "healthy",
+    })
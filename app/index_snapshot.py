@@ -0,0 +1,324 @@
+"""
+Persistent, content-addressed snapshots of the hybrid retriever's index.
+
+A snapshot holds the document texts and metadata, the fitted TF-IDF
+vocabulary/idf and sparse matrix (or the BM25 vocabulary and posting arrays),
+and the float32 embedding matrix. It lives in a directory named after a hash
+of cv.json (or of every CV in CV_CORPUS_DIR), the chunking code version, the
+keyword retriever and the embedding model, so a snapshot is only ever loaded
+for the exact inputs it was built from. Embeddings are memory-mapped rather than read into memory.
+
+Build one at deploy time with:
+    python -m app.index_snapshot build
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .cv_data import get_cache_dir
+from .bm25 import BM25Retriever, bm25_settings
+from .retrieval import HybridRetriever, SentenceTransformerRetriever, TfidfRetriever
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes
+SNAPSHOT_FORMAT_VERSION = "2"
+
+_MANIFEST = "manifest.json"
+
+
+def snapshots_enabled() -> bool:
+    return os.getenv("INDEX_SNAPSHOTS", "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+def snapshot_root() -> str:
+    return os.getenv("INDEX_SNAPSHOT_DIR") or os.path.join(get_cache_dir(), "index")
+
+
+def snapshot_key(
+    cv_fingerprint: str,
+    chunker_version: str,
+    model_name: Optional[str],
+    sparse_retriever: str = "tfidf",
+) -> str:
+    raw = "\x1f".join(
+        [SNAPSHOT_FORMAT_VERSION, cv_fingerprint, chunker_version, model_name or "", sparse_retriever]
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def documents_digest(documents: Sequence[Document]) -> str:
+    h = hashlib.sha256()
+    for doc in documents:
+        h.update(doc.page_content.encode("utf-8"))
+        h.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def save_snapshot(key: str, retriever: HybridRetriever) -> Optional[str]:
+    """Write a snapshot atomically; returns its directory, or None on failure."""
+    root = snapshot_root()
+    final_dir = os.path.join(root, key)
+    started = time.perf_counter()
+    try:
+        os.makedirs(root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=f".{key}.", dir=root)
+        try:
+            identity = _write_snapshot(tmp_dir, key, retriever)
+            try:
+                os.rename(tmp_dir, final_dir)
+            except OSError:
+                if _stored_identity(final_dir) == identity:
+                    # Another worker got there first with the same index
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                else:
+                    # Stale snapshot for the same key (e.g. derived fields changed,
+                    # or written without embeddings when the model failed to load).
+                    # Processes that memory-mapped the old files keep them until they exit.
+                    stale_dir = f"{final_dir}.stale-{os.getpid()}"
+                    os.rename(final_dir, stale_dir)
+                    os.rename(tmp_dir, final_dir)
+                    shutil.rmtree(stale_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    except Exception:
+        logger.exception("Failed to save index snapshot %s", key)
+        return None
+
+    logger.info(
+        "Saved index snapshot %s (%d docs) in %.0f ms",
+        key, len(retriever.documents), (time.perf_counter() - started) * 1000,
+    )
+    return final_dir
+
+
+def _identity(manifest: dict) -> tuple:
+    """What two snapshots must share to be interchangeable: documents, embeddings and keyword index."""
+    return (
+        manifest.get("documents_digest"),
+        manifest.get("semantic_model_name"),
+        manifest.get("sparse_retriever"),
+        json.dumps(manifest.get("bm25_field_boosts"), sort_keys=True),
+    )
+
+
+def _stored_identity(path: str) -> Optional[tuple]:
+    try:
+        with open(os.path.join(path, _MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("semantic_model_name") and not os.path.exists(os.path.join(path, "embeddings.npy")):
+        return None
+    return _identity(manifest)
+
+
+def _write_snapshot(path: str, key: str, retriever: HybridRetriever) -> tuple:
+    documents = retriever.documents
+    with open(os.path.join(path, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            [{"page_content": d.page_content, "metadata": d.metadata} for d in documents],
+            f,
+            default=str,
+        )
+
+    sparse_info = (
+        _write_bm25(path, retriever.tfidf)
+        if retriever.sparse_retriever == "bm25"
+        else _write_tfidf(path, retriever.tfidf)
+    )
+
+    model_name = None
+    if retriever.semantic is not None:
+        model_name = retriever.semantic.model_name
+        np.save(
+            os.path.join(path, "embeddings.npy"),
+            np.ascontiguousarray(retriever.semantic.doc_vecs, dtype=np.float32),
+        )
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "key": key,
+        "num_documents": len(documents),
+        "documents_digest": documents_digest(documents),
+        "sparse_retriever": retriever.sparse_retriever,
+        **sparse_info,
+        "semantic_model_name": model_name,
+        "created_at": time.time(),
+    }
+    # Written last: a directory with a manifest is a complete snapshot
+    with open(os.path.join(path, _MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return _identity(manifest)
+
+
+def _write_tfidf(path: str, tfidf: TfidfRetriever) -> dict:
+    vectorizer = tfidf.vectorizer
+    vocabulary = {term: int(idx) for term, idx in vectorizer.vocabulary_.items()}
+    with open(os.path.join(path, "tfidf_vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f)
+    np.save(os.path.join(path, "tfidf_idf.npy"), np.asarray(vectorizer.idf_))
+
+    from scipy import sparse
+
+    matrix = sparse.csr_matrix(tfidf.matrix)
+    np.save(os.path.join(path, "tfidf_data.npy"), matrix.data)
+    np.save(os.path.join(path, "tfidf_indices.npy"), matrix.indices)
+    np.save(os.path.join(path, "tfidf_indptr.npy"), matrix.indptr)
+    return {"tfidf_shape": list(matrix.shape)}
+
+
+def _write_bm25(path: str, bm25: BM25Retriever) -> dict:
+    with open(os.path.join(path, "bm25_vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(bm25.vocabulary, f)
+    for name, array in bm25.postings_state().items():
+        np.save(os.path.join(path, f"bm25_{name}.npy"), array)
+    # Baked into the stored term frequencies; k1 and b are applied on load
+    return {"bm25_field_boosts": bm25.field_boosts}
+
+
+def _load_tfidf(path: str, manifest: dict, documents: List[Document]) -> TfidfRetriever:
+    with open(os.path.join(path, "tfidf_vocabulary.json"), encoding="utf-8") as f:
+        vocabulary = json.load(f)
+    idf = np.load(os.path.join(path, "tfidf_idf.npy"))
+    from scipy import sparse
+
+    matrix = sparse.csr_matrix(
+        (
+            np.load(os.path.join(path, "tfidf_data.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "tfidf_indices.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "tfidf_indptr.npy"), mmap_mode="r"),
+        ),
+        shape=tuple(manifest["tfidf_shape"]),
+        copy=False,
+    )
+    return TfidfRetriever.from_fitted(documents, vocabulary, idf, matrix)
+
+
+def _load_bm25(path: str, manifest: dict, documents: List[Document]) -> Optional[BM25Retriever]:
+    settings = bm25_settings()
+    if manifest.get("bm25_field_boosts") != settings["field_boosts"]:
+        return None
+    with open(os.path.join(path, "bm25_vocabulary.json"), encoding="utf-8") as f:
+        vocabulary = json.load(f)
+    postings = {
+        name: np.load(os.path.join(path, f"bm25_{name}.npy"), mmap_mode="r")
+        for name in ("indptr", "doc_ids", "tf", "doc_len")
+    }
+    return BM25Retriever(documents, postings=postings, vocabulary=vocabulary, **settings)
+
+
+def load_snapshot(
+    key: str,
+    documents: Optional[Sequence[Document]],
+    semantic_model_name: Optional[str],
+    **hybrid_kwargs,
+) -> Optional[HybridRetriever]:
+    """
+    Load the snapshot for `key` if it exists and matches.
+
+    `documents` are the freshly chunked documents; if given they must match the
+    snapshot's (derived fields such as total experience change over time).
+    Returns None when the snapshot is missing, stale or unreadable.
+    """
+    path = os.path.join(snapshot_root(), key)
+    manifest_path = os.path.join(path, _MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+
+    started = time.perf_counter()
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return None
+
+        with open(os.path.join(path, "documents.json"), encoding="utf-8") as f:
+            stored_docs: List[Document] = [
+                Document(page_content=d["page_content"], metadata=d["metadata"])
+                for d in json.load(f)
+            ]
+        if documents is not None and documents_digest(documents) != manifest["documents_digest"]:
+            logger.info("Index snapshot %s is stale; rebuilding", key)
+            return None
+
+        semantic = None
+        if semantic_model_name:
+            if manifest.get("semantic_model_name") != semantic_model_name:
+                return None
+            doc_vecs = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            semantic = SentenceTransformerRetriever(
+                stored_docs, semantic_model_name, doc_vecs=doc_vecs
+            )
+
+        sparse_retriever = hybrid_kwargs.get("sparse_retriever", "tfidf")
+        if manifest.get("sparse_retriever") != sparse_retriever:
+            return None
+        if sparse_retriever == "bm25":
+            tfidf = _load_bm25(path, manifest, stored_docs)
+            if tfidf is None:
+                logger.info("Index snapshot %s has other BM25 field boosts; rebuilding", key)
+                return None
+        else:
+            tfidf = _load_tfidf(path, manifest, stored_docs)
+    except Exception:
+        logger.exception("Failed to load index snapshot %s; rebuilding", key)
+        return None
+
+    logger.info(
+        "Loaded index snapshot %s (%d docs) in %.0f ms",
+        key, len(stored_docs), (time.perf_counter() - started) * 1000,
+    )
+    return HybridRetriever(stored_docs, tfidf=tfidf, semantic=semantic, **hybrid_kwargs)
+
+
+def build_snapshot(force: bool = False) -> Optional[str]:
+    """Chunk the current CV(s) and write the snapshot, unless a matching one exists."""
+    from .chatbot import _build_corpus_documents, _load_corpus, current_snapshot_key
+    from .retrieval import hybrid_settings, semantic_model_name
+
+    corpus = _load_corpus()
+    if not corpus:
+        raise ValueError("Could not load CV data")
+    documents = _build_corpus_documents(corpus)
+    key = current_snapshot_key()
+    model_name = semantic_model_name()
+    settings = hybrid_settings()
+
+    if not force and load_snapshot(key, documents, model_name, **settings) is not None:
+        logger.info("Index snapshot %s is up to date", key)
+        return os.path.join(snapshot_root(), key)
+
+    if force:
+        shutil.rmtree(os.path.join(snapshot_root(), key), ignore_errors=True)
+    return save_snapshot(
+        key, HybridRetriever(documents, semantic_model_name=model_name, **settings)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage retriever index snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build the snapshot for the current cv.json")
+    build.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        path = build_snapshot(force=args.force)
+        if path is None:
+            raise SystemExit(1)
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+Deterministic answers to structured questions, without retrieval or Gemini.
+
+Questions like "how many years of experience does she have", "where does she
+work now", "what's her email" or "what languages does she speak" have exact
+answers in the CV. The router recognizes them and fills a template from
+CandidateFacts, in well under a millisecond.
+
+INTENT_ROUTER selects how questions are matched (opt-in):
+
+    off        (default) every question goes to retrieval + Gemini
+    keywords   phrase patterns with a fixed confidence each
+    embedding  cosine similarity to the centroid of example phrasings, using
+               the retriever's embedding model (keywords if it isn't loaded)
+
+A match below INTENT_CONFIDENCE_THRESHOLD, a compound question ("... and what
+are her skills?"), one about a specific employer, skill, tool or role
+("how many years of Python experience?"), a language the CV doesn't list and
+that isn't a known language name ("can she speak to clients?"), or a fact
+the CV doesn't have all fall through to the normal path. Veto patterns (e.g.
+"programming" for languages) apply in both modes.
+
+Facts derived from the date (total experience up to "Present", current jobs)
+are recomputed every FACTS_REFRESH_SECONDS by FactsTable rather than frozen
+when the index was built.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Pattern, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SUBJECT = r"(?:she|he|they|\w+)"
+
+
+@dataclass(frozen=True)
+class CurrentJob:
+    position: str
+    company: str
+    start: str
+
+
+@dataclass(frozen=True)
+class CandidateFacts:
+    name: str
+    total_experience: str
+    current_jobs: Tuple[CurrentJob, ...] = ()
+    contact: Dict[str, str] = field(default_factory=dict)
+    languages: Dict[str, str] = field(default_factory=dict)
+    # Lower-cased employers and schools; questions naming one are not routed
+    organizations: Tuple[str, ...] = ()
+    # Lower-cased skills and tools from the CV; questions naming one are not
+    # routed to the experience or current-job templates
+    skills: Tuple[str, ...] = ()
+    as_of: str = ""
+
+
+@dataclass(frozen=True)
+class IntentAnswer:
+    intent: str
+    confidence: float
+    text: str
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    # (pattern, confidence); the best matching pattern sets the confidence
+    patterns: Tuple[Tuple[Pattern, float], ...]
+    # Any match sends the question to retrieval + Gemini instead
+    vetoes: Tuple[Pattern, ...]
+    # Example phrasings for INTENT_ROUTER=embedding
+    examples: Tuple[str, ...]
+
+
+def _compile(*patterns):
+    return tuple(re.compile(p) for p in patterns)
+
+
+# Skills, tools and roles: "how many years of Python", "working as a data
+# scientist" ask about one part of a career, not the whole of it. The CV's own
+# skills are checked too (CandidateFacts.skills)
+_TOPIC = (
+    r"(?<![\w+#.])(?:"
+    r"python|java|javascript|typescript|react|angular|vue|node(?:\.?js)?|next\.?js|c\+\+|c#|golang|rust|"
+    r"ruby|php|scala|kotlin|swift|matlab|sql|pl/sql|nosql|mysql|postgres(?:ql)?|mongodb|oracle|"
+    r"excel|power ?bi|tableau|spark|hadoop|kafka|airflow|docker|kubernetes|openshift|aws|azure|gcp|"
+    r"cloud|linux|git|tensorflow|pytorch|keras|pandas|numpy|scikit-learn|"
+    r"machine learning|deep learning|ml|ai|artificial intelligence|nlp|computer vision|"
+    r"data (?:science|analysis|analytics|engineering)|analytics|statistics|devops|ci/cd|apis?|"
+    r"front[- ]?end|back[- ]?end|full[- ]?stack|web development|mobile|"
+    r"engineer(?:ing)?|developer|scientist|analyst|manager|management|consultant|designer|architect|"
+    r"intern(?:ship)?|researcher|research|teacher|teaching|lecturer|programmer|programming|coding|"
+    r"administrator|leadership"
+    r")(?![\w+#])"
+)
+
+# Spoken languages accepted in "does she speak <language>?" besides the CV's own
+_KNOWN_LANGUAGES = frozenset("""
+afrikaans albanian amharic arabic armenian azerbaijani basque belarusian bengali bosnian
+bulgarian burmese cantonese catalan chinese croatian czech danish dutch english estonian
+farsi filipino finnish french georgian german greek gujarati hausa hebrew hindi hungarian
+icelandic igbo indonesian irish italian japanese kannada kazakh khmer korean kurdish lao
+latin latvian lithuanian macedonian malay malayalam maltese mandarin marathi mongolian
+nepali norwegian pashto persian polish portuguese punjabi romanian russian serbian sinhala
+slovak slovenian somali spanish swahili swedish tagalog tamil telugu thai tibetan tigrinya
+turkish ukrainian urdu uzbek vietnamese welsh xhosa yoruba zulu
+""".split())
+
+
+INTENTS = (
+    Intent(
+        name="total_experience",
+        patterns=(
+            (re.compile(r"\bhow (?:many|much) years?\b.*\b(?:experience|working|worked|career)\b"), 0.9),
+            (re.compile(r"\bhow (?:many|much) years?\b"), 0.7),
+            (re.compile(r"\bhow much (?:work |professional )?experience\b"), 0.95),
+            (re.compile(r"\byears? of (?:work |professional |industry )?experience\b"), 0.9),
+            (re.compile(r"\b(?:total|overall) (?:work |professional )?experience\b"), 0.95),
+            (re.compile(rf"\bhow long has {_SUBJECT} been working\b"), 0.85),
+            (re.compile(r"\bexperience\b"), 0.4),
+        ),
+        vetoes=_compile(
+            # Experience with, in or as something, anywhere in the question
+            r"\b(?:experience|experienced|work|worked|working|years?)\b.*\b(?:with|using|doing|as|on|at|in(?! total\b))\b",
+            r"\b(?:years? of|how much) (?!(?:work|working|professional|industry|relevant|total|overall|experience)\b)"
+            r"[\w+#./-]+(?: [\w+#./-]+)? experience\b",
+            _TOPIC,
+            r"\b(?:each|every|per) (?:job|role|company|position)\b",
+            r"\b(?:stud(?:y|ied|ying)|degree|school|university|education|old|age)\b",
+        ),
+        examples=(
+            "How many years of experience does she have?",
+            "How much professional experience does the candidate have?",
+            "What is her total work experience?",
+            "How long has she been working?",
+        ),
+    ),
+    Intent(
+        name="current_job",
+        patterns=(
+            (re.compile(r"\bcurrent(?:ly)? (?:job|role|position|employer|company|employment|title|workplace)\b"), 0.95),
+            (re.compile(rf"\bwhere (?:does|is|do) {_SUBJECT} (?:currently )?work(?:ing)? (?:now|currently|at the moment|today|right now)\b"), 0.95),
+            (re.compile(rf"\bwhere (?:does|is|do) {_SUBJECT} (?:currently )?work(?:ing)?\b"), 0.85),
+            (re.compile(rf"\b(?:who|which company|what company) (?:does|is|do) {_SUBJECT} (?:currently )?work(?:ing)? (?:for|at)\b"), 0.9),
+            (re.compile(rf"\bwhat does {_SUBJECT} do (?:now|currently|for a living|these days)\b"), 0.8),
+            # Only on its own: "is she working remotely / on her PhD?" is something else
+            (re.compile(rf"\b(?:is|are) {_SUBJECT} (?:currently )?(?:employed|working)(?: (?:now|currently|today|right now|at the moment))?\W*$"), 0.8),
+        ),
+        vetoes=_compile(
+            r"\b(?:before|previous(?:ly)?|past|used to|former|prior|last job|first job)\b",
+            r"\b(?:responsib\w*|dut(?:y|ies)|achiev\w*|skills?|tasks?|projects?|stack|tools?)\b",
+            r"\b(?:why|how did)\b",
+            r"\b(?:remote(?:ly)?|on-?site|hybrid|from home|part[- ]time|full[- ]time|freelanc\w*|phd|thesis|degree|visa|relocat\w*)\b",
+            r"\bwork(?:ing)? (?:on|towards?|with|as|in|from)\b",
+            _TOPIC,
+        ),
+        examples=(
+            "Where does she work now?",
+            "What is her current job?",
+            "Which company is she currently working for?",
+            "What is the candidate's current position?",
+        ),
+    ),
+    Intent(
+        name="contact",
+        patterns=(
+            (re.compile(r"\be-?mail\b"), 0.95),
+            (re.compile(r"\blinked ?in\b"), 0.9),
+            (re.compile(r"\bgithub\b"), 0.9),
+            (re.compile(r"\b(?:calendly|book a (?:call|meeting)|schedule a (?:call|meeting))\b"), 0.85),
+            (re.compile(r"\b(?:contact|reach|get in touch)\b"), 0.85),
+        ),
+        vetoes=_compile(
+            r"\b(?:phone|mobile|number|address|salary|references?|whatsapp)\b",
+            r"\bgithub (?:projects?|repos?\w*|code)\b",
+        ),
+        examples=(
+            "What is her email address?",
+            "How can I contact her?",
+            "What's her LinkedIn?",
+            "How do I get in touch with the candidate?",
+        ),
+    ),
+    Intent(
+        name="languages",
+        patterns=(
+            (re.compile(rf"\b(?:what|which) (?:spoken )?languages? (?:does|do|can|is) {_SUBJECT} (?:speak|know|fluent)\b"), 0.95),
+            (re.compile(rf"\b(?:does|can|is) {_SUBJECT} (?:speak|fluent in) [a-z]+\b"), 0.9),
+            (re.compile(r"\blanguages?\b.*\b(?:speak|speaks|spoken|fluent|fluency)\b"), 0.9),
+            (re.compile(r"\b(?:speak|speaks|spoken|fluent|fluency)\b.*\blanguages?\b"), 0.9),
+            (re.compile(r"\blanguages?\b"), 0.6),
+        ),
+        vetoes=_compile(
+            r"\b(?:programming|coding|code|computer|software|scripting|query|markup|frameworks?)\b",
+        ),
+        examples=(
+            "What languages does she speak?",
+            "Which languages is the candidate fluent in?",
+            "Does she speak German?",
+            "What spoken languages does she know?",
+        ),
+    ),
+)
+
+_WHITESPACE = re.compile(r"\s+")
+# A second question or clause means the template would only answer part of it
+_COMPOUND = re.compile(r"\?.*\S.*\?|\b(?:and|also|plus|as well as)\b.*\b(?:what|which|how|where|when|why|who|does|is|her|his|their)\b")
+_SPEAK_LANGUAGE = re.compile(rf"\b(?:does|can|is) {_SUBJECT} (?:speak|fluent in) ([a-z]+)\b")
+_CONTACT_CHANNELS = {
+    "email": re.compile(r"\be-?mail\b"),
+    "linkedin": re.compile(r"\blinked ?in\b"),
+    "github": re.compile(r"\bgithub\b"),
+    "personal": re.compile(r"\b(?:calendly|book|schedule)\b"),
+}
+_CONTACT_LABELS = {"email": "email", "linkedin": "LinkedIn", "github": "GitHub", "personal": "booking page"}
+
+
+def intent_router_settings() -> dict:
+    """Router mode, confidence threshold and LLM rephrasing, from the environment."""
+    mode = os.getenv("INTENT_ROUTER", "off").strip().lower()
+    if mode not in ("keywords", "embedding"):
+        mode = "off"
+    return {
+        "mode": mode,
+        "threshold": float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8")),
+        "rephrase": os.getenv("INTENT_REPHRASE", "off").strip().lower() in ("1", "on", "true", "yes"),
+    }
+
+
+def _normalize(question: str) -> str:
+    return _WHITESPACE.sub(" ", question.strip().lower())
+
+
+class IntentRouter:
+    """
+    Matches questions to INTENTS and renders their templated answers.
+
+    Stateless apart from the per-model centroid cache used in embedding mode,
+    so one instance is shared between request threads.
+    """
+
+    def __init__(self, mode: str = "keywords", threshold: float = 0.8):
+        self.mode = mode
+        self.threshold = threshold
+        self._centroids: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._centroids_lock = threading.Lock()
+
+    def classify(self, question: str, semantic=None) -> Optional[Tuple[str, float]]:
+        """
+        Best intent and its confidence, or None if no intent applies.
+
+        Args:
+            question: The recruiter's question
+            semantic: SentenceTransformerRetriever, for embedding mode
+        """
+        text = _normalize(question)
+        if not text or _COMPOUND.search(text):
+            return None
+        allowed = [i for i in INTENTS if not any(v.search(text) for v in i.vetoes)]
+        if not allowed:
+            return None
+        if self.mode == "embedding" and semantic is not None:
+            return self._classify_embedding(question, allowed, semantic)
+        best = None
+        for intent in allowed:
+            confidence = max((c for p, c in intent.patterns if p.search(text)), default=0.0)
+            if confidence > 0 and (best is None or confidence > best[1]):
+                best = (intent.name, confidence)
+        return best
+
+    def _classify_embedding(self, question, allowed, semantic):
+        names, centroids = self._centroids_for(semantic)
+        from .embedding_cache import get_query_cache
+
+        cache = get_query_cache(semantic.model_name)
+        if cache is not None:
+            q_vec = cache.encode(semantic.model, [question])[0]
+        else:
+            q_vec = np.asarray(
+                semantic.model.encode([question], normalize_embeddings=True, show_progress_bar=False),
+                dtype=np.float32,
+            )[0]
+        scores = centroids @ q_vec
+        allowed_names = {intent.name for intent in allowed}
+        ranked = [(names[i], float(scores[i])) for i in np.argsort(-scores) if names[i] in allowed_names]
+        return ranked[0] if ranked else None
+
+    def _centroids_for(self, semantic):
+        cached = self._centroids.get(semantic.model_name)
+        if cached is not None:
+            return cached
+        with self._centroids_lock:
+            cached = self._centroids.get(semantic.model_name)
+            if cached is None:
+                names = [intent.name for intent in INTENTS]
+                rows = []
+                for intent in INTENTS:
+                    vecs = np.asarray(
+                        semantic.model.encode(
+                            list(intent.examples), normalize_embeddings=True, show_progress_bar=False
+                        ),
+                        dtype=np.float32,
+                    )
+                    centroid = vecs.mean(axis=0)
+                    rows.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+                cached = (names, np.stack(rows))
+                self._centroids[semantic.model_name] = cached
+        return cached
+
+    def answer(self, question: str, facts: CandidateFacts, semantic=None) -> Optional[IntentAnswer]:
+        """
+        Templated answer if the question matches an intent confidently and the
+        CV has the facts for it, otherwise None.
+        """
+        if self.mode == "off":
+            return None
+        match = self.classify(question, semantic)
+        if match is None:
+            return None
+        name, confidence = match
+        if confidence < self.threshold:
+            return None
+        text = _normalize(question)
+        if name in ("total_experience", "current_job") and (
+            any(org and org in text for org in facts.organizations) or _names_any(text, facts.skills)
+        ):
+            # "How many years at Omantel?" is about one job, not the total
+            return None
+        render = _RENDERERS[name]
+        rendered = render(text, facts)
+        if rendered is None:
+            return None
+        return IntentAnswer(intent=name, confidence=round(confidence, 3), text=rendered)
+
+
+def _names_any(text: str, terms: Sequence[str]) -> bool:
+    """Whether `text` contains one of `terms` as whole words"""
+    return any(
+        term and re.search(rf"(?<![\w+#.]){re.escape(term)}(?![\w+#])", text) for term in terms
+    )
+
+
+def _render_total_experience(text: str, facts: CandidateFacts) -> Optional[str]:
+    if not facts.total_experience or facts.total_experience.startswith("Less than"):
+        return None
+    return (
+        f"{facts.name} has {facts.total_experience} of professional experience in total "
+        f"(overlapping roles counted once, as of {facts.as_of})."
+    )
+
+
+def _render_current_job(text: str, facts: CandidateFacts) -> Optional[str]:
+    jobs = facts.current_jobs
+    if not jobs:
+        return None
+    if len(jobs) == 1:
+        job = jobs[0]
+        return f"{facts.name} currently works at {job.company} as {job.position} (since {job.start})."
+    roles = "; ".join(f"{job.position} at {job.company} (since {job.start})" for job in jobs)
+    return f"{facts.name} currently holds {len(jobs)} roles: {roles}."
+
+
+def _render_contact(text: str, facts: CandidateFacts) -> Optional[str]:
+    asked = [channel for channel, pattern in _CONTACT_CHANNELS.items() if pattern.search(text)]
+    channels = [c for c in (asked or list(_CONTACT_LABELS)) if facts.contact.get(c)]
+    if not channels or (asked and len(channels) < len(asked)):
+        # Asked for something the CV doesn't list; let Gemini say so
+        return None
+    parts = [f"{_CONTACT_LABELS[c]}: {facts.contact[c]}" for c in channels]
+    return f"You can reach {facts.name} via " + ", ".join(parts) + "."
+
+
+def _render_languages(text: str, facts: CandidateFacts) -> Optional[str]:
+    if not facts.languages:
+        return None
+    spoken = ", ".join(
+        f"{language} ({level})" if level else language for language, level in facts.languages.items()
+    )
+    asked = _SPEAK_LANGUAGE.search(text)
+    if asked:
+        wanted = asked.group(1)
+        for language, level in facts.languages.items():
+            if language.lower() == wanted:
+                suffix = f" ({level} level)" if level else ""
+                return f"Yes, {facts.name} speaks {language}{suffix}."
+        if wanted not in _KNOWN_LANGUAGES:
+            # "Can she speak to clients?" is not about languages at all
+            return None
+        return f"{wanted.capitalize()} isn't listed in {facts.name}'s CV. {facts.name} speaks {spoken}."
+    return f"{facts.name} speaks {spoken}."
+
+
+_RENDERERS: Dict[str, Callable[[str, CandidateFacts], Optional[str]]] = {
+    "total_experience": _render_total_experience,
+    "current_job": _render_current_job,
+    "contact": _render_contact,
+    "languages": _render_languages,
+}
+
+
+class FactsTable:
+    """
+    CandidateFacts for every CV in the corpus, recomputed every
+    `refresh_seconds` so date-dependent facts don't go stale.
+
+    Also remembers the facts the index was built with, so callers can tell
+    when the indexed text (e.g. the total experience summary) has drifted.
+    """
+
+    def __init__(
+        self,
+        corpus: Dict[str, dict],
+        build_facts: Callable[[str, dict], CandidateFacts],
+        refresh_seconds: float,
+    ):
+        self._corpus = corpus
+        self._build_facts = build_facts
+        self._refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._facts = self._compute()
+        self._computed_at = time.monotonic()
+        self._indexed = self._facts
+
+    def _compute(self) -> Dict[str, CandidateFacts]:
+        return {cid: self._build_facts(cid, cv_data) for cid, cv_data in self._corpus.items()}
+
+    def refresh_if_due(self) -> bool:
+        """Recompute the facts if they are older than refresh_seconds; True if they were."""
+        if self._refresh_seconds <= 0 or time.monotonic() - self._computed_at < self._refresh_seconds:
+            return False
+        with self._lock:
+            if time.monotonic() - self._computed_at < self._refresh_seconds:
+                return False
+            started = time.perf_counter()
+            self._facts = self._compute()
+            self._computed_at = time.monotonic()
+        logger.info(
+            "Recomputed facts for %d candidates in %.1f ms",
+            len(self._facts), (time.perf_counter() - started) * 1000,
+        )
+        return True
+
+    def get(self, candidate_id: str) -> Optional[CandidateFacts]:
+        self.refresh_if_due()
+        return self._facts.get(candidate_id)
+
+    def differs_from_index(self) -> bool:
+        """True when a derived fact shown in the indexed text has changed since the build."""
+        facts, indexed = self._facts, self._indexed
+        return any(
+            facts[cid].total_experience != indexed[cid].total_experience
+            for cid in facts
+            if cid in indexed
+        )
+
+
+def as_of_date(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now()).strftime("%B %Y")
+
+
+def organizations(jobs: Sequence[dict], education: Sequence[dict]) -> Tuple[str, ...]:
+    names = [job.get("company") for job in jobs] + [
+        entry.get("institution") for entry in education if isinstance(entry, dict)
+    ]
+    return tuple(sorted({n.strip().lower() for n in names if isinstance(n, str) and n.strip()}))
+
+
+def skills(cv_data: dict) -> Tuple[str, ...]:
+    """
+    Lower-cased skills and tools named in a CV: skill and coding sections and
+    each job's skills, e.g. "React/JavaScript for front end" -> react, javascript.
+    """
+    items = []
+    for section, content in cv_data.items():
+        if isinstance(content, list) and (section.endswith("skills") or section.startswith("coding")):
+            items.extend(content)
+    for job in cv_data.get("experience") or []:
+        if isinstance(job, dict):
+            items.extend(job.get("skills") or [])
+    names = set()
+    for item in items:
+        if isinstance(item, str):
+            for name in item.split(" for ")[0].split("/"):
+                names.add(name.strip().lower())
+    return tuple(sorted(n for n in names if len(n) > 1))
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> Optional[IntentRouter]:
+    """The shared router for the current settings, or None with INTENT_ROUTER=off (the default)."""
+    global _router
+
+    settings = intent_router_settings()
+    if settings["mode"] == "off":
+        return None
+    router = _router
+    if router is None or (router.mode, router.threshold) != (settings["mode"], settings["threshold"]):
+        with _router_lock:
+            router = _router
+            if router is None or (router.mode, router.threshold) != (settings["mode"], settings["threshold"]):
+                router = IntentRouter(settings["mode"], settings["threshold"])
+                _router = router
+    return router
@@ -0,0 +1,526 @@
+"""
+Resilient Gemini calls: a deadline per request, jittered retries of
+retryable errors, optional hedging, and a circuit breaker.
+
+Every call RecruiterPipeline makes goes through the process-wide LLMClient:
+
+- the whole call (all attempts and backoff) must finish within
+  LLM_TIMEOUT_SECONDS, or LLMTimeoutError is raised;
+- rate limiting (429), server errors (500/502/503/504), timeouts and
+  connection errors are retried up to LLM_MAX_RETRIES times with
+  full-jitter exponential backoff; anything else (a bad request, a blocked
+  prompt) fails at once;
+- with LLM_HEDGE=on, an attempt still running after the recent p95 latency
+  gets a second identical request, and the first answer wins;
+- after LLM_BREAKER_FAILURES consecutive upstream failures the circuit
+  opens and calls fail fast with CircuitOpenError for
+  LLM_BREAKER_COOLDOWN_SECONDS; then one probe call decides whether it closes.
+
+Streams are retried only until their first chunk arrives (chunks already
+sent to the client can't be taken back) and are not hedged. Waiting for
+that first chunk is bounded by the deadline too; a stream that misses it
+counts as a failure for the breaker and is closed.
+
+langchain-google-genai retries internally (up to 10 attempts, minutes of
+backoff), which would defeat the deadline and keep hammering an upstream
+that is down; disable_library_retries() turns that off.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import CallbackMetric, Counter
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses (as google.api_core exceptions report them in `.code`) worth retrying
+_RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Exception class names (anywhere in the MRO) worth retrying, from requests,
+# google.api_core and the standard library, matched by name to avoid importing them
+_RETRYABLE_NAMES = {
+    "ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "ChunkedEncodingError",
+    "TooManyRequests", "ResourceExhausted", "InternalServerError", "BadGateway",
+    "ServiceUnavailable", "GatewayTimeout", "DeadlineExceeded", "TimeoutError",
+}
+
+LLM_RETRIES = Counter("cv_agent_llm_retries_total", "Gemini calls retried after a retryable error")
+LLM_HEDGES = Counter(
+    "cv_agent_llm_hedges_total",
+    "Hedged second requests sent, by which request answered first",
+    ["winner"],
+)
+LLM_TIMEOUTS = Counter("cv_agent_llm_timeouts_total", "Gemini calls that ran out of LLM_TIMEOUT_SECONDS")
+LLM_REJECTED = Counter(
+    "cv_agent_llm_circuit_rejections_total", "Gemini calls refused while the circuit was open"
+)
+
+
+class LLMTimeoutError(TimeoutError):
+    """The call (including retries) did not finish within its deadline"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Gemini is failing; calls are refused until the cooldown ends"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Gemini circuit open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return False
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in _RETRYABLE_STATUS:
+        return True
+    return any(cls.__name__ in _RETRYABLE_NAMES for cls in type(exc).__mro__)
+
+
+def disable_library_retries() -> None:
+    """Make the Gemini client libraries try each call once; LLMClient does the retrying."""
+    try:
+        from langchain_google_genai import chat_models
+    except ImportError:
+        return
+    if hasattr(chat_models, "_create_retry_decorator"):
+        chat_models._create_retry_decorator = lambda: (lambda fn: fn)
+
+    # Below langchain, the generated Gemini client retries 503s for up to 60s on
+    # the blocking transports. (Its asyncio client builds its retry per call; the
+    # deadline cancels that one.)
+    try:
+        from google.ai.generativelanguage_v1beta.services.generative_service.transports import base
+    except ImportError:
+        return
+    transport = base.GenerativeServiceTransport
+    if getattr(transport, "_single_attempt", False):
+        return
+    prep_wrapped_messages = transport._prep_wrapped_messages
+
+    def _prep_wrapped_messages(self, client_info):
+        prep_wrapped_messages(self, client_info)
+        for method in self._wrapped_methods.values():
+            method._retry = None
+
+    transport._prep_wrapped_messages = _prep_wrapped_messages
+    transport._single_attempt = True
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one probe) -> closed"""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self._threshold = failure_threshold
+        self._cooldown = cooldown_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go out now."""
+        if self._threshold <= 0:
+            return
+        with self._lock:
+            if self._state == "closed":
+                return
+            now = time.monotonic()
+            if self._state == "open":
+                remaining = self._opened_at + self._cooldown - now
+                if remaining > 0:
+                    raise CircuitOpenError(remaining)
+                self._state = "half_open"
+                self._probing = False
+            # half_open: one probe at a time
+            if self._probing:
+                raise CircuitOpenError(1.0)
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != "closed":
+                logger.info("Gemini circuit closed")
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        if self._threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == "half_open" or (
+                self._state == "closed" and self._failures >= self._threshold
+            ):
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                logger.warning(
+                    "Gemini circuit opened after %d consecutive failures; failing fast for %.0fs",
+                    self._failures, self._cooldown,
+                )
+
+    def record_other(self) -> None:
+        """An error that says nothing about upstream health (e.g. a rejected prompt)"""
+        with self._lock:
+            self._probing = False
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds until calls are allowed again, or None if they are now"""
+        with self._lock:
+            if self._state != "open":
+                return None
+            return max(0.0, self._opened_at + self._cooldown - time.monotonic())
+
+    def status(self) -> Dict[str, Any]:
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                "state": self._state if self._threshold > 0 else "disabled",
+                "consecutive_failures": self._failures,
+                "retry_after_seconds": round(retry_after, 1) if retry_after is not None else None,
+            }
+
+
+class _LatencyWindow:
+    """Recent successful attempt latencies, for the hedging delay"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def llm_client_settings() -> Dict[str, Any]:
+    """Deadline, retry, hedging and circuit breaker settings, from the environment."""
+    return {
+        "timeout": float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "2")),
+        "backoff_base": float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5")),
+        "backoff_max": float(os.getenv("LLM_RETRY_MAX_SECONDS", "8")),
+        "hedge": os.getenv("LLM_HEDGE", "off").strip().lower() in ("1", "on", "true", "yes"),
+        "hedge_delay": float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "2.0")),
+        "hedge_quantile": float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        "breaker_failures": int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        "breaker_cooldown": float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30")),
+        "threads": int(os.getenv("LLM_CLIENT_THREADS", "32")),
+    }
+
+
+class LLMClient:
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge: bool = False,
+        hedge_delay: float = 2.0,
+        hedge_quantile: float = 0.95,
+        breaker_failures: int = 5,
+        breaker_cooldown: float = 30.0,
+        threads: int = 32,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self._latencies = _LatencyWindow()
+        # Blocking calls run here so the caller can stop waiting at the deadline;
+        # an abandoned call finishes (or times out in the HTTP client) in the background
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="llm")
+
+    # -- shared policy -------------------------------------------------------
+
+    def _hedge_after(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        observed = self._latencies.quantile(self.hedge_quantile)
+        return observed if observed is not None else self.hedge_delay
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many requests over the whole window
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _on_error(self, exc: BaseException, attempt: int, deadline: float) -> float:
+        """Record `exc`; returns the backoff before the next attempt, or re-raises it."""
+        if isinstance(exc, LLMTimeoutError) or is_retryable(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_other()
+            raise exc
+        if isinstance(exc, LLMTimeoutError) or attempt >= self.max_retries:
+            raise exc
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            raise exc
+        LLM_RETRIES.inc()
+        logger.warning("Gemini call failed (%r); retry %d in %.2fs", exc, attempt + 1, delay)
+        return delay
+
+    def _before_attempt(self) -> None:
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            LLM_REJECTED.inc()
+            raise
+
+    def _timed(self, fn: Callable, args: tuple):
+        started = time.monotonic()
+        result = fn(*args)
+        self._latencies.add(time.monotonic() - started)
+        return result
+
+    # -- blocking calls ------------------------------------------------------
+
+    def call(self, fn: Callable, *args):
+        """fn(*args) under the deadline, retry, hedging and breaker policy"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            self._before_attempt()
+            try:
+                result = self._attempt(fn, args, deadline)
+            except Exception as exc:
+                time.sleep(self._on_error(exc, attempt, deadline))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _submit(self, fn: Callable, args: tuple):
+        # Each thread needs its own copy of the caller's context
+        return self._executor.submit(contextvars.copy_context().run, self._timed, fn, args)
+
+    def _attempt(self, fn: Callable, args: tuple, deadline: float):
+        futures = [self._submit(fn, args)]
+        hedge_after = self._hedge_after()
+        if hedge_after is not None and time.monotonic() + hedge_after < deadline:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                futures.append(self._submit(fn, args))
+        error = None
+        pending = list(futures)
+        while pending:
+            remaining = deadline - time.monotonic()
+            done, _ = wait(pending, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                LLM_TIMEOUTS.inc()
+                raise LLMTimeoutError(f"No answer from Gemini within {self.timeout:.0f}s")
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    if len(futures) > 1:
+                        LLM_HEDGES.inc("first" if future is futures[0] else "hedge")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    @staticmethod
+    def _first_chunk(fn: Callable, args: tuple):
+        iterator = iter(fn(*args))
+        return iterator, next(iterator, _END)
+
+    @staticmethod
+    def _close_abandoned(future) -> None:
+        # The caller gave up waiting; stop the stream if it ever starts
+        if not future.cancelled() and future.exception() is None:
+            close = getattr(future.result()[0], "close", None)
+            if close is not None:
+                close()
+
+    def stream(self, fn: Callable, *args):
+        """Iterate fn(*args), retrying (within the deadline) until the first chunk arrives"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            self._before_attempt()
+            # Wait for the first chunk on the executor, so a hung connection
+            # can't hold the caller past the deadline
+            future = self._executor.submit(
+                contextvars.copy_context().run, self._first_chunk, fn, args
+            )
+            try:
+                iterator, first = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FuturesTimeout:
+                future.add_done_callback(self._close_abandoned)
+                LLM_TIMEOUTS.inc()
+                self._on_error(LLMTimeoutError(f"No answer from Gemini within {self.timeout:.0f}s"),
+                               attempt, deadline)
+            except Exception as exc:
+                time.sleep(self._on_error(exc, attempt, deadline))
+                attempt += 1
+                continue
+            break
+        self.breaker.record_success()
+        if first is _END:
+            return
+        yield first
+        yield from iterator
+
+    def map(self, fn: Callable, inputs_list, max_concurrency: int):
+        """call(fn, inputs) for each input concurrently; failures come back as exceptions."""
+        def one(inputs):
+            try:
+                return self.call(fn, inputs)
+            except Exception as exc:
+                return exc
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, one, inputs) for inputs in inputs_list]
+            return [future.result() for future in futures]
+
+    # -- async calls ---------------------------------------------------------
+
+    async def acall(self, coro_fn: Callable, *args):
+        """await coro_fn(*args) under the same policy as call()"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            self._before_attempt()
+            try:
+                result = await self._aattempt(coro_fn, args, deadline)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                await asyncio.sleep(self._on_error(exc, attempt, deadline))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _atimed(self, coro_fn: Callable, args: tuple):
+        started = time.monotonic()
+        result = await coro_fn(*args)
+        self._latencies.add(time.monotonic() - started)
+        return result
+
+    async def _aattempt(self, coro_fn: Callable, args: tuple, deadline: float):
+        tasks = [asyncio.ensure_future(self._atimed(coro_fn, args))]
+        try:
+            hedge_after = self._hedge_after()
+            if hedge_after is not None and time.monotonic() + hedge_after < deadline:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    tasks.append(asyncio.ensure_future(self._atimed(coro_fn, args)))
+            error = None
+            pending = list(tasks)
+            while pending:
+                remaining = deadline - time.monotonic()
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(0.0, remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    LLM_TIMEOUTS.inc()
+                    raise LLMTimeoutError(f"No answer from Gemini within {self.timeout:.0f}s")
+                for task in done:
+                    pending.remove(task)
+                    if task.exception() is None:
+                        if len(tasks) > 1:
+                            LLM_HEDGES.inc("first" if task is tasks[0] else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    @staticmethod
+    async def _aclose(iterator) -> None:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                logger.debug("Closing an abandoned Gemini stream failed", exc_info=True)
+
+    async def astream(self, fn: Callable, *args):
+        """Async variant of stream(); waiting for the first chunk is bounded by the deadline"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            self._before_attempt()
+            iterator = fn(*args).__aiter__()
+            try:
+                first = await asyncio.wait_for(
+                    iterator.__anext__(), timeout=max(0.0, deadline - time.monotonic())
+                )
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return
+            except asyncio.TimeoutError:
+                LLM_TIMEOUTS.inc()
+                await self._aclose(iterator)
+                self._on_error(LLMTimeoutError(f"No answer from Gemini within {self.timeout:.0f}s"),
+                               attempt, deadline)
+            except Exception as exc:
+                await self._aclose(iterator)
+                await asyncio.sleep(self._on_error(exc, attempt, deadline))
+                attempt += 1
+                continue
+            else:
+                break
+        self.breaker.record_success()
+        yield first
+        async for chunk in iterator:
+            yield chunk
+
+
+_END = object()
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """The process-wide client (one breaker per worker for the one upstream)."""
+    global _client
+    client = _client
+    if client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient(**llm_client_settings())
+            client = _client
+    return client
+
+
+def llm_circuit_status() -> Dict[str, Any]:
+    return get_llm_client().breaker.status()
+
+
+def llm_retry_after() -> Optional[float]:
+    """Seconds until Gemini calls are allowed again while the circuit is open, else None"""
+    client = _client
+    return client.breaker.retry_after() if client is not None else None
+
+
+CallbackMetric(
+    "cv_agent_llm_circuit_open",
+    "1 while the Gemini circuit breaker is open or probing, else 0",
+    [],
+    lambda: {(): 0 if _client is None or _client.breaker.status()["state"] in ("closed", "disabled") else 1},
+)
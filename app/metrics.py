@@ -0,0 +1,299 @@
+"""
+In-process Prometheus metrics for the answer pipeline, served at /metrics.
+
+Histograms time each pipeline stage (index build, intent routing, TF-IDF,
+query embedding, vector search, fusion, prompt packing, the Gemini call)
+and each HTTP request; counters track answer-cache lookups, errors, and
+requests answered with FRIENDLY_API_ERROR_MESSAGE. Rendered in the
+Prometheus text format without a client library: recording a value is a
+lock and a bisect, about a microsecond.
+
+Values are per process: under gunicorn every worker keeps and serves its own,
+so scrape each worker (or sum over the `instance` label) rather than the
+load-balanced address.
+
+Stage timings are also collected per request (see start_request) for the
+Server-Timing response header.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans sub-millisecond lookups up to slow Gemini calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination"""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        i = bisect.bisect_left(self._bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+
+class Histogram(_Metric):
+    """Latency distribution per label combination, in seconds"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._bounds = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *labelvalues: str) -> _HistogramChild:
+        """The series for these label values; hold on to it on hot paths"""
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelvalues, _HistogramChild(self._bounds))
+        return child
+
+    def observe(self, seconds: float, *labelvalues: str) -> None:
+        self.labels(*labelvalues).observe(seconds)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            children = sorted(self._children.items())
+        for labelvalues, child in children:
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip((*self._bounds, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class CallbackMetric(_Metric):
+    """
+    Values read at scrape time from `collect`, which returns {labelvalues: value}
+    (e.g. counts kept by another component, like the query embedding cache)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self._collect = collect
+
+    def _samples(self) -> Iterable[str]:
+        try:
+            values = self._collect() or {}
+        except Exception:
+            return
+        for labelvalues, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "cv_agent_stage_duration_seconds",
+    "Time spent in each stage of answering a question",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "cv_agent_request_duration_seconds",
+    "HTTP request latency, until the last byte of the response",
+    ["endpoint", "status"],
+)
+ANSWER_CACHE_LOOKUPS = Counter(
+    "cv_agent_answer_cache_lookups_total",
+    "Answer cache lookups by result (hit or miss)",
+    ["result"],
+)
+INTENT_ANSWERS = Counter(
+    "cv_agent_intent_answers_total",
+    "Questions answered from the CV facts without retrieval, by intent",
+    ["intent"],
+)
+ERRORS = Counter(
+    "cv_agent_errors_total",
+    "Exceptions caught and logged, by where they were caught",
+    ["where"],
+)
+FALLBACK_ANSWERS = Counter(
+    "cv_agent_fallback_answers_total",
+    "Questions answered with FRIENDLY_API_ERROR_MESSAGE, by handler",
+    ["handler"],
+)
+
+# {stage: [seconds, calls]} for the request being handled, if any
+_request_timings: contextvars.ContextVar[Optional[Dict[str, list]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+class _StageTimer:
+    __slots__ = ("_name", "_series", "_started")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._series = STAGE_SECONDS.labels(name)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        self._series.observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            entry = timings.get(self._name)
+            if entry is None:
+                timings[self._name] = [elapsed, 1]
+            else:
+                entry[0] += elapsed
+                entry[1] += 1
+        return False
+
+
+def stage(name: str) -> _StageTimer:
+    """
+    Time a block as pipeline stage `name`:
+
+        with metrics.stage("tfidf"):
+            ...
+    """
+    return _StageTimer(name)
+
+
+def start_request() -> Tuple[Dict[str, list], contextvars.Token]:
+    """
+    Collect stage timings for the current request (and any code that runs in
+    a copy of its context); pass the token to end_request afterwards.
+    """
+    timings: Dict[str, list] = {}
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token: contextvars.Token) -> None:
+    _request_timings.reset(token)
+
+
+def server_timing_enabled() -> bool:
+    return os.getenv("SERVER_TIMING", "on").strip().lower() not in ("0", "off", "false", "no")
+
+
+def server_timing(timings: Dict[str, list], total_seconds: Optional[float] = None) -> str:
+    """
+    Server-Timing header value, e.g. `tfidf;dur=1.2, llm;dur=812.4, total;dur=815.0`.
+
+    A stage that ran several times (one Gemini call per batch question) shows
+    its summed duration and the number of calls.
+    """
+    parts = []
+    for name, (seconds, calls) in timings.items():
+        part = f"{name};dur={seconds * 1000:.2f}"
+        if calls > 1:
+            part += f';desc="{calls} calls"'
+        parts.append(part)
+    if total_seconds is not None:
+        parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
@@ -0,0 +1,95 @@
+"""
+Token-budgeted packing of retrieved chunks into the prompt context.
+
+Chunks arrive best first. Each is added while it fits CONTEXT_TOKEN_BUDGET.
+The first chunk that does not fit is cut at a word boundary if enough budget
+is left, otherwise dropped, and smaller lower-ranked chunks may still fill
+the remainder.
+
+Token counts are estimates (characters / 4). That is close to Gemini's
+tokenizer for English text and needs no API round trip.
+"""
+import math
+import os
+from dataclasses import dataclass, field
+from typing import List, Sequence
+
+from langchain_core.documents import Document
+
+CHARS_PER_TOKEN = 4
+# Don't bother truncating a chunk into less room than this
+_MIN_TRUNCATED_TOKENS = 24
+_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def context_token_budget() -> int:
+    """Maximum context tokens per prompt: CONTEXT_TOKEN_BUDGET, default 1000 (0 = unlimited)."""
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+
+
+@dataclass
+class PackedContext:
+    text: str
+    docs: List[Document] = field(default_factory=list)
+    tokens: int = 0
+    dropped: int = 0
+    truncated: bool = False
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    cut = text[:max_chars - 1]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def pack_context(docs: Sequence[Document], budget_tokens: int) -> PackedContext:
+    """
+    Join `docs` (best first) into at most `budget_tokens` estimated tokens.
+
+    Args:
+        docs: Retrieved chunks in rank order
+        budget_tokens: Token budget for the joined text; 0 or less means no limit
+    Returns:
+        PackedContext: The context text, the documents it includes and what was cut
+    """
+    if budget_tokens <= 0:
+        text = _SEPARATOR.join(doc.page_content for doc in docs)
+        return PackedContext(text=text, docs=list(docs), tokens=estimate_tokens(text))
+
+    budget_chars = budget_tokens * CHARS_PER_TOKEN
+    parts: List[str] = []
+    used: List[Document] = []
+    used_chars = 0
+    dropped = 0
+    truncated = False
+    for doc in docs:
+        separator = len(_SEPARATOR) if parts else 0
+        remaining = budget_chars - used_chars - separator
+        content = doc.page_content
+        if len(content) <= remaining:
+            parts.append(content)
+        elif not truncated and remaining >= _MIN_TRUNCATED_TOKENS * CHARS_PER_TOKEN:
+            # Only the highest-ranked chunk that overflows is kept in part
+            content = _truncate(content, remaining)
+            parts.append(content)
+            truncated = True
+        else:
+            dropped += 1
+            continue
+        used.append(doc)
+        used_chars += separator + len(content)
+
+    text = _SEPARATOR.join(parts)
+    return PackedContext(
+        text=text,
+        docs=used,
+        tokens=estimate_tokens(text),
+        dropped=dropped,
+        truncated=truncated,
+    )
@@ -0,0 +1,283 @@
+"""
+Optional cross-encoder reranking of the fused retrieval candidates.
+
+With RERANKER=cross-encoder, the top retrieval_k() chunks from
+HybridRetriever are scored against the question by a small CPU cross-encoder
+(RERANKER_MODEL, sentence-transformers' CrossEncoder) and only the best
+RERANK_TOP_N go on to the prompt, so Gemini reads 2-3 chunks instead of a
+dozen. Pairs are scored in batches of RERANK_BATCH_SIZE, and scores are cached
+per (question hash, chunk hash), so a repeated question, or a CV reload that
+leaves a chunk unchanged, skips the model.
+
+Each call has a hard budget of RERANK_BUDGET_MS per question. Scoring runs on
+a small thread pool; when the budget runs out first, or the model fails,
+the fused candidates are used unchanged (all retrieval_k() of them) and the
+abandoned job stops at its next batch, keeping the scores it already cached.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from .answer_cache import normalize_question
+from .metrics import Counter, stage
+
+logger = logging.getLogger(__name__)
+
+RERANK_PAIRS = Counter(
+    "cv_agent_rerank_pairs_total",
+    "(question, chunk) pairs reranked, by score source (cached or scored)",
+    ["source"],
+)
+RERANK_FALLBACKS = Counter(
+    "cv_agent_rerank_fallbacks_total",
+    "Rerank calls that kept the fused order, by reason (timeout, error, unavailable)",
+    ["reason"],
+)
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_cross_encoder(model_name: str):
+    """Load a CrossEncoder once per process (on CPU) and share it."""
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                from sentence_transformers import CrossEncoder
+
+                model = CrossEncoder(model_name, device="cpu")
+                _models[model_name] = model
+    return model
+
+
+def register_cross_encoder(model_name: str, model) -> None:
+    """
+    Use `model` (anything with CrossEncoder's predict()) for `model_name`.
+
+    Lets offline benchmarks stand in a local scorer for a model that can't be downloaded.
+    """
+    with _models_lock:
+        _models[model_name] = model
+
+
+def _hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class ScoreCache:
+    """Thread-safe LRU of (question hash, chunk hash) -> cross-encoder score."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_many(self, keys: Sequence[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    self._misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = score
+                self._hits += 1
+        return found
+
+    def put_many(self, items: Dict[Tuple[str, str], float]) -> None:
+        if self._max_entries <= 0:
+            return
+        with self._lock:
+            for key, score in items.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model_name: str,
+        top_n: int = 3,
+        budget_seconds: float = 0.15,
+        batch_size: int = 16,
+        cache_size: int = 4096,
+        threads: int = 2,
+    ):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.budget_seconds = budget_seconds
+        self.batch_size = max(1, batch_size)
+        self._cache = ScoreCache(cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="rerank")
+        self._state = "not_loaded"
+
+    def load(self) -> bool:
+        """Load the model now (e.g. at warm-up); False if it can't be loaded."""
+        try:
+            get_cross_encoder(self.model_name)
+        except Exception:
+            logger.exception("Failed to load cross-encoder %s; reranking is off", self.model_name)
+            self._state = "failed"
+            return False
+        self._state = "loaded"
+        return True
+
+    def _score(
+        self, pairs: Dict[Tuple[str, str], Tuple[str, str]], deadline: float
+    ) -> Dict[Tuple[str, str], float]:
+        """Score `pairs` (key -> (question, chunk text)) batch by batch, caching each batch."""
+        if self._state != "loaded" and not self.load():
+            raise RuntimeError(f"Cross-encoder {self.model_name} is unavailable")
+        model = get_cross_encoder(self.model_name)
+        keys = list(pairs)
+        scored = {}
+        for start in range(0, len(keys), self.batch_size):
+            if time.monotonic() > deadline:
+                # The caller has already fallen back; don't hold a thread any longer
+                break
+            batch = keys[start:start + self.batch_size]
+            scores = model.predict(
+                [pairs[key] for key in batch], batch_size=len(batch), show_progress_bar=False
+            )
+            batch_scores = {key: float(score) for key, score in zip(batch, scores)}
+            self._cache.put_many(batch_scores)
+            scored.update(batch_scores)
+            RERANK_PAIRS.inc("scored", amount=len(batch))
+        return scored
+
+    def rerank(
+        self,
+        queries: Sequence[str],
+        candidates: Sequence[Sequence[int]],
+        documents: Sequence[Document],
+    ) -> List[List[int]]:
+        """
+        The best top_n of each question's candidate document indices, best first.
+
+        Returns `candidates` unchanged if scoring misses the budget or fails.
+        """
+        candidates = [list(c) for c in candidates]
+        if self._state == "failed":
+            RERANK_FALLBACKS.inc("unavailable")
+            return candidates
+
+        with stage("rerank"):
+            deadline = time.monotonic() + self.budget_seconds * max(1, len(queries))
+            keys, pairs = [], {}
+            for query, rows in zip(queries, candidates):
+                normalized = normalize_question(query)
+                query_key = _hash(normalized)
+                row_keys = []
+                for i in rows:
+                    text = documents[i].page_content
+                    key = (query_key, _hash(text))
+                    row_keys.append(key)
+                    pairs.setdefault(key, (normalized, text))
+                keys.append(row_keys)
+
+            scores = self._cache.get_many(list(pairs))
+            RERANK_PAIRS.inc("cached", amount=len(scores))
+            missing = {key: pair for key, pair in pairs.items() if key not in scores}
+            if missing:
+                future = self._executor.submit(self._score, missing, deadline)
+                try:
+                    scores.update(future.result(timeout=max(0.0, deadline - time.monotonic())))
+                except FuturesTimeout:
+                    RERANK_FALLBACKS.inc("timeout")
+                    logger.warning(
+                        "Reranking %d pairs missed its %.0f ms budget; using the fused order",
+                        len(missing), self.budget_seconds * len(queries) * 1000,
+                    )
+                    return candidates
+                except Exception:
+                    RERANK_FALLBACKS.inc("error")
+                    logger.exception("Reranking failed; using the fused order")
+                    return candidates
+                if len(scores) < len(pairs):
+                    # The last batches hit the deadline
+                    RERANK_FALLBACKS.inc("timeout")
+                    return candidates
+
+            results = []
+            for rows, row_keys in zip(candidates, keys):
+                # Stable sort: equal scores keep the fused order
+                order = sorted(range(len(rows)), key=lambda j: -scores[row_keys[j]])
+                results.append([rows[j] for j in order[:self.top_n]])
+            return results
+
+    def status(self) -> dict:
+        return {
+            "model": self.model_name,
+            "state": self._state,
+            "top_n": self.top_n,
+            "score_cache": self._cache.stats(),
+        }
+
+
+def reranker_settings() -> Optional[dict]:
+    """CrossEncoderReranker arguments from the environment, or None when RERANKER is off."""
+    if os.getenv("RERANKER", "off").strip().lower() not in ("cross-encoder", "on"):
+        return None
+    return {
+        "model_name": os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2").strip(),
+        "top_n": int(os.getenv("RERANK_TOP_N", "3")),
+        "budget_seconds": float(os.getenv("RERANK_BUDGET_MS", "150")) / 1000,
+        "batch_size": int(os.getenv("RERANK_BATCH_SIZE", "16")),
+        "cache_size": int(os.getenv("RERANK_CACHE_SIZE", "4096")),
+        "threads": int(os.getenv("RERANK_THREADS", "2")),
+    }
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_key: Optional[tuple] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """The process-wide reranker, or None when RERANKER is off. Changed settings replace it."""
+    global _reranker, _reranker_key
+
+    settings = reranker_settings()
+    if settings is None:
+        return None
+    key = tuple(sorted(settings.items()))
+    reranker = _reranker
+    if reranker is not None and _reranker_key == key:
+        return reranker
+    with _reranker_lock:
+        if _reranker is None or _reranker_key != key:
+            _reranker = CrossEncoderReranker(**settings)
+            _reranker_key = key
+        return _reranker
+
+
+def reranker_status() -> Optional[dict]:
+    """State and score cache of the reranker, or None when RERANKER is off."""
+    reranker = get_reranker()
+    return reranker.status() if reranker is not None else None
@@ -1,17 +1,36 @@
+import hashlib
 import logging
 import os
+import threading
 from dataclasses import dataclass
-from typing import List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from langchain_core.documents import Document
-from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .bm25 import BM25Retriever, bm25_settings
+from .embedding_cache import get_query_cache
+from .metrics import stage
+from .vector_index import Hits, QuantizedMatrix, build_vector_index, embedding_dtype, memory_map, top_k_rows
+
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
 
 logger = logging.getLogger(__name__)
 
 
-def _cosine_sim_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+def _cosine_sim_matrix(
+    a: Union[np.ndarray, QuantizedMatrix], b: Union[np.ndarray, QuantizedMatrix]
+) -> np.ndarray:
+    """Cosine similarity of every row of `a` with every row of `b`; either may be quantized."""
+    if isinstance(a, QuantizedMatrix):
+        a = a.to_float32()
+    a = np.asarray(a, dtype=np.float32)
     a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-12)
+    if isinstance(b, QuantizedMatrix):
+        # Scored block by block, without materializing b as float32
+        return b.dot(a_norm) / (b.norms() + 1e-12)
+    b = np.asarray(b, dtype=np.float32)
     b_norm = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
     return a_norm @ b_norm.T
 
@@ -23,54 +42,255 @@ class RetrievedDoc:
     source: str
 
 
+def reciprocal_rank_fusion(
+    ranked: Sequence[np.ndarray], weights: Sequence[float], k: int, rrf_k: int = 60
+) -> Hits:
+    """
+    Weighted reciprocal rank fusion of ranked document-index arrays.
+
+    Work is proportional to the number of hits, not the corpus size: hits are
+    concatenated, grouped by document id with np.unique and summed with bincount.
+    """
+    ranked = [np.asarray(r, dtype=np.int64) for r in ranked]
+    ids = np.concatenate(ranked) if ranked else np.empty(0, dtype=np.int64)
+    if ids.size == 0:
+        return ids, np.empty(0, dtype=np.float64)
+    contributions = np.concatenate([
+        weight / (rrf_k + np.arange(1, len(r) + 1, dtype=np.float64))
+        for r, weight in zip(ranked, weights)
+    ])
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    fused = np.bincount(inverse, weights=contributions)
+    # Ties keep the order of first appearance, like the previous dict-based fusion
+    first_seen = np.full(unique_ids.size, ids.size, dtype=np.int64)
+    np.minimum.at(first_seen, inverse, np.arange(ids.size))
+    order = np.lexsort((first_seen, -fused))[:k]
+    return unique_ids[order], fused[order]
+
+
 class TfidfRetriever:
-    def __init__(self, documents: Sequence[Document]):
+    def __init__(
+        self,
+        documents: Sequence[Document],
+        vectorizer: Optional["TfidfVectorizer"] = None,
+        matrix=None,
+    ):
         self._documents = list(documents)
+        if vectorizer is not None and matrix is not None:
+            # Already fitted (e.g. loaded from an index snapshot)
+            self._vectorizer = vectorizer
+            self._matrix = matrix
+            return
+        # scikit-learn takes about a second to import; only pay for it once an index is built
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
         texts = [d.page_content for d in self._documents]
         self._vectorizer = TfidfVectorizer(stop_words="english")
         self._matrix = self._vectorizer.fit_transform(texts)
 
+    @classmethod
+    def from_fitted(
+        cls,
+        documents: Sequence[Document],
+        vocabulary: Dict[str, int],
+        idf: np.ndarray,
+        matrix,
+    ) -> "TfidfRetriever":
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer(stop_words="english", vocabulary=vocabulary)
+        vectorizer.idf_ = idf
+        return cls(documents, vectorizer=vectorizer, matrix=matrix)
+
+    @property
+    def vectorizer(self) -> "TfidfVectorizer":
+        return self._vectorizer
+
+    @property
+    def matrix(self):
+        return self._matrix
+
     def retrieve(self, query: str, k: int) -> List[RetrievedDoc]:
-        q = self._vectorizer.transform([query])
-        scores = (self._matrix @ q.T).toarray().reshape(-1)
-        if scores.size == 0:
-            return []
-        top_idx = np.argsort(-scores)[:k]
+        return self.retrieve_batch([query], k)[0]
+
+    def retrieve_batch(self, queries: Sequence[str], k: int) -> List[List[RetrievedDoc]]:
         return [
-            RetrievedDoc(doc=self._documents[i], score=float(scores[i]), source="tfidf")
-            for i in top_idx
-            if scores[i] > 0
+            [
+                RetrievedDoc(doc=self._documents[i], score=float(score), source="tfidf")
+                for i, score in zip(idx, scores)
+            ]
+            for idx, scores in self.search_batch(queries, k)
         ]
 
+    def search_batch(
+        self, queries: Sequence[str], k: int, rows: Optional[np.ndarray] = None
+    ) -> List[Hits]:
+        """Top-k per query, optionally only among the document indices in `rows`."""
+        with stage("tfidf"):
+            # One transform and one sparse product for every query
+            q = self._vectorizer.transform(list(queries))
+            matrix = self._matrix if rows is None else self._matrix[rows]
+            scores = (q @ matrix.T).toarray()
+            top_idx = top_k_rows(scores, k)
+            results = []
+            for row, idx in zip(scores, top_idx):
+                row_scores = row[idx]
+                keep = row_scores > 0
+                idx = idx[keep]
+                results.append((idx if rows is None else rows[idx], row_scores[keep]))
+            return results
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_sentence_model(model_name: str):
+    """Load a SentenceTransformer once per process and share it."""
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+
+                model = SentenceTransformer(model_name)
+                _models[model_name] = model
+    return model
+
+
+def register_sentence_model(model_name: str, model) -> None:
+    """
+    Use `model` (anything with SentenceTransformer's encode()) for `model_name`.
+
+    Lets offline benchmarks stand in a local encoder for a model that can't be downloaded.
+    """
+    with _models_lock:
+        _models[model_name] = model
+
 
 class SentenceTransformerRetriever:
-    def __init__(self, documents: Sequence[Document], model_name: str):
+    def __init__(
+        self,
+        documents: Sequence[Document],
+        model_name: str,
+        doc_vecs: Optional[np.ndarray] = None,
+    ):
         self._documents = list(documents)
         self._model_name = model_name
-        from sentence_transformers import SentenceTransformer
+        self._model = get_sentence_model(model_name)
+        if doc_vecs is None:
+            doc_vecs = self._model.encode(
+                [d.page_content for d in self._documents],
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            doc_vecs = np.asarray(doc_vecs, dtype=np.float32)
+        if embedding_dtype() != "float32":
+            # Searches scan the quantized copy and only rescore a few float32
+            # rows, so those can be read from disk (a snapshot's are mapped already)
+            doc_vecs = memory_map(doc_vecs)
+        # May be precomputed, e.g. memory-mapped from an index snapshot
+        self._doc_vecs = doc_vecs
+        self._index = build_vector_index(doc_vecs)
 
-        self._model = SentenceTransformer(model_name)
-        self._doc_vecs = self._model.encode(
-            [d.page_content for d in self._documents],
-            normalize_embeddings=True,
-            show_progress_bar=False,
-        )
-        self._doc_vecs = np.asarray(self._doc_vecs, dtype=np.float32)
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def doc_vecs(self) -> np.ndarray:
+        return self._doc_vecs
+
+    @property
+    def documents(self) -> List[Document]:
+        return self._documents
+
+    @property
+    def model(self):
+        return self._model
 
     def retrieve(self, query: str, k: int) -> List[RetrievedDoc]:
-        q_vec = self._model.encode(
-            [query], normalize_embeddings=True, show_progress_bar=False
-        )
-        q_vec = np.asarray(q_vec, dtype=np.float32)
-        sims = (self._doc_vecs @ q_vec.T).reshape(-1)
-        top_idx = np.argsort(-sims)[:k]
+        return self.retrieve_batch([query], k)[0]
+
+    def retrieve_batch(self, queries: Sequence[str], k: int) -> List[List[RetrievedDoc]]:
         return [
-            RetrievedDoc(
-                doc=self._documents[i], score=float(sims[i]), source="semantic"
-            )
-            for i in top_idx
+            [
+                RetrievedDoc(doc=self._documents[i], score=float(score), source="semantic")
+                for i, score in zip(idx, scores)
+            ]
+            for idx, scores in self.search_batch(queries, k)
         ]
 
+    def search_batch(
+        self, queries: Sequence[str], k: int, rows: Optional[np.ndarray] = None
+    ) -> List[Hits]:
+        """Top-k per query, optionally only among the document indices in `rows`."""
+        # One encode call (for the uncached queries) and one search for every query
+        with stage("query_embedding"):
+            cache = get_query_cache(self._model_name)
+            if cache is not None:
+                q_vecs = cache.encode(self._model, queries)
+            else:
+                q_vecs = self._model.encode(
+                    list(queries), normalize_embeddings=True, show_progress_bar=False
+                )
+                q_vecs = np.asarray(q_vecs, dtype=np.float32)
+        with stage("vector_search"):
+            return self._index.search(q_vecs, k, rows=rows)
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def reuse_embeddings(
+    documents: Sequence[Document], previous: SentenceTransformerRetriever
+) -> Tuple[np.ndarray, int]:
+    """
+    Embeddings for `documents`, copying rows from `previous` for any document
+    whose text is unchanged and encoding only the rest.
+
+    Returns the float32 embedding matrix and the number of documents encoded.
+    """
+    previous_rows = {}
+    for i, doc in enumerate(previous.documents):
+        previous_rows.setdefault(_content_hash(doc.page_content), i)
+
+    src, missing = [], []
+    for i, doc in enumerate(documents):
+        row = previous_rows.get(_content_hash(doc.page_content))
+        if row is None:
+            missing.append(i)
+        else:
+            src.append((i, row))
+
+    doc_vecs = np.empty((len(documents), previous.doc_vecs.shape[1]), dtype=np.float32)
+    if src:
+        dst_idx, src_idx = (np.asarray(col, dtype=np.int64) for col in zip(*src))
+        doc_vecs[dst_idx] = previous.doc_vecs[src_idx]
+    if missing:
+        encoded = previous.model.encode(
+            [documents[i].page_content for i in missing],
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        doc_vecs[missing] = np.asarray(encoded, dtype=np.float32)
+    return doc_vecs, len(missing)
+
+
+def _group_rows(documents: Sequence[Document], key: str) -> Dict[str, np.ndarray]:
+    """Sorted document indices for each value of a metadata field."""
+    groups: Dict[str, List[int]] = {}
+    for i, doc in enumerate(documents):
+        value = doc.metadata.get(key)
+        if value is not None:
+            groups.setdefault(value, []).append(i)
+    return {value: np.asarray(idx, dtype=np.int64) for value, idx in groups.items()}
+
+
+SparseRetriever = Union[TfidfRetriever, BM25Retriever]
+
 
 class HybridRetriever:
     def __init__(
@@ -79,14 +299,33 @@ class HybridRetriever:
         k_tfidf: int = 10,
         k_semantic: int = 10,
         semantic_model_name: Optional[str] = None,
+        tfidf: Optional[SparseRetriever] = None,
+        semantic: Optional[SentenceTransformerRetriever] = None,
+        tfidf_weight: float = 1.0,
+        semantic_weight: float = 1.0,
+        rrf_k: int = 60,
+        sparse_retriever: str = "tfidf",
     ):
+        """
+        `tfidf` is the keyword half of the fusion: a fitted TfidfRetriever or
+        BM25Retriever, or None to build the one named by `sparse_retriever`.
+        """
         self._documents = list(documents)
-        self._tfidf = TfidfRetriever(self._documents)
+        if tfidf is None:
+            if sparse_retriever == "bm25":
+                tfidf = BM25Retriever(self._documents, **bm25_settings())
+            else:
+                tfidf = TfidfRetriever(self._documents)
+        self._tfidf = tfidf
         self._k_tfidf = k_tfidf
         self._k_semantic = k_semantic
+        self._tfidf_weight = tfidf_weight
+        self._semantic_weight = semantic_weight
+        self._rrf_k = rrf_k
+        self._candidate_rows = _group_rows(self._documents, "candidate_id")
 
-        self._semantic: Optional[SentenceTransformerRetriever] = None
-        if semantic_model_name:
+        self._semantic: Optional[SentenceTransformerRetriever] = semantic
+        if semantic is None and semantic_model_name:
             try:
                 self._semantic = SentenceTransformerRetriever(
                     self._documents, semantic_model_name
@@ -97,36 +336,174 @@ class HybridRetriever:
                 )
                 self._semantic = None
 
-    def retrieve(self, query: str, k: int) -> List[Document]:
-        tfidf_hits = self._tfidf.retrieve(query, k=self._k_tfidf)
-        semantic_hits: List[RetrievedDoc] = []
-        if self._semantic is not None:
-            semantic_hits = self._semantic.retrieve(query, k=self._k_semantic)
+    @property
+    def documents(self) -> List[Document]:
+        return self._documents
 
-        # Reciprocal rank fusion (stable, simple)
-        scores = {}
+    @property
+    def tfidf(self) -> SparseRetriever:
+        """The keyword retriever (TF-IDF or BM25, see sparse_retriever)."""
+        return self._tfidf
 
-        def add_rrf(hits: List[RetrievedDoc], weight: float):
-            for rank, hit in enumerate(hits, start=1):
-                doc_id = id(hit.doc)
-                scores.setdefault(doc_id, (hit.doc, 0.0))
-                doc, cur = scores[doc_id]
-                scores[doc_id] = (doc, cur + weight * (1.0 / (60 + rank)))
+    @property
+    def sparse_retriever(self) -> str:
+        return "bm25" if isinstance(self._tfidf, BM25Retriever) else "tfidf"
 
-        add_rrf(tfidf_hits, weight=1.0)
-        add_rrf(semantic_hits, weight=1.0)
+    @property
+    def semantic(self) -> Optional[SentenceTransformerRetriever]:
+        return self._semantic
 
-        ranked = sorted(scores.values(), key=lambda x: x[1], reverse=True)
-        return [doc for doc, _score in ranked[:k]]
+    @property
+    def candidate_ids(self) -> List[str]:
+        return list(self._candidate_rows)
 
+    def rows_for_candidate(self, candidate_id: Optional[str]) -> Optional[np.ndarray]:
+        """
+        Precomputed document indices for one candidate, or None to search everything.
+
+        Raises KeyError for an unknown candidate.
+        """
+        if candidate_id is None:
+            return None
+        rows = self._candidate_rows[candidate_id]
+        # A candidate owning the whole index needs no restriction
+        return None if rows.size == len(self._documents) else rows
+
+    def retrieve(
+        self, query: str, k: int, candidate_id: Optional[str] = None
+    ) -> List[Document]:
+        return self.retrieve_batch([query], k, candidate_id=candidate_id)[0]
+
+    def retrieve_batch(
+        self, queries: Sequence[str], k: int, candidate_id: Optional[str] = None
+    ) -> List[List[Document]]:
+        return [
+            [self._documents[i] for i in idx]
+            for idx, _scores in self.search_batch(queries, k, candidate_id=candidate_id)
+        ]
 
-def build_retriever(documents: Sequence[Document]) -> HybridRetriever:
-    mode = os.getenv("RETRIEVER_MODE", "hybrid").strip().lower()
-    semantic_model = os.getenv(
+    def search_batch(
+        self,
+        queries: Sequence[str],
+        k: int,
+        candidate_id: Optional[str] = None,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Hits]:
+        """
+        Fused (document indices, RRF scores) per query, best first.
+
+        `rows` restricts the search to those document indices (e.g. the chunks
+        already retrieved in a conversation) instead of the candidate's.
+        """
+        if rows is None:
+            rows = self.rows_for_candidate(candidate_id)
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+        tfidf_hits = self._tfidf.search_batch(queries, k=self._k_tfidf, rows=rows)
+        if self._semantic is None:
+            with stage("fusion"):
+                return [
+                    reciprocal_rank_fusion([idx], [self._tfidf_weight], k, self._rrf_k)
+                    for idx, _scores in tfidf_hits
+                ]
+        semantic_hits = self._semantic.search_batch(queries, k=self._k_semantic, rows=rows)
+        with stage("fusion"):
+            return [
+                reciprocal_rank_fusion(
+                    [t_idx, s_idx],
+                    [self._tfidf_weight, self._semantic_weight],
+                    k,
+                    self._rrf_k,
+                )
+                for (t_idx, _t), (s_idx, _s) in zip(tfidf_hits, semantic_hits)
+            ]
+
+
+def hybrid_settings() -> dict:
+    """Keyword retriever, fusion weights and RRF constant for HybridRetriever, from the environment."""
+    return {
+        "tfidf_weight": float(os.getenv("HYBRID_TFIDF_WEIGHT", "1.0")),
+        "semantic_weight": float(os.getenv("HYBRID_SEMANTIC_WEIGHT", "1.0")),
+        "rrf_k": int(os.getenv("HYBRID_RRF_K", "60")),
+        "sparse_retriever": sparse_retriever_name(),
+    }
+
+
+def _retriever_mode() -> str:
+    return os.getenv("RETRIEVER_MODE", "hybrid").strip().lower()
+
+
+def sparse_retriever_name() -> str:
+    """`bm25` for RETRIEVER_MODE=bm25 or hybrid-bm25, otherwise `tfidf`."""
+    return "bm25" if _retriever_mode() in ("bm25", "hybrid-bm25") else "tfidf"
+
+
+def semantic_model_name() -> Optional[str]:
+    """Configured embedding model, or None when RETRIEVER_MODE disables semantic search."""
+    if _retriever_mode() in ("tfidf", "bm25"):
+        return None
+    return os.getenv(
         "SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2"
     ).strip()
 
-    if mode == "tfidf":
-        return HybridRetriever(documents, semantic_model_name=None)
 
-    return HybridRetriever(documents, semantic_model_name=semantic_model)
+def build_retriever(
+    documents: Sequence[Document],
+    snapshot_key: Optional[str] = None,
+    previous: Optional[HybridRetriever] = None,
+) -> HybridRetriever:
+    """
+    Build the hybrid retriever. With a snapshot_key, load a matching index
+    snapshot instead of re-fitting, and save one after a rebuild. With a
+    `previous` retriever (a reload), unchanged documents reuse its embeddings.
+    """
+    semantic_model = semantic_model_name()
+    settings = hybrid_settings()
+
+    if snapshot_key:
+        from .index_snapshot import load_snapshot, save_snapshot, snapshots_enabled
+
+        if snapshots_enabled():
+            retriever = load_snapshot(snapshot_key, documents, semantic_model, **settings)
+            if retriever is not None:
+                return retriever
+            retriever = _fit_retriever(documents, semantic_model, settings, previous)
+            if semantic_model and retriever.semantic is None:
+                # The model failed to load (e.g. offline): a snapshot without
+                # embeddings would stand in for the real index under this key
+                logger.warning("Not saving index snapshot %s without embeddings", snapshot_key)
+                return retriever
+            if save_snapshot(snapshot_key, retriever) and semantic_model and embedding_dtype() != "float32":
+                # Reopen so exact rescoring reads memory-mapped float32 vectors
+                # instead of keeping the freshly encoded copy in memory
+                reopened = load_snapshot(snapshot_key, documents, semantic_model, **settings)
+                if reopened is not None:
+                    return reopened
+            return retriever
+
+    return _fit_retriever(documents, semantic_model, settings, previous)
+
+
+def _fit_retriever(
+    documents: Sequence[Document],
+    semantic_model: Optional[str],
+    settings: Dict[str, float],
+    previous: Optional[HybridRetriever],
+) -> HybridRetriever:
+    previous_semantic = previous.semantic if previous is not None else None
+    if (
+        semantic_model
+        and previous_semantic is not None
+        and previous_semantic.model_name == semantic_model
+    ):
+        # The keyword index is refit from scratch (idf depends on every document); only
+        # new or edited documents go through the embedding model
+        doc_vecs, embedded = reuse_embeddings(documents, previous_semantic)
+        logger.info(
+            "Incremental index build: embedded %d, reused %d of %d documents",
+            embedded, len(documents) - embedded, len(documents),
+        )
+        semantic = SentenceTransformerRetriever(documents, semantic_model, doc_vecs=doc_vecs)
+        return HybridRetriever(documents, semantic=semantic, **settings)
+
+    return HybridRetriever(documents, semantic_model_name=semantic_model, **settings)
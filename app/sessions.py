@@ -0,0 +1,400 @@
+"""
+Multi-turn conversation sessions for /ask.
+
+A session is a small JSON-serializable dict:
+
+    {"session_id", "candidate_id", "index": <fingerprint of the index the rows belong to>,
+     "summary": [str, ...], "turns": [{"question", "answer"}, ...], "rows": [int, ...],
+     "topic": str, "updated_at": float}
+
+The last SESSION_RECENT_TURNS turns are kept word for word. Older turns are
+compacted into one summary line each (the question and the first sentence of
+the answer), and the summary keeps only its newest SESSION_SUMMARY_CHARS.
+`rows` are the indices of the chunks retrieved for the session so far, newest
+last, capped at SESSION_MAX_CHUNKS. Follow-up questions that only refer back
+("where was that?") are answered from these rows instead of searching the
+whole index, with the last question that did search it (`topic`) lending them
+their subject; questions that refer back but name something new ("which tools
+did she use there?") rank these rows and the whole index together. A session is compacted
+until its JSON fits in SESSION_MAX_BYTES.
+
+Stores are bounded like the answer cache: at most SESSION_MAX_SESSIONS, least
+recently used first out, and each expires SESSION_TTL_SECONDS after its last
+turn. The `sqlite` backend is shared by every worker on the machine, so a
+conversation can continue on any worker.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from .bm25 import tokenize
+from .cv_data import get_cache_dir
+from .metrics import CallbackMetric, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# References back to an earlier turn ("where was that?", "tell me more"). Not
+# they/them/their: in questions about a candidate those usually mean the candidate
+_FOLLOW_UP_RE = re.compile(
+    r"\b(it|its|that|this(?! candidate| person)|those|these|there|the same|such|"
+    r"more|else|elaborate|which one|how so|what about)\b",
+    re.IGNORECASE,
+)
+# Words that ask for more without naming a subject of their own
+_FOLLOW_UP_WORDS = frozenset("""
+tell explain describe elaborate mean meant say said give example examples detail details
+exactly else one ones thing things part kind sort why
+""".split())
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+SESSION_RETRIEVALS = Counter(
+    "cv_agent_session_retrievals_total",
+    "Retrievals for questions in a session, by where the chunks came from (session, fused, index)",
+    ["source"],
+)
+SESSION_BYTES = Histogram(
+    "cv_agent_session_size_bytes",
+    "Serialized size of a session each time it is saved",
+    buckets=(512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+
+
+def session_settings() -> Dict[str, float]:
+    return {
+        "recent_turns": int(os.getenv("SESSION_RECENT_TURNS", "3")),
+        "summary_chars": int(os.getenv("SESSION_SUMMARY_CHARS", "800")),
+        "answer_chars": int(os.getenv("SESSION_ANSWER_CHARS", "1200")),
+        "max_chunks": int(os.getenv("SESSION_MAX_CHUNKS", "48")),
+        "max_bytes": int(os.getenv("SESSION_MAX_BYTES", "16384")),
+    }
+
+
+def new_session(candidate_id: Optional[str], index: str) -> dict:
+    return {
+        "session_id": uuid.uuid4().hex,
+        "candidate_id": candidate_id,
+        "index": index,
+        "summary": [],
+        "turns": [],
+        "rows": [],
+        "topic": "",
+        "updated_at": time.time(),
+    }
+
+
+def has_history(session: Optional[dict]) -> bool:
+    return bool(session and (session["turns"] or session["summary"]))
+
+
+def new_subject_words(session: dict, question: str) -> List[str]:
+    """Content words of `question` that the conversation hasn't mentioned ("docker" in "does she know docker?")"""
+    known = set(tokenize(" ".join(
+        [session.get("topic") or ""] + [turn["question"] for turn in session["turns"]]
+    )))
+    return [word for word in tokenize(question) if word not in known and word not in _FOLLOW_UP_WORDS]
+
+
+def refers_back(session: Optional[dict], question: str) -> bool:
+    """Whether `question` points back at the conversation and the session has chunks to reuse"""
+    if not session or not session["rows"] or not session["turns"]:
+        return False
+    if len(question.split()) > 16:
+        return False
+    # "Why?", "And then?": nothing but a nudge to go on
+    return _FOLLOW_UP_RE.search(question) is not None or not new_subject_words(session, question)
+
+
+def is_follow_up(session: Optional[dict], question: str) -> bool:
+    """
+    Whether `question` only refers back ("where was that?", "what did she do
+    there?"), naming no new subject, so the session's chunks can answer it.
+
+    "Which tools did she use there?" refers back but asks about something new;
+    "What is their education?" starts a new topic.
+    """
+    return refers_back(session, question) and not new_subject_words(session, question)
+
+
+def follow_up_query(session: dict, question: str) -> str:
+    """A follow-up on its own ("where was that?") lacks the subject; borrow the topic's"""
+    topic = session.get("topic") or session["turns"][-1]["question"]
+    return f"{topic} {question}"
+
+
+def session_rows(session: dict, index: str) -> List[int]:
+    """The session's retrieved chunk indices, if they still belong to the serving index"""
+    if session["index"] != index:
+        session["index"] = index
+        session["rows"] = []
+    return session["rows"]
+
+
+def render_conversation(session: Optional[dict]) -> str:
+    """The conversation so far, for the prompt ("" outside a session or on its first turn)"""
+    if not has_history(session):
+        return ""
+    lines = ["**Conversation so far:**"]
+    if session["summary"]:
+        lines.append("Earlier:")
+        lines.extend(session["summary"])
+    for turn in session["turns"]:
+        lines.append(f"Recruiter: {turn['question']}")
+        lines.append(f"Assistant: {turn['answer']}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _summary_line(turn: dict) -> str:
+    answer = _WHITESPACE_RE.sub(" ", turn["answer"]).strip()
+    first_sentence = _SENTENCE_END_RE.split(answer, 1)[0]
+    return f"- {turn['question'][:160]} -> {first_sentence[:200]}"
+
+
+def _trim_summary(summary: List[str], max_chars: int) -> List[str]:
+    kept, total = [], 0
+    for line in reversed(summary):
+        total += len(line) + 1
+        if total > max_chars:
+            break
+        kept.append(line)
+    return kept[::-1]
+
+
+def _size(session: dict) -> int:
+    return len(json.dumps(session, ensure_ascii=False).encode("utf-8"))
+
+
+def compact(session: dict, settings: Optional[Dict[str, float]] = None) -> int:
+    """Fold old turns into the summary and trim until the session fits; returns its size in bytes"""
+    settings = settings or session_settings()
+    while len(session["turns"]) > settings["recent_turns"]:
+        session["summary"].append(_summary_line(session["turns"].pop(0)))
+    session["summary"] = _trim_summary(session["summary"], settings["summary_chars"])
+    session["rows"] = session["rows"][-settings["max_chunks"]:]
+
+    size = _size(session)
+    # Over the cap: give up verbatim turns, then reusable chunks, then summary lines
+    while size > settings["max_bytes"] and session["turns"]:
+        session["summary"].append(_summary_line(session["turns"].pop(0)))
+        session["summary"] = _trim_summary(session["summary"], settings["summary_chars"])
+        size = _size(session)
+    while size > settings["max_bytes"] and session["rows"]:
+        session["rows"] = session["rows"][len(session["rows"]) // 2 + 1:]
+        size = _size(session)
+    while size > settings["max_bytes"] and session["summary"]:
+        session["summary"].pop(0)
+        size = _size(session)
+    return size
+
+
+def record_turn(session: dict, question: str, answer: str, rows: Iterable[int] = ()) -> None:
+    """Append a turn (and the chunks its answer was based on) and save the session."""
+    settings = session_settings()
+    session["turns"].append({"question": question, "answer": answer[:settings["answer_chars"]]})
+    known = set(session["rows"])
+    for row in rows:
+        row = int(row)
+        if row in known:
+            # Move to the end: recently used chunks are kept longest
+            session["rows"].remove(row)
+        session["rows"].append(row)
+        known.add(row)
+    session["updated_at"] = time.time()
+    SESSION_BYTES.observe(compact(session, settings))
+    get_session_store().save(session)
+
+
+class MemorySessionStore:
+    """Per-process LRU of sessions with a TTL."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self._max_sessions = max_sessions
+        self._ttl = ttl_seconds
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.time():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+        # A copy: concurrent requests in one session don't share a mutable dict
+        return json.loads(data)
+
+    def save(self, session: dict) -> None:
+        data = json.dumps(session, ensure_ascii=False)
+        with self._lock:
+            self._sessions[session["session_id"]] = (time.time() + self._ttl, data)
+            self._sessions.move_to_end(session["session_id"])
+            while len(self._sessions) > self._max_sessions:
+                self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(len(data) for _expires, data in self._sessions.values()),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+
+class SQLiteSessionStore:
+    """LRU of sessions with a TTL in a SQLite file, shared by every worker on the machine."""
+
+    def __init__(self, path: str, max_sessions: int, ttl_seconds: float):
+        self._path = path
+        self._max_sessions = max_sessions
+        self._ttl = ttl_seconds
+        self._local = threading.local()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[dict]:
+        try:
+            return self._get(session_id)
+        except sqlite3.Error:
+            logger.exception("Session read failed")
+            return None
+
+    def save(self, session: dict) -> None:
+        try:
+            self._save(session)
+        except sqlite3.Error:
+            logger.exception("Session write failed")
+
+    def _get(self, session_id: str) -> Optional[dict]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data, expires_at = row
+        if expires_at < now:
+            with conn:
+                conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return None
+        return json.loads(data)
+
+    def _save(self, session: dict) -> None:
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (session["session_id"], json.dumps(session, ensure_ascii=False), now + self._ttl, now),
+            )
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                " SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self._max_sessions,),
+            )
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            count, total = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions"
+            ).fetchone()
+        except sqlite3.Error:
+            return {"sessions": 0, "bytes": 0}
+        return {"sessions": count, "bytes": total}
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM sessions")
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def build_session_store():
+    backend = os.getenv("SESSION_BACKEND", "memory").strip().lower()
+    max_sessions = int(os.getenv("SESSION_MAX_SESSIONS", "1024"))
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+
+    if backend == "sqlite":
+        path = os.getenv("SESSION_PATH") or os.path.join(get_cache_dir(), "sessions.sqlite3")
+        try:
+            return SQLiteSessionStore(path, max_sessions, ttl_seconds)
+        except sqlite3.Error:
+            logger.exception("Failed to open SQLite session store at %s; falling back to memory", path)
+    return MemorySessionStore(max_sessions, ttl_seconds)
+
+
+def get_session_store():
+    global _session_store
+
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = build_session_store()
+    return _session_store
+
+
+def open_session(session_id: Optional[str], candidate_id: Optional[str], index: str) -> dict:
+    """
+    The session to continue, or a new one if `session_id` is empty, unknown,
+    expired or about another candidate
+    """
+    session = get_session_store().get(session_id) if session_id else None
+    if session is None or session["candidate_id"] != candidate_id:
+        session = new_session(candidate_id, index)
+    return session
+
+
+def _session_stats(key: str):
+    def collect():
+        store = _session_store
+        return {} if store is None else {(): store.stats()[key]}
+    return collect
+
+
+CallbackMetric(
+    "cv_agent_sessions", "Conversation sessions held by this store", [], _session_stats("sessions")
+)
+CallbackMetric(
+    "cv_agent_session_memory_bytes",
+    "Total serialized size of the stored sessions",
+    [],
+    _session_stats("bytes"),
+)
@@ -0,0 +1,404 @@
+"""
+Nearest-neighbour indexes over normalized document embeddings.
+
+ExactIndex scores every document (one matrix product) and is the default.
+IVFIndex is an inverted-file index in pure NumPy. Spherical k-means splits
+the documents into IVF_NLIST clusters, and a query scores only the documents
+in its IVF_NPROBE closest clusters, so each query touches about
+nprobe / nlist of the corpus. In float32, IVF scores the probed lists straight
+from the shared vectors rather than keeping a second copy. Recall and latency
+against the exact index are reported by benchmarks/vector_index.py.
+
+Both can store the vectors they scan as float16 or int8 with a per-vector
+scale (EMBEDDING_DTYPE). The quantized matrix is used for a first pass over
+EMBEDDING_RESCORE_FACTOR * k candidates. Those are then rescored exactly
+against the float32 vectors, which are memory-mapped (from the index
+snapshot, or else from a temporary file, see memory_map()), so they stay out
+of each worker's private memory.
+
+Selected with VECTOR_INDEX=exact|ivf.
+"""
+import logging
+import math
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (document indices, scores), best first
+Hits = Tuple[np.ndarray, np.ndarray]
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores in each row, best first.
+
+    argpartition selects the top k in O(n) per row; only those k are sorted.
+    """
+    n = scores.shape[1]
+    if k <= 0 or n == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+# Rows converted to float32 at a time when scoring a quantized matrix
+_BLOCK_ROWS = 16384
+
+
+def embedding_dtype() -> str:
+    """Storage type for searched embeddings: EMBEDDING_DTYPE, default float32."""
+    dtype = os.getenv("EMBEDDING_DTYPE", "float32").strip().lower()
+    if dtype not in EMBEDDING_DTYPES:
+        logger.warning("Unknown EMBEDDING_DTYPE=%r; using float32", dtype)
+        return "float32"
+    return dtype
+
+
+def rescore_factor() -> int:
+    """First-pass candidates per requested result: EMBEDDING_RESCORE_FACTOR, default 4."""
+    return max(1, int(os.getenv("EMBEDDING_RESCORE_FACTOR", "4")))
+
+
+class QuantizedMatrix:
+    """
+    Row vectors stored as float32, float16, or int8 with one float32 scale per row
+    (row ~= data * scale, with data in [-127, 127]).
+    """
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.data = data
+        self.scales = scales
+
+    @classmethod
+    def from_float32(
+        cls, vecs: np.ndarray, dtype: str, order: Optional[np.ndarray] = None
+    ) -> "QuantizedMatrix":
+        """`vecs` (or its rows in `order`) converted a block at a time, never copied whole as float32."""
+        n = vecs.shape[0] if order is None else len(order)
+        if dtype == "float32":
+            return cls(np.ascontiguousarray(vecs if order is None else vecs[order], dtype=np.float32))
+        data = np.empty((n, vecs.shape[1]), dtype=np.float16 if dtype == "float16" else np.int8)
+        scales = None if dtype == "float16" else np.empty(n, dtype=np.float32)
+        for start in range(0, n, _BLOCK_ROWS):
+            rows = slice(start, start + _BLOCK_ROWS) if order is None else order[start:start + _BLOCK_ROWS]
+            block = np.asarray(vecs[rows], dtype=np.float32)
+            if scales is None:
+                data[start:start + _BLOCK_ROWS] = block
+                continue
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            data[start:start + _BLOCK_ROWS] = np.rint(block / scale[:, None])
+            scales[start:start + _BLOCK_ROWS] = scale
+        return cls(data, scales)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def dtype(self) -> str:
+        return self.data.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def take(self, rows) -> "QuantizedMatrix":
+        """Subset of rows (an index array or a slice)."""
+        return QuantizedMatrix(
+            self.data[rows], self.scales[rows] if self.scales is not None else None
+        )
+
+    def to_float32(self) -> np.ndarray:
+        out = np.asarray(self.data, dtype=np.float32)
+        if self.scales is not None:
+            out *= self.scales[:, None]
+        return out
+
+    def norms(self) -> np.ndarray:
+        """L2 norm of every (dequantized) row."""
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), _BLOCK_ROWS):
+            block = np.asarray(self.data[start:start + _BLOCK_ROWS], dtype=np.float32)
+            out[start:start + _BLOCK_ROWS] = np.linalg.norm(block, axis=1)
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def dot(self, q_vecs: np.ndarray) -> np.ndarray:
+        """(queries, rows) inner products, converting at most _BLOCK_ROWS rows at a time."""
+        if self.data.dtype == np.float32:
+            return q_vecs @ self.data.T
+        out = np.empty((q_vecs.shape[0], len(self)), dtype=np.float32)
+        for start in range(0, len(self), _BLOCK_ROWS):
+            block = np.asarray(self.data[start:start + _BLOCK_ROWS], dtype=np.float32)
+            out[:, start:start + _BLOCK_ROWS] = q_vecs @ block.T
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+
+def _rescore(
+    doc_vecs: np.ndarray, q_vec: np.ndarray, candidates: np.ndarray, k: int
+) -> Hits:
+    """Exact float32 top-k among `candidates` (document indices)."""
+    # Sorted ids keep memory-mapped reads sequential
+    candidates = np.sort(candidates)
+    sims = np.asarray(doc_vecs[candidates], dtype=np.float32) @ q_vec
+    top = top_k_rows(sims[None, :], k)[0]
+    return candidates[top], sims[top]
+
+
+def memory_map(vecs: np.ndarray) -> np.ndarray:
+    """
+    `vecs` memory-mapped from a temporary .npy under get_cache_dir(), so the
+    float32 rescoring vectors stay out of private memory without an index
+    snapshot. The file is unlinked at once (the mapping keeps it alive, and
+    forked workers share its pages). Returns `vecs` itself if that fails.
+    """
+    if isinstance(vecs, np.memmap):
+        return vecs
+    from .cv_data import get_cache_dir
+
+    try:
+        directory = os.path.join(get_cache_dir(), "vectors")
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npy", delete=False) as f:
+            path = f.name
+            np.save(f, np.ascontiguousarray(vecs, dtype=np.float32))
+        mapped = np.load(path, mmap_mode="r")
+    except OSError:
+        logger.warning("Could not memory-map the float32 vectors; keeping them in memory", exc_info=True)
+        return vecs
+    try:
+        os.unlink(path)
+    except OSError:
+        # Windows can't unlink a mapped file; it is left in the cache directory
+        pass
+    return mapped
+
+
+def _log_storage(name: str, doc_vecs: np.ndarray, stored: QuantizedMatrix) -> None:
+    if stored.dtype == "float32":
+        return
+    if isinstance(doc_vecs, np.memmap):
+        logger.info(
+            "%s: %s embeddings use %.1f MB in memory; float32 rescoring reads memory-mapped vectors",
+            name, stored.dtype, stored.nbytes / 1e6,
+        )
+    else:
+        logger.info(
+            "%s: %s embeddings use %.1f MB, but the float32 vectors are also in memory",
+            name, stored.dtype, stored.nbytes / 1e6,
+        )
+
+
+class ExactIndex:
+    """
+    Brute-force inner product over every (or every allowed) document.
+
+    With a quantized dtype, the full scan uses the quantized copy and the best
+    `rescore_factor * k` are rescored against the float32 `doc_vecs`.
+    """
+
+    def __init__(self, doc_vecs: np.ndarray, dtype: str = "float32", rescore_factor: int = 4):
+        self._doc_vecs = doc_vecs
+        self._rescore_factor = rescore_factor
+        self._stored = None
+        if dtype != "float32":
+            self._stored = QuantizedMatrix.from_float32(doc_vecs, dtype)
+            _log_storage("Exact index", doc_vecs, self._stored)
+
+    def __len__(self) -> int:
+        return self._doc_vecs.shape[0]
+
+    def search(
+        self, q_vecs: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> List[Hits]:
+        """Top-k (document indices, scores) per query, optionally only among `rows`."""
+        if self._stored is None:
+            doc_vecs = self._doc_vecs if rows is None else self._doc_vecs[rows]
+            sims = q_vecs @ doc_vecs.T
+            top_idx = top_k_rows(sims, k)
+            return [
+                (idx if rows is None else rows[idx], row[idx])
+                for row, idx in zip(sims, top_idx)
+            ]
+
+        stored = self._stored if rows is None else self._stored.take(rows)
+        approx = stored.dot(q_vecs)
+        first_pass = top_k_rows(approx, k * self._rescore_factor)
+        return [
+            _rescore(self._doc_vecs, q_vec, idx if rows is None else rows[idx], k)
+            for q_vec, idx in zip(q_vecs, first_pass)
+        ]
+
+
+def _spherical_kmeans(
+    vecs: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    centroids = vecs[rng.choice(vecs.shape[0], size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vecs @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vecs)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points
+            sums[empty] = vecs[rng.choice(vecs.shape[0], size=int(empty.sum()))]
+        centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-12)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: documents grouped by nearest centroid. A quantized
+    `dtype` is stored in list order (one contiguous block per list), so probing
+    a list is a slice rather than a gather; float32 probes gather rows of
+    `doc_vecs` itself instead of keeping a second float32 copy.
+    """
+
+    def __init__(
+        self,
+        doc_vecs: np.ndarray,
+        nlist: int,
+        nprobe: int,
+        train_size: int = 64,
+        iterations: int = 10,
+        seed: int = 0,
+        dtype: str = "float32",
+        rescore_factor: int = 4,
+    ):
+        self._doc_vecs = doc_vecs
+        self._rescore_factor = rescore_factor
+        n = doc_vecs.shape[0]
+        self._nlist = max(1, min(nlist, n))
+        self._nprobe = max(1, min(nprobe, self._nlist))
+
+        rng = np.random.default_rng(seed)
+        # Train on a sample (about train_size points per list), then assign everything
+        sample_size = min(n, self._nlist * train_size)
+        sample_idx = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = np.asarray(doc_vecs[sample_idx], dtype=np.float32)
+        self._centroids = _spherical_kmeans(sample, self._nlist, iterations, rng)
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            block = np.asarray(doc_vecs[start:start + 8192], dtype=np.float32)
+            assign[start:start + 8192] = np.argmax(block @ self._centroids.T, axis=1)
+        self._order = np.argsort(assign, kind="stable")
+        self._offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assign, minlength=self._nlist))]
+        )
+        self._list_vecs = None
+        if dtype != "float32":
+            self._list_vecs = QuantizedMatrix.from_float32(doc_vecs, dtype, order=self._order)
+            _log_storage("IVF index", doc_vecs, self._list_vecs)
+
+    def __len__(self) -> int:
+        return self._doc_vecs.shape[0]
+
+    @property
+    def nlist(self) -> int:
+        return self._nlist
+
+    @property
+    def nprobe(self) -> int:
+        return self._nprobe
+
+    def _exact(self, q_vec: np.ndarray, k: int, rows: Optional[np.ndarray]) -> Hits:
+        candidates = rows if rows is not None else np.arange(len(self))
+        return _rescore(self._doc_vecs, q_vec, candidates, k)
+
+    def search(
+        self, q_vecs: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> List[Hits]:
+        """Approximate top-k per query, optionally only among `rows`."""
+        if rows is not None and rows.size * self._nlist <= len(self) * self._nprobe:
+            # Fewer allowed documents than a probe would scan: exact is cheaper
+            return [self._exact(q_vec, k, rows) for q_vec in q_vecs]
+        probe = top_k_rows(q_vecs @ self._centroids.T, self._nprobe)
+        allowed = None
+        if rows is not None:
+            allowed = np.zeros(len(self), dtype=bool)
+            allowed[rows] = True
+
+        results: List[Hits] = []
+        for q_vec, lists in zip(q_vecs, probe):
+            spans = [slice(self._offsets[c], self._offsets[c + 1]) for c in lists]
+            candidates = np.concatenate([self._order[span] for span in spans])
+            if self._list_vecs is None:
+                if isinstance(self._doc_vecs, np.memmap):
+                    # Sorted ids keep memory-mapped reads sequential
+                    candidates = np.sort(candidates)
+                sims = np.asarray(self._doc_vecs[candidates], dtype=np.float32) @ q_vec
+            else:
+                sims = np.concatenate(
+                    [self._list_vecs.take(span).dot(q_vec[None, :])[0] for span in spans]
+                )
+            if allowed is not None:
+                keep = allowed[candidates]
+                candidates, sims = candidates[keep], sims[keep]
+            if candidates.size < k:
+                # Too few documents in the probed lists (e.g. a small
+                # candidate's rows): score every allowed document instead
+                results.append(self._exact(q_vec, k, rows))
+                continue
+            if self._list_vecs is None:
+                top = top_k_rows(sims[None, :], k)[0]
+                results.append((candidates[top], sims[top]))
+            else:
+                top = top_k_rows(sims[None, :], k * self._rescore_factor)[0]
+                results.append(_rescore(self._doc_vecs, q_vec, candidates[top], k))
+        return results
+
+
+def vector_index_settings() -> dict:
+    """Index type and IVF parameters, from the environment."""
+    return {
+        "kind": os.getenv("VECTOR_INDEX", "exact").strip().lower(),
+        "nlist": int(os.getenv("IVF_NLIST", "0")),
+        "nprobe": int(os.getenv("IVF_NPROBE", "8")),
+        "dtype": embedding_dtype(),
+        "rescore_factor": rescore_factor(),
+    }
+
+
+def build_vector_index(doc_vecs: np.ndarray):
+    """
+    Index for `doc_vecs` as configured by VECTOR_INDEX / IVF_NLIST / IVF_NPROBE
+    / EMBEDDING_DTYPE / EMBEDDING_RESCORE_FACTOR.
+
+    IVF_NLIST=0 (the default) picks about sqrt(n) lists. Corpora too small
+    for that to pay off always get the exact index.
+    """
+    settings = vector_index_settings()
+    storage = {"dtype": settings["dtype"], "rescore_factor": settings["rescore_factor"]}
+    n = doc_vecs.shape[0]
+    if settings["kind"] != "ivf":
+        if settings["kind"] != "exact":
+            logger.warning("Unknown VECTOR_INDEX=%r; using exact search", settings["kind"])
+        return ExactIndex(doc_vecs, **storage)
+
+    nlist = settings["nlist"] or int(math.sqrt(n))
+    if nlist < 2 or n < nlist * 4:
+        return ExactIndex(doc_vecs, **storage)
+    index = IVFIndex(doc_vecs, nlist=nlist, nprobe=settings["nprobe"], **storage)
+    logger.info(
+        "Built IVF index over %d documents (nlist=%d, nprobe=%d)", n, index.nlist, index.nprobe
+    )
+    return index
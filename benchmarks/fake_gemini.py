@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini REST API, with configurable latency and failures (offline).
+
+Answers `POST /v1beta/models/<model>:generateContent` and
+`:streamGenerateContent` the way generativelanguage.googleapis.com does, so
+the app's own client talks to it unchanged once pointed here:
+
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8090 GEMINI_TRANSPORT=rest GEMINI_API_KEY=fake
+
+Each call sleeps for a latency drawn from --latency (fixed, uniform,
+exponential or lognormal around --latency-ms), plus --ms-per-1k-prompt-tokens
+for every 1000 prompt tokens (about 4 characters each), so longer prompts
+answer more slowly. A fraction --failure-rate of
+calls fail with --failure-status (429, 500 or 503, as Google reports them)
+and a fraction --hang-rate never answer within --hang-seconds, to exercise
+client timeouts. Streamed answers are split into --stream-chunks chunks
+spread over the latency. GET /stats returns call counts and latencies.
+
+Usage:
+    python benchmarks/fake_gemini.py [--port 8090] [--latency-ms 800] [--latency lognormal]
+        [--ms-per-1k-prompt-tokens 0] [--failure-rate 0.02] [--failure-status 503]
+        [--hang-rate 0] [--seed 0]
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$")
+
+_QUESTION = re.compile(r"\*\*Question:\*\*(.*)")
+
+_STATUS_NAMES = {
+    400: "INVALID_ARGUMENT",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+class Behaviour:
+    """Latency and failure distribution shared by every request handler thread"""
+
+    def __init__(self, latency, latency_ms, failure_rate, failure_status,
+                 hang_rate, hang_seconds, stream_chunks, seed, ms_per_1k_prompt_tokens=0.0):
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.ms_per_1k_prompt_tokens = ms_per_1k_prompt_tokens
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.stream_chunks = max(1, stream_chunks)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {"generateContent": 0, "streamGenerateContent": 0}
+        self.outcomes = {"ok": 0, "failed": 0, "hung": 0}
+        self.latencies_ms = []
+
+    def draw(self, prompt=""):
+        """(outcome, latency in seconds) for one call with this prompt"""
+        with self._lock:
+            roll = self._rng.random()
+            mean = self.latency_ms / 1000
+            if self.latency == "fixed":
+                latency = mean
+            elif self.latency == "uniform":
+                latency = self._rng.uniform(0, 2 * mean)
+            elif self.latency == "exponential":
+                latency = self._rng.expovariate(1 / mean) if mean > 0 else 0.0
+            else:
+                # Median `mean`, with the long right tail typical of LLM latency
+                latency = mean * math.exp(self._rng.gauss(0, 0.5))
+        latency += len(prompt) / 4 / 1000 * self.ms_per_1k_prompt_tokens / 1000
+        if roll < self.hang_rate:
+            return "hung", self.hang_seconds
+        if roll < self.hang_rate + self.failure_rate:
+            return "failed", latency
+        return "ok", latency
+
+    def record(self, method, outcome, latency):
+        with self._lock:
+            self.calls[method] += 1
+            self.outcomes[outcome] += 1
+            self.latencies_ms.append(latency * 1000)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+
+            def pct(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1) if latencies else None
+
+            return {
+                "calls": dict(self.calls),
+                "outcomes": dict(self.outcomes),
+                "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+            }
+
+
+def _prompt_text(body):
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if isinstance(part, dict) and "text" in part:
+                parts.append(part["text"])
+    return "\n".join(parts)
+
+
+def _answer_text(prompt):
+    # The app's prompts end with "**Question:** ..." (then the answer cue)
+    match = _QUESTION.search(prompt)
+    question = match.group(1).strip() if match else "your question"
+    return (
+        f"This is a stand-in answer from the fake Gemini server to \"{question[:200]}\" "
+        f"(prompt of {len(prompt)} characters)."
+    )
+
+
+def _candidate(text, finished=True):
+    candidate = {
+        "content": {"parts": [{"text": text}], "role": "model"},
+        "index": 0,
+        "safetyRatings": [],
+    }
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+def make_handler(behaviour):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send_json(200, behaviour.stats())
+            else:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        def do_POST(self):
+            match = _PATH.match(self.path.split("?", 1)[0])
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if match is None:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+                return
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": {"code": 400, "message": "Invalid JSON", "status": "INVALID_ARGUMENT"}})
+                return
+
+            method = match.group("method")
+            prompt = _prompt_text(body)
+            outcome, latency = behaviour.draw(prompt)
+            behaviour.record(method, outcome, latency)
+            if outcome != "ok":
+                time.sleep(latency)
+                status = behaviour.failure_status if outcome == "failed" else 504
+                self._send_json(status, {"error": {
+                    "code": status,
+                    "message": f"Fake Gemini server: injected {outcome} call",
+                    "status": _STATUS_NAMES.get(status, "UNKNOWN"),
+                }})
+                return
+
+            text = _answer_text(prompt)
+            if method == "generateContent":
+                time.sleep(latency)
+                self._send_json(200, _candidate(text))
+            else:
+                self._stream(text, latency)
+
+        def _stream(self, text, latency):
+            # The REST client reads one JSON array whose elements arrive over time
+            words = text.split(" ")
+            n = min(behaviour.stream_chunks, len(words))
+            size = math.ceil(len(words) / n)
+            chunks = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, chunk in enumerate(chunks):
+                time.sleep(latency / len(chunks))
+                element = json.dumps(_candidate(chunk.rstrip() if i == len(chunks) - 1 else chunk,
+                                                finished=i == len(chunks) - 1))
+                self._write_chunk(("[" if i == 0 else ",\r\n") + element)
+            self._write_chunk("]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, text):
+            data = text.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(host, port, behaviour):
+    """Start the server on a daemon thread; returns it (server.shutdown() to stop)"""
+    server = ThreadingHTTPServer((host, port), make_handler(behaviour))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "exponential", "lognormal"],
+                        default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Median/mean latency per call")
+    parser.add_argument("--ms-per-1k-prompt-tokens", type=float, default=0.0,
+                        help="Extra latency per 1000 prompt tokens")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, choices=[429, 500, 503], default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behaviour = Behaviour(
+        args.latency, args.latency_ms, args.failure_rate, args.failure_status,
+        args.hang_rate, args.hang_seconds, args.stream_chunks, args.seed,
+        args.ms_per_1k_prompt_tokens,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(behaviour))
+    server.daemon_threads = True
+    print(json.dumps({"listening": f"http://{args.host}:{args.port}", **vars(args)}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(behaviour.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
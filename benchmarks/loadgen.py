@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Load generator for /ask: replays a question log at a set concurrency or arrival rate.
+
+Questions come from a JSONL log (one {"question": ..., "candidate_id": ...}
+object per line; --field picks another key, and plain-text lines are taken
+as questions) or from a built-in list, replayed in order and cycled. Two
+load models:
+
+  closed loop (default)   --concurrency clients, each sending its next
+                          request as soon as the previous one returns
+  open loop (--rate R)    requests start on a Poisson (or --arrival uniform)
+                          schedule of R per second, whatever the server's
+                          latency, with at most --concurrency in flight
+
+Reports latency percentiles (p50/p95/p99/max), throughput, error rate,
+status codes and answer-cache hits as JSON. In open loop, latency also
+counts time a request waited for a free client slot past its scheduled
+start, so an overloaded server can't hide its queueing
+(coordinated omission).
+
+Pair it with benchmarks/fake_gemini.py to load-test the whole stack offline:
+
+    python benchmarks/fake_gemini.py --latency-ms 800 --failure-rate 0.01 &
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8090 GEMINI_API_KEY=fake \\
+        gunicorn -c gunicorn.conf.py wsgi:app &
+    python benchmarks/loadgen.py --url http://127.0.0.1:8080 --rate 20 --duration 60
+
+Usage:
+    python benchmarks/loadgen.py [--url http://127.0.0.1:8080] [--log questions.jsonl]
+        [--concurrency 16] [--rate 0] [--duration 30 | --requests N] [--unique] [--out run.json]
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_QUESTIONS = [
+    "What are Ahlam's top skills?",
+    "Where is she working now?",
+    "Tell me about her work experience at Omantel",
+    "What education does she have?",
+    "What programming languages does she know?",
+    "What are her achievements and awards?",
+    "How many years of experience does she have?",
+    "Tell me about her experience with machine learning",
+    "Has she worked with time series forecasting?",
+    "What languages does she speak?",
+]
+
+
+def load_questions(path, field):
+    """[{"question": str, "candidate_id": str or None}] from a JSONL (or plain-text) log"""
+    if not path:
+        return [{"question": q, "candidate_id": None} for q in DEFAULT_QUESTIONS]
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line
+            if isinstance(record, dict):
+                question = record.get(field)
+                candidate_id = record.get("candidate_id")
+            else:
+                question, candidate_id = str(record), None
+            if isinstance(question, str) and question.strip():
+                entries.append({"question": question.strip(), "candidate_id": candidate_id})
+    if not entries:
+        raise SystemExit(f"No questions found in {path} (field {field!r})")
+    return entries
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies_ms = []
+        self.statuses = Counter()
+        self.cache = Counter()
+        self.errors = Counter()
+
+    def record(self, latency_ms, status=None, cache=None, error=None):
+        with self._lock:
+            self.latencies_ms.append(latency_ms)
+            if status is not None:
+                self.statuses[str(status)] += 1
+            if cache:
+                self.cache[cache] += 1
+            if error is not None:
+                self.errors[error] += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies_ms)
+        total = len(latencies)
+        ok = sum(n for status, n in self.statuses.items() if status.startswith("2"))
+
+        def pct(p):
+            return round(latencies[min(total - 1, int(p * total))], 1) if latencies else None
+
+        return {
+            "requests": total,
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else None,
+            "success_rps": round(ok / elapsed, 2) if elapsed > 0 else None,
+            "error_rate": round((total - ok) / total, 4) if total else None,
+            "latency_ms": {
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+                "max": round(latencies[-1], 1) if latencies else None,
+                "mean": round(sum(latencies) / total, 1) if latencies else None,
+            },
+            "status_codes": dict(sorted(self.statuses.items())),
+            "answer_cache": dict(self.cache),
+            "client_errors": dict(self.errors),
+        }
+
+
+_local = threading.local()
+
+
+def _session():
+    # One keep-alive connection per client thread
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def send(url, entry, timeout, recorder, scheduled=None, nonce=None):
+    """One /ask request; latency is measured from `scheduled` when given (open loop)"""
+    origin = scheduled if scheduled is not None else time.perf_counter()
+    question = entry["question"] if nonce is None else f"{entry['question']} (load test {nonce})"
+    payload = {"question": question}
+    if entry.get("candidate_id"):
+        payload["candidate_id"] = entry["candidate_id"]
+    try:
+        response = _session().post(url, json=payload, timeout=timeout)
+        response.content
+    except requests.RequestException as e:
+        recorder.record((time.perf_counter() - origin) * 1000, error=type(e).__name__)
+        return
+    recorder.record(
+        (time.perf_counter() - origin) * 1000,
+        status=response.status_code,
+        cache=response.headers.get("X-Cache"),
+    )
+
+
+def run_closed(url, entries, concurrency, duration, total, timeout, unique):
+    recorder = Recorder()
+    counter = itertools.count()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def client():
+        while True:
+            with lock:
+                n = next(counter)
+            if (total and n >= total) or (deadline and time.perf_counter() >= deadline):
+                return
+            send(url, entries[n % len(entries)], timeout, recorder, nonce=n if unique else None)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+
+def run_open(url, entries, concurrency, rate, arrival, duration, total, timeout, unique, seed):
+    recorder = Recorder()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    next_at = started
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for n in itertools.count():
+            if (total and n >= total) or (duration and next_at - started >= duration):
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, url, entries[n % len(entries)], timeout, recorder,
+                        next_at, n if unique else None)
+            next_at += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+    return recorder, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="Server base URL")
+    parser.add_argument("--path", default="/ask")
+    parser.add_argument("--log", help="JSONL question log to replay (default: built-in questions)")
+    parser.add_argument("--field", default="question", help="Key holding the question in --log")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.0, help="Open loop: requests per second")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run (0: use --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request client timeout")
+    parser.add_argument("--unique", action="store_true",
+                        help="Make every question distinct, so the answer cache never hits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error("set --duration or --requests")
+
+    entries = load_questions(args.log, args.field)
+    url = args.url.rstrip("/") + args.path
+    if args.rate > 0:
+        recorder, elapsed = run_open(
+            url, entries, args.concurrency, args.rate, args.arrival,
+            args.duration, args.requests, args.timeout, args.unique, args.seed,
+        )
+    else:
+        recorder, elapsed = run_closed(
+            url, entries, args.concurrency, args.duration, args.requests, args.timeout, args.unique,
+        )
+
+    report = {
+        "config": {
+            "url": url,
+            "mode": "open" if args.rate > 0 else "closed",
+            "concurrency": args.concurrency,
+            "rate": args.rate or None,
+            "arrival": args.arrival if args.rate > 0 else None,
+            "questions": len(entries),
+            "unique": args.unique,
+        },
+        **recorder.summary(elapsed),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if not recorder.latencies_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
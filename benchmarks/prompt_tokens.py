@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Prompt size and answer coverage of the legacy and fine-grained chunkers (offline).
+
+For a fixed set of recruiter questions, retrieves context from data/cv.json with
+each CHUNKER_MODE and reports the average number of context documents, context
+characters and approximate prompt tokens (characters / 4, close to Gemini's
+tokenizer for English), plus coverage: the fraction of facts each answer needs
+that made it into the retrieved context.
+
+Retrieval is TF-IDF only by default so the benchmark needs no model download;
+pass --retriever-mode hybrid to include embeddings.
+
+Usage:
+    python benchmarks/prompt_tokens.py [--retriever-mode tfidf|hybrid] [--k 12] [--window 1]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# (question, facts the context must contain to answer it fully)
+QUESTIONS = [
+    ("Where does she work right now?", ["Omantel", "tipl.io"]),
+    ("How many years of experience does Ahlam have?", ["Total experience"]),
+    ("What are Ahlam's top skills?", ["Machine Learning", "Prophet", "SQL"]),
+    ("What education does she have?", ["HARBOUR.SPACE", "German University of Technology"]),
+    ("What did she do as a data scientist at PhazeRo?", ["PhazeRo"]),
+    ("What languages does she speak?", ["Swahili", "German"]),
+    ("What are her achievements?", ["BERT", "CRNN", "scholarship"]),
+    ("Does she know PL/SQL and OpenShift?", ["PL/SQL", "OpenShift"]),
+    ("Coffee or karak?", ["karak"]),
+    ("What certifications does she hold?", ["Scrum", "Pandas"]),
+]
+
+APPROX_CHARS_PER_TOKEN = 4
+
+
+def run(mode, k, window):
+    os.environ["CHUNKER_MODE"] = mode
+    os.environ["RETRIEVAL_K"] = str(k if mode == "fine" else 7)
+    os.environ["CHUNK_NEIGHBOR_WINDOW"] = str(window)
+
+    from app.chatbot import RECRUITER_PROMPT_TEMPLATE, _build_documents, _retrieve_batch, format_docs
+    from app.chunking import NeighborIndex
+    from app.cv_data import load_cv_data
+    from app.retrieval import HybridRetriever, hybrid_settings, semantic_model_name
+
+    documents = _build_documents(copy.deepcopy(load_cv_data()))
+    retriever = HybridRetriever(
+        documents, semantic_model_name=semantic_model_name(), **hybrid_settings()
+    )
+    vector_store = {"retriever": retriever, "neighbors": NeighborIndex(retriever.documents)}
+
+    questions = [q for q, _ in QUESTIONS]
+    docs_per_question = _retrieve_batch(vector_store, questions, None)
+    contexts = [format_docs(docs) for docs in docs_per_question]
+    docs_counts = [len(docs) for docs in docs_per_question]
+
+    found = total = 0
+    missing = []
+    for (question, facts), context in zip(QUESTIONS, contexts):
+        for fact in facts:
+            total += 1
+            if fact.lower() in context.lower():
+                found += 1
+            else:
+                missing.append({"question": question, "fact": fact})
+
+    template_chars = len(RECRUITER_PROMPT_TEMPLATE)
+    avg_context_chars = sum(len(c) for c in contexts) / len(contexts)
+    return {
+        "mode": mode,
+        "indexed_documents": len(documents),
+        "avg_context_documents": round(sum(docs_counts) / len(docs_counts), 1),
+        "avg_context_chars": round(avg_context_chars),
+        "avg_prompt_tokens_approx": round(
+            (template_chars + avg_context_chars) / APPROX_CHARS_PER_TOKEN
+        ),
+        "coverage": round(found / total, 3),
+        "missing": missing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--retriever-mode", choices=["tfidf", "hybrid"], default="tfidf")
+    parser.add_argument("--k", type=int, default=12, help="Chunks per question in fine mode")
+    parser.add_argument("--window", type=int, default=0, help="CHUNK_NEIGHBOR_WINDOW")
+    args = parser.parse_args()
+
+    os.environ["RETRIEVER_MODE"] = args.retriever_mode
+    results = [run(mode, args.k, args.window) for mode in ("legacy", "fine")]
+    legacy, fine = results
+    print(json.dumps({
+        "results": results,
+        "prompt_token_reduction": round(
+            1 - fine["avg_prompt_tokens_approx"] / legacy["avg_prompt_tokens_approx"], 3
+        ),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency and prompt size with and without cross-encoder reranking.
+
+Answers the benchmarks/prompt_tokens.py questions about data/cv.json through
+chatbot.handle_recruiter_questions, first with the fused top RETRIEVAL_K
+chunks (RERANKER=off), then reranked down to each --top-n. For every
+configuration it reports context chunks, estimated prompt tokens, fact
+coverage of the context, median/p95 time per stage (retrieval, rerank, llm)
+and end to end, and how often reranking fell back to the fused order. The
+first pass over the questions scores every pair (cold); later passes read the
+score cache, and their rerank time is reported separately.
+
+--gemini fake (default) answers from benchmarks/fake_gemini.py in-process,
+with --latency-ms per call plus --ms-per-1k-prompt-tokens per 1000 prompt
+tokens, so the LLM side of the trade-off is an assumption you set; --gemini
+live sends every question to the real Gemini API (GEMINI_API_KEY) and
+measures it. --encoder picks the cross-encoder: "model" loads RERANKER_MODEL
+from the local Hugging Face cache only; "overlap" is a word-overlap stand-in
+(no download, but its timings and ranking say nothing about the model's);
+"auto" (default) tries the model and falls back to the stand-in.
+
+Usage:
+    python benchmarks/rerank_report.py [--top-n 2 3] [--k 12] [--repeat 3]
+    python benchmarks/rerank_report.py --gemini fake --latency-ms 700 --ms-per-1k-prompt-tokens 150
+    GEMINI_API_KEY=... python benchmarks/rerank_report.py --gemini live --encoder model
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Before importing the app: no snapshots, reload polling or templated answers in the way
+os.environ.update({
+    "INDEX_SNAPSHOTS": "off",
+    "CV_RELOAD_INTERVAL_SECONDS": "0",
+    "INTENT_ROUTER": "off",
+    "WARM_UP_ON_START": "off",
+})
+
+from prompt_tokens import QUESTIONS  # noqa: E402
+
+_WORD = re.compile(r"\w+")
+
+
+class OverlapScorer:
+    """Stand-in for a CrossEncoder (predict() only): shared words between question and chunk."""
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False, **kwargs):
+        scores = []
+        for question, text in pairs:
+            q = set(_WORD.findall(question.lower()))
+            scores.append(len(q & set(_WORD.findall(text.lower()))) / (len(q) or 1))
+        return scores
+
+
+def _set_up_encoder(choice):
+    from app.rerank import get_cross_encoder, register_cross_encoder
+
+    name = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2").strip()
+    if choice in ("auto", "model"):
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        try:
+            get_cross_encoder(name)
+            return {"encoder": "model", "model": name}
+        except Exception as e:
+            if choice == "model":
+                raise SystemExit(f"Could not load {name} offline: {e}")
+    os.environ["RERANKER_MODEL"] = name = "word-overlap"
+    register_cross_encoder(name, OverlapScorer())
+    return {"encoder": "overlap", "model": name}
+
+
+def _set_up_gemini(args):
+    if args.gemini == "live":
+        if not os.getenv("GEMINI_API_KEY"):
+            raise SystemExit("--gemini live needs GEMINI_API_KEY")
+        return {"gemini": "live"}, None
+    from fake_gemini import Behaviour, serve
+
+    behaviour = Behaviour(
+        "fixed", args.latency_ms, 0.0, 503, 0.0, 0.0, 1, 0, args.ms_per_1k_prompt_tokens,
+    )
+    server = serve("127.0.0.1", 0, behaviour)
+    os.environ.update({
+        "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{server.server_address[1]}",
+        "GEMINI_API_KEY": "fake",
+    })
+    return {
+        "gemini": "fake",
+        "latency_ms": args.latency_ms,
+        "ms_per_1k_prompt_tokens": args.ms_per_1k_prompt_tokens,
+    }, server
+
+
+def _pct(values, p):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2) if ordered else None
+
+
+def _summary(values):
+    return {"p50_ms": _pct(values, 0.5), "p95_ms": _pct(values, 0.95)} if values else None
+
+
+def run_config(name, env, k, repeat):
+    os.environ.update(env)
+    os.environ["RETRIEVAL_K"] = str(k)
+
+    from app import chatbot
+    from app.metrics import end_request, start_request
+    from app.prompt_context import context_token_budget, pack_context
+    from app.rerank import RERANK_FALLBACKS, get_reranker
+
+    reranker = get_reranker()
+    if reranker is not None:
+        reranker.load()
+    fallbacks_before = sum(RERANK_FALLBACKS.value(r) for r in ("timeout", "error", "unavailable"))
+    api_key = os.environ["GEMINI_API_KEY"]
+    vector_store = chatbot._get_or_create_vector_store(api_key)
+    # Untimed: builds the Gemini pipeline and its HTTP connection
+    chatbot.handle_recruiter_questions("Warm-up question", api_key)
+
+    stages = {"retrieval": [], "rerank_cold": [], "rerank_cached": [], "llm": [], "total": []}
+    chunks, tokens = [], []
+    for rep in range(repeat):
+        for question, _facts in QUESTIONS:
+            trace = {}
+            timings, token = start_request()
+            started = time.perf_counter()
+            try:
+                chatbot.handle_recruiter_questions(question, api_key, trace=trace)
+            finally:
+                end_request(token)
+            stages["total"].append((time.perf_counter() - started) * 1000)
+            for stage_name in ("retrieval", "llm"):
+                if stage_name in timings:
+                    stages[stage_name].append(timings[stage_name][0] * 1000)
+            if "rerank" in timings:
+                key = "rerank_cold" if rep == 0 else "rerank_cached"
+                stages[key].append(timings["rerank"][0] * 1000)
+            if rep == 0 and "prompt_tokens" in trace:
+                chunks.append(trace["context_chunks"])
+                tokens.append(trace["prompt_tokens"])
+
+    # Coverage: did the facts each answer needs make it into the packed context?
+    found = total = 0
+    docs_per_question = chatbot._retrieve_batch(vector_store, [q for q, _ in QUESTIONS], None)
+    for (_question, facts), docs in zip(QUESTIONS, docs_per_question):
+        context = pack_context(docs, context_token_budget()).text.lower()
+        found += sum(fact.lower() in context for fact in facts)
+        total += len(facts)
+
+    fallbacks = sum(RERANK_FALLBACKS.value(r) for r in ("timeout", "error", "unavailable"))
+    return {
+        "config": name,
+        "avg_context_chunks": round(statistics.mean(chunks), 1) if chunks else None,
+        "avg_prompt_tokens": round(statistics.mean(tokens)) if tokens else None,
+        "coverage": round(found / total, 3) if total else None,
+        **{stage_name: _summary(values) for stage_name, values in stages.items()},
+        "rerank_fallbacks": int(fallbacks - fallbacks_before),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-n", type=int, nargs="+", default=[2, 3], help="RERANK_TOP_N values")
+    parser.add_argument("--k", type=int, default=12, help="RETRIEVAL_K (fused candidates)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the questions")
+    parser.add_argument("--budget-ms", type=float, default=150, help="RERANK_BUDGET_MS")
+    parser.add_argument("--retriever-mode", default="tfidf", help="RETRIEVER_MODE")
+    parser.add_argument("--encoder", choices=["auto", "model", "overlap"], default="auto")
+    parser.add_argument("--gemini", choices=["fake", "live"], default="fake")
+    parser.add_argument("--latency-ms", type=float, default=600,
+                        help="--gemini fake: latency of every call")
+    parser.add_argument("--ms-per-1k-prompt-tokens", type=float, default=100,
+                        help="--gemini fake: extra latency per 1000 prompt tokens")
+    args = parser.parse_args()
+
+    os.environ["RETRIEVER_MODE"] = args.retriever_mode
+    meta = {"retriever_mode": args.retriever_mode, "k": args.k, "repeat": args.repeat,
+            "budget_ms": args.budget_ms}
+    gemini, server = _set_up_gemini(args)
+    meta.update(gemini)
+    meta.update(_set_up_encoder(args.encoder))
+
+    configs = [("fused", {"RERANKER": "off"})] + [
+        (f"rerank_top{n}", {
+            "RERANKER": "cross-encoder",
+            "RERANK_TOP_N": str(n),
+            "RERANK_BUDGET_MS": str(args.budget_ms),
+        })
+        for n in args.top_n
+    ]
+    try:
+        results = [run_config(name, env, args.k, args.repeat) for name, env in configs]
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    baseline = results[0]
+    for row in results[1:]:
+        row["vs_fused"] = {
+            "prompt_tokens": round(row["avg_prompt_tokens"] / baseline["avg_prompt_tokens"] - 1, 3)
+            if row["avg_prompt_tokens"] and baseline["avg_prompt_tokens"] else None,
+            "total_p50_ms": round(row["total"]["p50_ms"] - baseline["total"]["p50_ms"], 2),
+            "total_p95_ms": round(row["total"]["p95_ms"] - baseline["total"]["p95_ms"], 2),
+        }
+    print(json.dumps({"meta": meta, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
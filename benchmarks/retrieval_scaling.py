@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Top-k selection and rank-fusion scaling benchmark (offline, NumPy only).
+
+Compares the original approach (full argsort of every score vector, then
+reciprocal rank fusion in a Python dict keyed by document) with the vectorized
+one in app.retrieval (argpartition top-k, fusion over document-id arrays) for
+corpora of 1k to 100k documents.
+
+Usage:
+    python benchmarks/retrieval_scaling.py [--sizes 1000 10000 100000] [--k 10]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.retrieval import reciprocal_rank_fusion, top_k_rows  # noqa: E402
+
+
+def argsort_top_k(scores, k):
+    return np.argsort(-scores)[:k]
+
+
+def dict_fusion(tfidf_idx, semantic_idx, k):
+    scores = {}
+    for hits in (tfidf_idx, semantic_idx):
+        for rank, doc_id in enumerate(hits, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (60 + rank)
+    ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    return [doc_id for doc_id, _ in ranked[:k]]
+
+
+def time_it(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run(size, k, dim, queries, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    doc_vecs = rng.standard_normal((size, dim), dtype=np.float32)
+    doc_vecs /= np.linalg.norm(doc_vecs, axis=1, keepdims=True)
+    q_vecs = rng.standard_normal((queries, dim), dtype=np.float32)
+    q_vecs /= np.linalg.norm(q_vecs, axis=1, keepdims=True)
+    semantic_scores = q_vecs @ doc_vecs.T
+    # Sparse-ish lexical scores: most documents don't match the query at all
+    tfidf_scores = np.where(
+        rng.random((queries, size)) < 0.05, rng.random((queries, size)), 0.0
+    ).astype(np.float32)
+
+    def baseline():
+        for t_row, s_row in zip(tfidf_scores, semantic_scores):
+            t_idx = [i for i in argsort_top_k(t_row, k) if t_row[i] > 0]
+            s_idx = list(argsort_top_k(s_row, k))
+            dict_fusion(t_idx, s_idx, k)
+
+    def vectorized():
+        t_top = top_k_rows(tfidf_scores, k)
+        s_top = top_k_rows(semantic_scores, k)
+        for t_row, t_idx, s_idx in zip(tfidf_scores, t_top, s_top):
+            t_idx = t_idx[t_row[t_idx] > 0]
+            reciprocal_rank_fusion([t_idx, s_idx], [1.0, 1.0], k)
+
+    # Same ranking from both paths
+    for t_row, s_row in zip(tfidf_scores[:5], semantic_scores[:5]):
+        t_idx = [i for i in argsort_top_k(t_row, k) if t_row[i] > 0]
+        s_idx = list(argsort_top_k(s_row, k))
+        expected = dict_fusion(t_idx, s_idx, k)
+        got, _ = reciprocal_rank_fusion(
+            [np.array(t_idx, dtype=np.int64), np.array(s_idx)], [1.0, 1.0], k
+        )
+        assert list(got) == expected, (list(got), expected)
+
+    baseline_ms = time_it(baseline, repeat)
+    vectorized_ms = time_it(vectorized, repeat)
+    return {
+        "documents": size,
+        "queries": queries,
+        "k": k,
+        "baseline_ms_per_query": round(baseline_ms / queries, 4),
+        "vectorized_ms_per_query": round(vectorized_ms / queries, 4),
+        "speedup": round(baseline_ms / vectorized_ms, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = [run(size, args.k, args.dim, args.queries, args.repeat) for size in args.sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+BM25 inverted index vs TF-IDF keyword retrieval on synthetic CVs (offline).
+
+For each size (--jobs experience entries x --bullets responsibilities, from
+benchmarks/synthetic_cv.py) both keyword retrievers index the same chunks and
+answer the same questions, one at a time (as /ask does) and as one batch (as
+/ask/batch does). Reports build time, median/p95 query latency, index size,
+and two quality checks: the share of BM25's top-k that TF-IDF also returns,
+and for questions naming an employer ("What did she do at <company>?") the
+share of the top-k chunks that belong to that employer, where BM25's field
+boosts should help.
+
+Usage:
+    python benchmarks/sparse_retrieval.py [--jobs 10 100 1000 10000] [--bullets 8] [--k 12]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.bm25 import BM25Retriever, bm25_settings  # noqa: E402
+from app.chunking import chunk_cv  # noqa: E402
+from app.retrieval import TfidfRetriever  # noqa: E402
+from suite import QUERIES  # noqa: E402
+from synthetic_cv import generate_cv  # noqa: E402
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _latency(retriever, queries, k, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            samples.append(_timed(lambda: retriever.search_batch([query], k))[1])
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+    }
+
+
+def _tfidf_nbytes(retriever):
+    matrix = retriever.matrix
+    return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+               + retriever.vectorizer.idf_.nbytes)
+
+
+def _company_precision(retriever, documents, company_queries, k):
+    shares = []
+    for company, hits in zip(company_queries, retriever.search_batch(list(company_queries.values()), k)):
+        idx = hits[0]
+        if len(idx):
+            shares.append(sum(documents[i].metadata.get("company") == company for i in idx) / len(idx))
+    return round(statistics.mean(shares), 3) if shares else None
+
+
+def run(jobs, bullets, k, repeat, companies):
+    documents = chunk_cv(generate_cv(jobs=jobs, bullets=bullets))
+    tfidf, tfidf_build = _timed(lambda: TfidfRetriever(documents))
+    bm25, bm25_build = _timed(lambda: BM25Retriever(documents, **bm25_settings()))
+
+    names = sorted({d.metadata["company"] for d in documents if d.metadata.get("company")})
+    step = max(1, len(names) // companies)
+    company_queries = {name: f"What did she do at {name}?" for name in names[::step][:companies]}
+
+    overlap = []
+    for (t_idx, _), (b_idx, _) in zip(tfidf.search_batch(QUERIES, k), bm25.search_batch(QUERIES, k)):
+        if len(b_idx):
+            overlap.append(len(set(t_idx.tolist()) & set(b_idx.tolist())) / len(b_idx))
+
+    rows = []
+    for name, retriever, build_ms, nbytes in (
+        ("tfidf", tfidf, tfidf_build, _tfidf_nbytes(tfidf)),
+        ("bm25", bm25, bm25_build, bm25.nbytes()),
+    ):
+        _, batch_ms = _timed(lambda: retriever.search_batch(QUERIES, k))
+        rows.append({
+            "retriever": name,
+            "jobs": jobs,
+            "documents": len(documents),
+            "build_ms": round(build_ms, 2),
+            "query": _latency(retriever, QUERIES, k, repeat),
+            "batch_ms": round(batch_ms, 4),
+            "index_bytes": nbytes,
+            "company_precision": _company_precision(retriever, documents, company_queries, k),
+        })
+    rows[1]["overlap_with_tfidf"] = round(statistics.mean(overlap), 3) if overlap else None
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--bullets", type=int, default=8)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the query set")
+    parser.add_argument("--companies", type=int, default=20,
+                        help="Employer-naming questions for company_precision")
+    args = parser.parse_args()
+
+    # Import scikit-learn up front, so the first TF-IDF build is not charged for it
+    TfidfRetriever(chunk_cv(generate_cv(jobs=1, bullets=1)))
+    results = []
+    for jobs in args.jobs:
+        results.extend(run(jobs, args.bullets, args.k, args.repeat, args.companies))
+    print(json.dumps({"bm25": bm25_settings(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
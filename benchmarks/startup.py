@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Import time of the app's entry points, with regression thresholds (offline).
+
+Each target is imported in a fresh interpreter under `python -X importtime`
+(WARM_UP_ON_START=off, so wsgi.py doesn't build the index). Reports the
+median import time over --repeat runs, the packages that cost the most, and
+whether the target pulled in modules it must not load at import time
+(scikit-learn, torch, the Gemini client, Flask for the bare package...).
+
+With --check the script exits with status 1 when a target is over its budget
+or loads a forbidden module, for use in CI. Time budgets are generous
+(roughly 2x a laptop run); the forbidden-module check is exact.
+
+--ready also times `import wsgi` with warm-up on: the gunicorn master's
+boot-to-ready time with the current RETRIEVER_MODE/INDEX_SNAPSHOTS settings.
+
+Usage:
+    python benchmarks/startup.py [--repeat 5] [--check] [--ready]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Heavy dependencies that only the code paths needing them may import
+_HEAVY = ["sklearn", "scipy", "torch", "sentence_transformers", "langchain_google_genai", "google.generativeai"]
+
+# target: (import-time budget in ms, modules it must not load)
+TARGETS = {
+    "app": (25, ["flask", "langchain_core", "numpy", *_HEAVY]),
+    "app.cv_data": (100, ["flask", "langchain_core", "numpy", *_HEAVY]),
+    "app.chatbot": (1200, ["flask", *_HEAVY]),
+    "app.api": (1500, _HEAVY),
+    "app.asgi_api": (1500, ["flask", *_HEAVY]),
+    "wsgi": (1500, _HEAVY),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def _run(code, warm_up="off"):
+    env = {**os.environ, "WARM_UP_ON_START": warm_up, "PYTHONPATH": ROOT}
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{proc.stderr[-2000:]}")
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) == 0))
+    return modules, wall_ms
+
+
+def measure(target, repeat, baseline):
+    totals, walls = [], []
+    per_package = defaultdict(list)
+    loaded = set()
+    for _ in range(repeat):
+        modules, wall_ms = _run(f"import {target}")
+        new = [m for m in modules if m[0] not in baseline]
+        # Top-level lines are the imports the target triggered directly or via its parents
+        totals.append(sum(cumulative for _, _, cumulative, top in new if top) / 1000)
+        walls.append(wall_ms)
+        package_us = defaultdict(int)
+        for name, self_us, _, _ in new:
+            package_us[name.split(".")[0]] += self_us
+            loaded.add(name)
+        for package, us in package_us.items():
+            per_package[package].append(us / 1000)
+
+    heaviest = sorted(
+        ((package, statistics.median(ms)) for package, ms in per_package.items()),
+        key=lambda item: -item[1],
+    )[:8]
+    budget_ms, forbidden = TARGETS.get(target, (None, []))
+    forbidden_loaded = sorted(
+        f for f in forbidden if any(m == f or m.startswith(f + ".") for m in loaded)
+    )
+    import_ms = statistics.median(totals)
+    return {
+        "target": target,
+        "import_ms": round(import_ms, 1),
+        "process_ms": round(statistics.median(walls), 1),
+        "modules": len(loaded),
+        "heaviest_packages_ms": {package: round(ms, 1) for package, ms in heaviest},
+        "budget_ms": budget_ms,
+        "forbidden_loaded": forbidden_loaded,
+        "ok": (budget_ms is None or import_ms <= budget_ms) and not forbidden_loaded,
+    }
+
+
+def measure_ready():
+    """Wall-clock time for `import wsgi` with warm-up, i.e. until the index is ready."""
+    modules, wall_ms = _run("import wsgi", warm_up="on")
+    loaded = {name for name, *_ in modules}
+    return {
+        "boot_to_ready_ms": round(wall_ms, 1),
+        "modules": len(loaded),
+        "heavy_loaded": sorted(h for h in _HEAVY if h in loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a target fails its thresholds")
+    parser.add_argument("--ready", action="store_true", help="Also time import wsgi with warm-up on")
+    args = parser.parse_args()
+
+    baseline = {name for name, *_ in _run("pass")[0]}
+    results = {"targets": [measure(target, args.repeat, baseline) for target in args.targets]}
+    if args.ready:
+        results["ready"] = measure_ready()
+    print(json.dumps(results, indent=2))
+
+    if args.check and not all(r["ok"] for r in results["targets"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
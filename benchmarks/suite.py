@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Indexing and retrieval micro-benchmarks over synthetic CVs (offline), with regression checks.
+
+For each size (--jobs experience entries x --bullets responsibilities, from
+benchmarks/synthetic_cv.py) times:
+
+  create_vector_store   chatbot._create_vector_store: chunking, TF-IDF fit,
+                        document embeddings, vector index (snapshots off)
+  tfidf_fit             TfidfRetriever over the same documents
+  tfidf_search          one query through TfidfRetriever.search_batch
+  bm25_fit              BM25Retriever (inverted index) over the same documents
+  bm25_search           one query through BM25Retriever.search_batch
+  semantic_build        SentenceTransformerRetriever: encode documents + index
+  semantic_search       one query (encoded, query cache off) through search_batch
+  hybrid_retrieve       HybridRetriever.retrieve, i.e. both searches + RRF
+  hybrid_candidate      the same restricted to one candidate (--candidates > 1)
+  format_docs           chatbot.format_docs on the retrieved chunks
+  pack_context          prompt_context.pack_context with CONTEXT_TOKEN_BUDGET
+
+--encoder picks the embedding model: "model" loads SEMANTIC_MODEL_NAME from
+the local Hugging Face cache only (HF_HUB_OFFLINE=1); "hash" uses a
+deterministic feature-hashing encoder, so runs need no download and semantic
+numbers measure indexing/search rather than the transformer; "auto" (default)
+tries the model and falls back to hashing. The encoder used is recorded in
+the output, and only runs with the same encoder should be compared.
+
+Results are JSON (printed, or written with --out). --compare BASELINE.json
+reports the median ratio against an earlier run and, with --check, exits
+with status 1 when any benchmark is more than --tolerance times slower.
+
+Usage:
+    python benchmarks/suite.py [--jobs 10 100 1000] [--bullets 8] [--out run.json]
+    python benchmarks/suite.py --jobs 10000 --only tfidf_search hybrid_retrieve
+    python benchmarks/suite.py --compare main.json --check [--tolerance 1.3]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Before importing the app: no snapshots, reload polling, intents or query cache in the way
+os.environ.update({
+    "INDEX_SNAPSHOTS": "off",
+    "CV_RELOAD_INTERVAL_SECONDS": "0",
+    "QUERY_EMBEDDING_CACHE_SIZE": "0",
+    "RETRIEVER_MODE": "hybrid",
+})
+
+import numpy as np  # noqa: E402
+
+from synthetic_cv import generate_corpus, generate_cv  # noqa: E402
+
+BENCHMARKS = [
+    "create_vector_store", "tfidf_fit", "tfidf_search", "bm25_fit", "bm25_search", "semantic_build",
+    "semantic_search", "hybrid_retrieve", "hybrid_candidate", "format_docs", "pack_context",
+]
+
+QUERIES = [
+    "What programming languages does the candidate know?",
+    "Where is she working now?",
+    "Has she built forecasting models with Prophet or ARIMA?",
+    "Experience with Kubernetes and Docker deployments",
+    "Which companies did she work for in Dubai?",
+    "Tell me about her data engineering work with Spark and Airflow",
+    "What certifications does she hold?",
+    "Did she lead any machine learning projects?",
+    "How many years of experience does she have?",
+    "Has she worked on NLP classifiers?",
+    "What degree does she have?",
+    "Describe her experience with dashboards in Tableau or Power BI",
+]
+
+# Ratios are meaningless for timings this small (noise dominates)
+_MIN_COMPARABLE_MS = 0.05
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for a SentenceTransformer (encode() only): word and
+    bigram feature hashing into `dim` dimensions, L2-normalized. No download.
+    """
+
+    def __init__(self, dim=384):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self._vectorizer = HashingVectorizer(
+            n_features=dim, ngram_range=(1, 2), alternate_sign=True, norm="l2"
+        )
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False, **kwargs):
+        single = isinstance(texts, str)
+        vecs = self._vectorizer.transform([texts] if single else list(texts)).toarray()
+        vecs = vecs.astype(np.float32)
+        return vecs[0] if single else vecs
+
+
+def _set_up_encoder(choice):
+    """Register the encoder for SEMANTIC_MODEL_NAME; returns a description of what is used."""
+    from app.retrieval import get_sentence_model, register_sentence_model
+
+    name = os.getenv("SEMANTIC_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2").strip()
+    if choice in ("auto", "model"):
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        try:
+            get_sentence_model(name)
+            return {"encoder": "model", "model": name}
+        except Exception as e:
+            if choice == "model":
+                raise SystemExit(f"Could not load {name} offline: {e}")
+    os.environ["SEMANTIC_MODEL_NAME"] = name = "hashing-encoder-384"
+    register_sentence_model(name, HashingEncoder(384))
+    return {"encoder": "hash", "model": name}
+
+
+def _stats(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "median_ms": round(statistics.median(ordered), 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+        "min_ms": round(ordered[0], 4),
+        "runs": len(ordered),
+    }
+
+
+def _time_calls(fn, args_list, repeat):
+    samples = []
+    for _ in range(repeat):
+        for args in args_list:
+            started = time.perf_counter()
+            fn(*args)
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def run_size(jobs, bullets, candidates, repeat, build_repeat, only):
+    from app.bm25 import BM25Retriever, bm25_settings
+    from app.chatbot import _create_vector_store, format_docs
+    from app.chunking import retrieval_k
+    from app.prompt_context import context_token_budget, pack_context
+    from app.retrieval import SentenceTransformerRetriever, TfidfRetriever, semantic_model_name
+
+    if candidates > 1:
+        corpus = generate_corpus(candidates, jobs=jobs, bullets=bullets)
+    else:
+        corpus = {"default": generate_cv(jobs=jobs, bullets=bullets)}
+    k = retrieval_k()
+    queries = [(q,) for q in QUERIES]
+    results = []
+
+    def record(name, samples, documents):
+        results.append({"benchmark": name, "jobs": jobs, "bullets": bullets,
+                        "candidates": candidates, "documents": documents, **_stats(samples)})
+
+    # Always built once: every other benchmark searches this store
+    samples, store = [], None
+    for _ in range(build_repeat if "create_vector_store" in only else 1):
+        started = time.perf_counter()
+        store = _create_vector_store(corpus, None)
+        samples.append((time.perf_counter() - started) * 1000)
+    documents = store["documents"]
+    retriever = store["retriever"]
+    n = len(documents)
+    if "create_vector_store" in only:
+        record("create_vector_store", samples, n)
+
+    if "tfidf_fit" in only:
+        record("tfidf_fit", _time_calls(lambda: TfidfRetriever(documents), [()], build_repeat), n)
+    if "tfidf_search" in only:
+        record("tfidf_search", _time_calls(
+            lambda q: retriever.tfidf.search_batch([q], k), queries, repeat), n)
+    if "bm25_fit" in only or "bm25_search" in only:
+        bm25_kwargs = bm25_settings()
+        if "bm25_fit" in only:
+            record("bm25_fit", _time_calls(
+                lambda: BM25Retriever(documents, **bm25_kwargs), [()], build_repeat), n)
+        if "bm25_search" in only:
+            bm25 = BM25Retriever(documents, **bm25_kwargs)
+            record("bm25_search", _time_calls(
+                lambda q: bm25.search_batch([q], k), queries, repeat), n)
+
+    model_name = semantic_model_name()
+    if "semantic_build" in only:
+        record("semantic_build", _time_calls(
+            lambda: SentenceTransformerRetriever(documents, model_name), [()], build_repeat), n)
+    if "semantic_search" in only and retriever.semantic is not None:
+        record("semantic_search", _time_calls(
+            lambda q: retriever.semantic.search_batch([q], k), queries, repeat), n)
+
+    if "hybrid_retrieve" in only:
+        record("hybrid_retrieve", _time_calls(
+            lambda q: retriever.retrieve(q, k), queries, repeat), n)
+    if "hybrid_candidate" in only and candidates > 1:
+        candidate_id = retriever.candidate_ids[len(retriever.candidate_ids) // 2]
+        record("hybrid_candidate", _time_calls(
+            lambda q: retriever.retrieve(q, k, candidate_id=candidate_id), queries, repeat), n)
+
+    retrieved = [(retriever.retrieve(q, k),) for q in QUERIES]
+    if "format_docs" in only:
+        record("format_docs", _time_calls(format_docs, retrieved, repeat), n)
+    if "pack_context" in only:
+        budget = context_token_budget()
+        record("pack_context", _time_calls(
+            lambda docs: pack_context(docs, budget), retrieved, repeat), n)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Median ratio per (benchmark, size) present in both runs; flags > tolerance."""
+    def key(r):
+        return (r["benchmark"], r["jobs"], r["bullets"], r["candidates"])
+
+    previous = {key(r): r for r in baseline["results"]}
+    rows = []
+    for r in results:
+        before = previous.get(key(r))
+        if before is None:
+            continue
+        ratio = r["median_ms"] / before["median_ms"] if before["median_ms"] > 0 else None
+        comparable = ratio is not None and max(r["median_ms"], before["median_ms"]) >= _MIN_COMPARABLE_MS
+        rows.append({
+            "benchmark": r["benchmark"],
+            "jobs": r["jobs"],
+            "baseline_ms": before["median_ms"],
+            "median_ms": r["median_ms"],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "regression": bool(comparable and ratio > tolerance),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--bullets", type=int, default=8)
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Spread the jobs over this many CVs (corpus mode)")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the query set")
+    parser.add_argument("--build-repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--encoder", choices=["auto", "model", "hash"], default="auto")
+    parser.add_argument("--out", help="Also write the JSON results to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results JSON of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=1.3,
+                        help="Slowdown ratio counted as a regression")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on a regression")
+    args = parser.parse_args()
+
+    meta = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        **_set_up_encoder(args.encoder),
+    }
+    results = []
+    for jobs in args.jobs:
+        per_candidate = max(1, jobs // args.candidates)
+        results.extend(run_size(
+            per_candidate, args.bullets, args.candidates, args.repeat, args.build_repeat, args.only,
+        ))
+    output = {"meta": meta, "results": results}
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("encoder") != meta["encoder"]:
+            print(f"warning: baseline used encoder {baseline['meta'].get('encoder')!r}, "
+                  f"this run {meta['encoder']!r}", file=sys.stderr)
+        output["comparison"] = compare(results, baseline, args.tolerance)
+        output["baseline_commit"] = baseline["meta"].get("commit")
+        regressions = [row for row in output["comparison"] if row["regression"]]
+
+    text = json.dumps(output, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Synthetic CVs in the data/cv.json schema, for benchmarks (deterministic, offline).
+
+generate_cv() scales the schema from one realistic-sized CV up to tens of
+thousands of jobs, each with a configurable number of responsibility bullets
+and skills; the other sections (contact, skills, languages, education, ...)
+keep their usual shape. Text is assembled from fixed word pools with a seeded
+RNG, so the same arguments always give the same CV.
+
+Usage:
+    python benchmarks/synthetic_cv.py --jobs 1000 --bullets 8 > /tmp/cv.json
+    python benchmarks/synthetic_cv.py --candidates 50 --jobs 20 --out-dir /tmp/corpus
+"""
+import argparse
+import json
+import os
+import random
+
+_MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+_COMPANY_PARTS = [
+    "Nova", "Blue", "Data", "Quantum", "Desert", "Falcon", "Pearl", "Cedar", "Atlas",
+    "Vertex", "Lumen", "Harbor", "Summit", "Oasis", "Orbit", "Delta", "Nimbus", "Ember",
+]
+_COMPANY_SUFFIXES = ["Labs", "Analytics", "Telecom", "Systems", "Bank", "AI", "Energy", "Health", "Logistics"]
+_ROLES = [
+    "Data Scientist", "Data Engineer", "Machine Learning Engineer", "Software Engineer",
+    "Business Analyst", "Research Assistant", "Backend Developer", "Analytics Lead",
+    "Platform Engineer", "MLOps Engineer",
+]
+_CITIES = ["Muscat, Oman", "Dubai, UAE", "Doha, Qatar", "Barcelona, Spain", "Nairobi, Kenya", "Berlin, Germany", "Remote"]
+_VERBS = [
+    "Designed", "Built", "Automated", "Optimized", "Migrated", "Led", "Deployed", "Maintained",
+    "Analyzed", "Reduced", "Improved", "Orchestrated", "Monitored", "Prototyped", "Scaled",
+]
+_OBJECTS = [
+    "ETL pipelines", "forecasting models", "customer churn dashboards", "recommendation services",
+    "data quality checks", "billing reports", "REST APIs", "feature stores", "A/B testing framework",
+    "incident runbooks", "NLP classifiers", "computer vision models", "SQL warehouses",
+    "streaming jobs", "CI/CD workflows",
+]
+_TOOLS = [
+    "Python", "SQL", "PL/SQL", "Spark", "Airflow", "Kafka", "Prophet", "ARIMA", "TensorFlow",
+    "PyTorch", "scikit-learn", "Docker", "Kubernetes", "OpenShift", "Tableau", "Power BI",
+    "BigQuery", "Snowflake", "dbt", "FastAPI", "Flask", "React", "Pandas", "NumPy",
+]
+_OUTCOMES = [
+    "cutting processing time by {n}%", "improving accuracy to {n}%", "saving {n} hours a month",
+    "serving {n}k daily users", "reducing costs by {n}%", "raising availability to 99.{n}%",
+]
+_LANGUAGES = {"English": "Native", "Arabic": "Native", "Swahili": "Professional", "German": "Elementary", "Spanish": "Elementary", "French": "Elementary"}
+_SCHOOLS = ["HARBOUR.SPACE", "German University of Technology in Oman", "Sultan Qaboos University", "University of Nairobi"]
+_DEGREES = ["Master's degree, Data Science", "Bachelor of Science - BS, Computer Science", "Diploma, Information Systems"]
+
+
+def _company(rng):
+    return f"{rng.choice(_COMPANY_PARTS)}{rng.choice(_COMPANY_PARTS).lower()} {rng.choice(_COMPANY_SUFFIXES)}"
+
+
+def _bullet(rng):
+    tools = " and ".join(rng.sample(_TOOLS, 2))
+    outcome = rng.choice(_OUTCOMES).format(n=rng.randint(10, 95))
+    return f"{rng.choice(_VERBS)} {rng.choice(_OBJECTS)} using {tools}, {outcome}."
+
+
+def _job(rng, index, jobs, bullets, skills, current):
+    # Spread jobs back from the present, a few months each, with some overlap
+    end_months_ago = 0 if current else max(1, (jobs - index) * 3 - rng.randint(0, 2))
+    start_months_ago = end_months_ago + rng.randint(4, 30)
+    start_year = 2026 - start_months_ago // 12
+    end_year = 2026 - end_months_ago // 12
+    return {
+        "company": _company(rng),
+        "position": rng.choice(_ROLES),
+        "dates": {
+            "start": f"{rng.choice(_MONTHS)} {start_year}",
+            "end": "Present" if current else f"{rng.choice(_MONTHS)} {end_year}",
+        },
+        "location": rng.choice(_CITIES),
+        "responsibilities": [_bullet(rng) for _ in range(bullets)],
+        "skills": rng.sample(_TOOLS, skills),
+    }
+
+
+def generate_cv(jobs=5, bullets=6, skills=5, seed=0, name=None):
+    """
+    One synthetic CV in the data/cv.json schema.
+
+    Args:
+        jobs (int): Number of experience entries (the first two are current)
+        bullets (int): Responsibility bullets per job
+        skills (int): Skills listed per job
+        seed (int): RNG seed; the same arguments give the same CV
+        name (str): Candidate name stored in contact.name, if given
+    Returns:
+        dict: CV data
+    """
+    rng = random.Random(seed)
+    contact = {
+        "email": f"candidate{seed}@example.com",
+        "linkedin": f"www.linkedin.com/in/candidate{seed}",
+        "github": f"https://github.com/candidate{seed}",
+    }
+    if name:
+        contact["name"] = name
+    languages = dict(rng.sample(sorted(_LANGUAGES.items()), 4))
+    return {
+        "contact": contact,
+        "top_skills": rng.sample(_TOOLS, 9),
+        "languages": languages,
+        "certifications": [f"{tool} Certification" for tool in rng.sample(_TOOLS, 4)],
+        "honors_awards": [f"{rng.choice(_COMPANY_PARTS)} Ambassador" for _ in range(3)],
+        "achievements": [_bullet(rng) for _ in range(4)],
+        "research_projects": [f"{rng.choice(_OBJECTS).capitalize()} research" for _ in range(2)],
+        "summary": " ".join(_bullet(rng) for _ in range(4)),
+        "experience": [
+            _job(rng, i, jobs, bullets, skills, current=i < min(2, jobs)) for i in range(jobs)
+        ],
+        "education": [
+            {"institution": school, "degree": degree, "duration": f"{2010 + i * 4} - {2014 + i * 4}"}
+            for i, (school, degree) in enumerate(zip(rng.sample(_SCHOOLS, 2), _DEGREES))
+        ],
+        "passion": ["Getting people into tech.", "Solving real-life problems using technology."],
+        "coffe_or_karak": ["Karak"],
+    }
+
+
+def generate_corpus(candidates, jobs=5, bullets=6, skills=5, seed=0):
+    """{candidate_id: cv_data} for `candidates` synthetic CVs."""
+    return {
+        f"candidate-{i:05d}": generate_cv(jobs, bullets, skills, seed=seed + i, name=f"Candidate {i}")
+        for i in range(candidates)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=5)
+    parser.add_argument("--bullets", type=int, default=6)
+    parser.add_argument("--skills", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--candidates", type=int, default=1)
+    parser.add_argument("--out-dir", help="Write one <candidate_id>.json per CV here (for CV_CORPUS_DIR)")
+    args = parser.parse_args()
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        corpus = generate_corpus(args.candidates, args.jobs, args.bullets, args.skills, args.seed)
+        for candidate_id, cv_data in corpus.items():
+            with open(os.path.join(args.out_dir, f"{candidate_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(cv_data, f, indent=2)
+        print(json.dumps({"out_dir": args.out_dir, "candidates": len(corpus)}))
+    else:
+        print(json.dumps(generate_cv(args.jobs, args.bullets, args.skills, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
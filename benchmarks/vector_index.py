@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Recall, latency and memory of approximate vector search against exact float32 (offline).
+
+Documents are synthetic unit vectors drawn around a few hundred topic centres,
+roughly how sentence embeddings of many CVs cluster. Queries are noisy copies
+of held-out documents. For each corpus size, reports recall@k (the share of the
+exact float32 top k that is also returned) and per-query latency for:
+
+- the exact index with float16 / int8 storage and float32 rescoring, with the
+  resident size of the stored matrix;
+- the IVF index at each nprobe, with its build time.
+
+Usage:
+    python benchmarks/vector_index.py [--sizes 10000 100000] [--nprobe 4 8 16 32] [--dtypes float16 int8]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.vector_index import ExactIndex, IVFIndex, QuantizedMatrix  # noqa: E402
+
+
+def normalize(x):
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_corpus(size, dim, queries, topics, spread, rng):
+    centres = normalize(rng.standard_normal((topics, dim)))
+    topic = rng.integers(0, topics, size + queries)
+    # `spread` is the noise norm relative to the unit topic centre
+    noise = rng.standard_normal((size + queries, dim)) * (spread / math.sqrt(dim))
+    vecs = normalize(centres[topic] + noise)
+    q_vecs = normalize(vecs[size:] + rng.standard_normal((queries, dim)) * (0.5 / math.sqrt(dim)))
+    return vecs[:size], q_vecs
+
+
+def time_search(index, q_vecs, k, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hits = index.search(q_vecs, k)
+        best = min(best, time.perf_counter() - started)
+    return hits, best * 1000 / len(q_vecs)
+
+
+def recall_at_k(exact_hits, hits, k):
+    return round(float(np.mean([
+        len(set(a.tolist()) & set(b.tolist())) / k for (a, _), (b, _) in zip(exact_hits, hits)
+    ])), 4)
+
+
+def run(size, nprobes, dtypes, nlist, k, dim, queries, spread, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    doc_vecs, q_vecs = synthetic_corpus(
+        size, dim, queries, topics=max(16, size // 200), spread=spread, rng=rng
+    )
+
+    exact_hits, exact_ms = time_search(ExactIndex(doc_vecs), q_vecs, k, repeat)
+    nlist = nlist or int(math.sqrt(size))
+
+    rows = []
+    for dtype in dtypes:
+        hits, ms = time_search(ExactIndex(doc_vecs, dtype=dtype), q_vecs, k, repeat)
+        stored_mb = QuantizedMatrix.from_float32(doc_vecs, dtype).nbytes / 1e6
+        rows.append({
+            "documents": size,
+            "index": f"exact-{dtype}",
+            "k": k,
+            f"recall_at_{k}": recall_at_k(exact_hits, hits, k),
+            "exact_ms_per_query": round(exact_ms, 4),
+            "ms_per_query": round(ms, 4),
+            "speedup": round(exact_ms / ms, 2),
+            "resident_mb": round(stored_mb, 1),
+            "float32_mb": round(doc_vecs.nbytes / 1e6, 1),
+        })
+
+    for nprobe in nprobes:
+        started = time.perf_counter()
+        ivf = IVFIndex(doc_vecs, nlist=nlist, nprobe=nprobe)
+        build_ms = (time.perf_counter() - started) * 1000
+        ivf_hits, ivf_ms = time_search(ivf, q_vecs, k, repeat)
+        rows.append({
+            "documents": size,
+            "index": "ivf",
+            "nlist": ivf.nlist,
+            "nprobe": ivf.nprobe,
+            "k": k,
+            f"recall_at_{k}": recall_at_k(exact_hits, ivf_hits, k),
+            "exact_ms_per_query": round(exact_ms, 4),
+            "ms_per_query": round(ivf_ms, 4),
+            "speedup": round(exact_ms / ivf_ms, 2),
+            "ivf_build_ms": round(build_ms, 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--dtypes", nargs="*", default=["float16", "int8"])
+    parser.add_argument("--nlist", type=int, default=0, help="0 = sqrt(documents)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--spread", type=float, default=1.5, help="Noise around topic centres")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.extend(
+            run(
+                size, args.nprobe, args.dtypes, args.nlist, args.k, args.dim,
+                args.queries, args.spread, args.repeat,
+            )
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Gunicorn settings for `gunicorn wsgi:app`.
+
+The app (and with it the retrieval index and embedding model, see wsgi.py) is
+loaded once in the master and shared with the forked workers copy-on-write,
+instead of every worker building its own copy on its first request.
+"""
+import gc
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from app.admission import check_worker_threads, worker_threads
+
+# ADMISSION_* settings in .env size the thread pool, so read it before the app does
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Enough threads for admission control's running and queued requests plus a
+# few spare, unless set explicitly (see app/admission.py worker_threads())
+threads = int(os.getenv("GUNICORN_THREADS") or worker_threads())
+check_worker_threads(threads)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Objects created so far are moved out of the GC's generations, so collections
+    # in the workers don't write to (and un-share) the pages holding them
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The Gemini client isn't needed to get ready, so it is imported in each
+    # worker (in the background) rather than in the master
+    from app.chatbot import import_llm_client_in_background
+
+    import_llm_client_in_background()
+
+    # OpenMP thread pools don't survive fork; give each worker a small fixed pool
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", "1")))
@@ -0,0 +1,37 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+# Run from anywhere without installing the package, like the benchmarks
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_WORD = re.compile(r"\w+")
+
+
+class HashEncoder:
+    """Stand-in for a SentenceTransformer (encode() only): hashed bag of words, counting calls"""
+
+    def __init__(self, dim=64):
+        self.dim = dim
+        self.encoded = []
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False, **kwargs):
+        self.encoded.append(list(texts))
+        vecs = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                vecs[row, sum(map(ord, word)) % self.dim] += 1.0
+        return vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+
+
+@pytest.fixture
+def encoder():
+    """A HashEncoder registered as the sentence model "test-encoder" """
+    from app.retrieval import register_sentence_model
+
+    encoder = HashEncoder()
+    register_sentence_model("test-encoder", encoder)
+    return encoder
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from app import endpoints
+from app.admission import AdmissionController, AdmissionRejected, worker_threads
+
+
+def controller(**overrides):
+    settings = {"max_concurrency": 1, "max_queue": 2, "max_wait": 5.0, "per_client": 0}
+    settings.update(overrides)
+    return AdmissionController(initial_service_seconds=0.01, **settings)
+
+
+def acquire_in_thread(admission, client, admitted):
+    def run():
+        slot = admission.acquire(client)
+        admitted.append(client)
+        slot.release()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(admission, length):
+    deadline = time.monotonic() + 2
+    while admission.status()["queued"] != length:
+        assert time.monotonic() < deadline, "request never queued"
+        time.sleep(0.001)
+
+
+def test_queued_requests_are_admitted_in_order():
+    admission = controller()
+    slot = admission.acquire("a")
+    admitted = []
+    first = acquire_in_thread(admission, "b", admitted)
+    wait_for_queue(admission, 1)
+    second = acquire_in_thread(admission, "c", admitted)
+    wait_for_queue(admission, 2)
+
+    slot.release()
+    first.join(2)
+    second.join(2)
+    assert admitted == ["b", "c"]
+    assert admission.status()["active"] == 0
+
+
+def test_full_queue_is_rejected_straight_away():
+    admission = controller(max_queue=0)
+    admission.acquire("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admission.acquire("b")
+    assert excinfo.value.reason == "queue_full"
+    assert excinfo.value.retry_after >= 1
+
+
+def test_expected_wait_beyond_the_maximum_is_rejected():
+    admission = AdmissionController(1, 4, max_wait=1.0, per_client=0, initial_service_seconds=5.0)
+    admission.acquire("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admission.acquire("b")
+    assert excinfo.value.reason == "deadline"
+
+
+def test_queued_request_times_out():
+    admission = controller(max_wait=0.05)
+    admission.acquire("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admission.acquire("b")
+    assert excinfo.value.reason == "timeout"
+    assert admission.status()["queued"] == 0
+
+
+def test_per_client_limit():
+    admission = controller(max_concurrency=4, per_client=2)
+    admission.acquire("a")
+    admission.acquire("a")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admission.acquire("a")
+    assert excinfo.value.reason == "client_limit"
+    admission.acquire("b").release()
+
+
+def test_try_acquire_never_waits():
+    admission = controller(max_concurrency=2)
+    slot = admission.try_acquire("a")
+    assert slot is not None
+    assert admission.try_acquire("a") is not None
+    assert admission.try_acquire("a") is None
+    slot.release()
+    slot.release()
+    assert admission.status()["active"] == 1
+
+
+def test_rejection_is_a_429_with_retry_after(monkeypatch):
+    admission = controller(max_queue=0)
+    monkeypatch.setattr(endpoints, "get_admission_controller", lambda: admission)
+    slot, reply = endpoints.admit("a")
+    assert reply is None
+
+    _, reply = endpoints.admit("b")
+    assert reply.status == 429
+    assert int(reply.headers["Retry-After"]) >= 1
+    assert reply.payload["message"] == endpoints.BUSY_MESSAGE
+    slot.release()
+
+
+def test_a_batch_takes_only_the_free_slots(monkeypatch):
+    admission = controller(max_concurrency=3)
+    monkeypatch.setattr(endpoints, "get_admission_controller", lambda: admission)
+    held = admission.acquire("other")
+
+    slots, reply = endpoints.admit_batch("a", calls=8)
+    assert reply is None
+    assert len(slots) == 2
+    for slot in slots + [held]:
+        slot.release()
+
+
+def test_worker_threads_cover_running_queued_and_spare_requests(monkeypatch):
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENCY", "8")
+    monkeypatch.setenv("ADMISSION_MAX_QUEUE", "16")
+    monkeypatch.setenv("ADMISSION_SPARE_THREADS", "4")
+    assert worker_threads() == 28
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENCY", "0")
+    assert worker_threads() == 1
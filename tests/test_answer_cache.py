@@ -0,0 +1,17 @@
+from app import chatbot
+from app.answer_cache import answer_cache_key
+
+
+def test_questions_differing_only_in_case_and_spacing_share_a_key():
+    assert answer_cache_key("What are her skills?", "a") == answer_cache_key("  what are  HER skills ", "a")
+
+
+def test_candidates_get_separate_keys():
+    assert answer_cache_key("What are her skills?", "a") != answer_cache_key("What are her skills?", "b")
+    assert answer_cache_key("What are her skills?", None) != answer_cache_key("What are her skills?", "a")
+
+
+def test_a_new_prompt_version_gets_new_keys(monkeypatch):
+    before = answer_cache_key("What are her skills?", "a")
+    monkeypatch.setattr(chatbot, "PROMPT_VERSION", chatbot.PROMPT_VERSION + "-next")
+    assert answer_cache_key("What are her skills?", "a") != before
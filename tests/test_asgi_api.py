@@ -0,0 +1,22 @@
+import asyncio
+
+from app import asgi_api
+from app.metrics import end_request, stage, start_request
+
+
+def test_blocking_calls_record_stages_on_the_request():
+    def build_index():
+        with stage("index_build"):
+            return "built"
+
+    async def handle():
+        timings, token = start_request()
+        try:
+            result = await asgi_api._blocking(build_index)
+        finally:
+            end_request(token)
+        return result, timings
+
+    result, timings = asyncio.run(handle())
+    assert result == "built"
+    assert "index_build" in timings
@@ -0,0 +1,72 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.bm25 import BM25Retriever, tokenize
+
+TEXTS = [
+    "Built data pipelines in Python and SQL for the billing platform",
+    "Led a team of five data engineers",
+    "Python Python Python scripting for network automation",
+    "Designed dashboards in Power BI",
+    "Migrated SQL reporting to a cloud data warehouse with Python",
+    "Mentored junior engineers and ran code reviews",
+]
+
+
+def reference_bm25(texts, query, k1, b):
+    """Textbook BM25 with Lucene's idf, one document at a time"""
+    docs = [Counter(tokenize(text)) for text in texts]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_len = sum(lengths) / len(lengths)
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in tokenize(query):
+            tf = doc.get(term, 0)
+            if not tf:
+                continue
+            df = sum(term in other for other in docs)
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        scores.append(score)
+    return scores
+
+
+@pytest.mark.parametrize("query", [
+    "python",
+    "Python SQL data",
+    "data data engineers",
+    "kubernetes",
+])
+@pytest.mark.parametrize("k1, b", [(1.2, 0.75), (2.0, 0.0), (0.5, 1.0)])
+def test_scores_match_a_reference_implementation(query, k1, b):
+    retriever = BM25Retriever([Document(page_content=t) for t in TEXTS], k1=k1, b=b)
+    expected = reference_bm25(TEXTS, query, k1, b)
+
+    ids, scores = retriever.search_batch([query], k=len(TEXTS))[0]
+    got = np.zeros(len(TEXTS))
+    got[ids] = scores
+    np.testing.assert_allclose(got, expected, rtol=1e-5)
+    # Only documents sharing a term with the query are returned
+    assert set(ids.tolist()) == {i for i, score in enumerate(expected) if score > 0}
+
+
+def test_rows_restrict_the_search():
+    retriever = BM25Retriever([Document(page_content=t) for t in TEXTS])
+    ids, _ = retriever.search_batch(["python"], k=10, rows=np.array([2, 3]))[0]
+    assert ids.tolist() == [2]
+
+
+def test_company_label_outranks_a_mention_in_a_bullet():
+    documents = [
+        Document(page_content="[Work experience | Omantel] Data engineer",
+                 metadata={"company": "Omantel", "field": "role"}),
+        Document(page_content="[Work experience | Ooredoo] Benchmarked Omantel tariffs",
+                 metadata={"company": "Ooredoo", "field": "responsibilities"}),
+    ]
+    ids, _ = BM25Retriever(documents).search_batch(["Omantel"], k=2)[0]
+    assert ids.tolist() == [0, 1]
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from app import chatbot
+from app.cv_data import cv_data_fingerprint
+
+CV = {"name": "A", "top_skills": ["Python", "SQL"], "summary": "Data engineer."}
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    corpus_dir = tmp_path / "cvs"
+    corpus_dir.mkdir()
+    for candidate_id in ("a", "b"):
+        (corpus_dir / f"{candidate_id}.json").write_text(json.dumps(CV))
+    monkeypatch.setenv("CV_CORPUS_DIR", str(corpus_dir))
+    monkeypatch.setenv("INDEX_SNAPSHOTS", "off")
+    monkeypatch.setenv("RETRIEVER_MODE", "tfidf")
+    monkeypatch.setattr(chatbot, "_vector_store", None)
+    monkeypatch.setattr(chatbot, "_failed_reload_fingerprint", None)
+    return corpus_dir
+
+
+def test_startup_skips_a_cv_that_fails_to_parse(corpus):
+    (corpus / "b.json").write_text('{"name": ')
+    vector_store = chatbot._get_or_create_vector_store("key")
+    assert sorted(vector_store["candidates"]) == ["a"]
+
+
+def test_reload_keeps_the_index_while_a_cv_fails_to_parse(corpus):
+    vector_store = chatbot._get_or_create_vector_store("key")
+    (corpus / "b.json").write_text('{"name": ')
+
+    chatbot._reload_vector_store(vector_store, cv_data_fingerprint())
+    assert chatbot._vector_store is vector_store
+    assert chatbot._failed_reload_fingerprint == cv_data_fingerprint()
+
+    (corpus / "b.json").write_text(json.dumps({**CV, "summary": "Data scientist."}))
+    chatbot._reload_vector_store(vector_store, cv_data_fingerprint())
+    assert chatbot._vector_store is not vector_store
+    assert sorted(chatbot._vector_store["candidates"]) == ["a", "b"]
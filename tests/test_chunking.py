@@ -0,0 +1,69 @@
+import pytest
+
+from app.chunking import NeighborIndex, chunk_cv
+
+CV = {
+    "summary": "Data engineer. Builds pipelines.",
+    "top_skills": ["Python", "SQL"],
+    "experience": [
+        {
+            "company": "Omantel",
+            "position": "Data Engineer",
+            "dates": {"start": "May 2023", "end": "Present"},
+            "responsibilities": ["Built billing pipelines", "Led code reviews", "Led  CODE reviews"],
+            "skills": ["Python", "Airflow"],
+        },
+        {
+            "company": "tipl.io",
+            "position": "Engineer",
+            "dates": {"start": "Nov 2020", "end": "Oct 2022"},
+            "responsibilities": ["Led code reviews"],
+        },
+    ],
+}
+
+
+@pytest.fixture
+def documents():
+    return chunk_cv(CV)
+
+
+def experience(documents, company):
+    return [d for d in documents if d.metadata.get("company") == company]
+
+
+def test_jobs_become_a_header_and_one_chunk_per_bullet(documents):
+    omantel = experience(documents, "Omantel")
+    assert [d.metadata["field"] for d in omantel] == ["role", "responsibilities", "responsibilities", "skills"]
+    assert omantel[0].page_content == "[Work experience | Omantel] Data Engineer, May 2023 to Present. Current job."
+    assert omantel[0].metadata["is_current"] is True
+    assert [d.metadata["position"] for d in omantel] == [0, 1, 2, 3]
+    assert {d.metadata["parent_id"] for d in omantel} == {"experience/0"}
+
+
+def test_short_lists_stay_together(documents):
+    skills = [d for d in documents if d.metadata["section"] == "top_skills"]
+    assert [d.page_content for d in skills] == ["[Top skills] Python, SQL"]
+
+
+def test_repeated_text_is_dropped_only_within_a_parent(documents):
+    reviews = [d for d in documents if d.page_content.lower().endswith("code reviews")]
+    assert [d.metadata["company"] for d in reviews] == ["Omantel", "tipl.io"]
+
+
+def test_neighbours_stay_under_the_same_parent(documents):
+    neighbors = NeighborIndex(documents)
+    omantel = [i for i, d in enumerate(documents) if d.metadata.get("company") == "Omantel"]
+    tipl = [i for i, d in enumerate(documents) if d.metadata.get("company") == "tipl.io"]
+
+    # The last Omantel chunk only has a neighbour before it
+    assert neighbors.expand([omantel[-1]], 1) == omantel[-2:]
+    assert neighbors.expand([tipl[0]], 1) == tipl[:2]
+    assert neighbors.expand([omantel[1]], 0) == [omantel[1]]
+
+
+def test_expanded_hits_keep_rank_order_without_repeats(documents):
+    neighbors = NeighborIndex(documents)
+    omantel = [i for i, d in enumerate(documents) if d.metadata.get("company") == "Omantel"]
+    expanded = neighbors.expand([omantel[2], omantel[1]], 1)
+    assert expanded == [omantel[1], omantel[2], omantel[3], omantel[0]]
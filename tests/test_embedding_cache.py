@@ -0,0 +1,60 @@
+import numpy as np
+
+from app import embedding_cache
+from app.embedding_cache import QueryEmbeddingCache, get_query_cache
+
+
+def test_repeated_questions_skip_the_model(encoder):
+    cache = QueryEmbeddingCache("test-encoder", max_entries=8)
+    first = cache.encode(encoder, ["What are her skills?", "Where does she work?"])
+    # Case, spacing and trailing punctuation variants, and a repeat within one batch
+    second = cache.encode(encoder, ["what are her  skills", "Where does she work?", "What are her skills"])
+
+    assert encoder.encoded == [["what are her skills", "where does she work"]]
+    np.testing.assert_array_equal(second, first[[0, 1, 0]])
+    assert cache.stats()["hits"] == 3
+
+
+def test_misses_in_a_batch_are_encoded_together(encoder):
+    cache = QueryEmbeddingCache("test-encoder", max_entries=8)
+    cache.encode(encoder, ["a question"])
+    cache.encode(encoder, ["a question", "another one", "a third", "another one"])
+    assert encoder.encoded[-1] == ["another one", "a third"]
+
+
+def test_least_recently_used_entries_are_evicted(encoder):
+    cache = QueryEmbeddingCache("test-encoder", max_entries=2)
+    cache.encode(encoder, ["one"])
+    cache.encode(encoder, ["two"])
+    cache.encode(encoder, ["one"])
+    cache.encode(encoder, ["three"])
+    encoder.encoded.clear()
+
+    cache.encode(encoder, ["one", "two"])
+    assert encoder.encoded == [["two"]]
+
+
+def test_persisted_cache_is_reloaded_for_the_same_model_only(encoder, tmp_path):
+    path = str(tmp_path / "query_embeddings.npz")
+    cache = QueryEmbeddingCache("test-encoder", max_entries=8, path=path)
+    expected = cache.encode(encoder, ["What are her skills?"])
+    cache.save()
+
+    reloaded = QueryEmbeddingCache("test-encoder", max_entries=8, path=path)
+    encoder.encoded.clear()
+    np.testing.assert_array_equal(reloaded.encode(encoder, ["What are her skills?"]), expected)
+    assert encoder.encoded == []
+
+    assert QueryEmbeddingCache("other-model", max_entries=8, path=path).stats()["entries"] == 0
+
+
+def test_changing_the_model_replaces_the_cache(monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_query_cache", None)
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_SIZE", "16")
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_PERSIST", "off")
+    first = get_query_cache("model-a")
+    assert get_query_cache("model-a") is first
+    assert get_query_cache("model-b") is not first
+
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_SIZE", "0")
+    assert get_query_cache("model-c") is None
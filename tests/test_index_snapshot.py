@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from app import retrieval
+from app.chatbot import current_snapshot_key
+from app.index_snapshot import load_snapshot, save_snapshot
+from app.retrieval import HybridRetriever
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    corpus_dir = tmp_path / "cvs"
+    corpus_dir.mkdir()
+    (corpus_dir / "a.json").write_text(json.dumps({"name": "A", "skills": ["Python"]}))
+    monkeypatch.setenv("CV_CORPUS_DIR", str(corpus_dir))
+    monkeypatch.setenv("INDEX_SNAPSHOT_DIR", str(tmp_path / "index"))
+    monkeypatch.setenv("RETRIEVER_MODE", "hybrid")
+    monkeypatch.delenv("CHUNKER_MODE", raising=False)
+    monkeypatch.delenv("SEMANTIC_MODEL_NAME", raising=False)
+    return corpus_dir
+
+
+def test_editing_a_cv_changes_the_key(corpus):
+    before = current_snapshot_key()
+    (corpus / "a.json").write_text(json.dumps({"name": "A", "skills": ["Python", "SQL"]}))
+    assert current_snapshot_key() != before
+
+
+def test_adding_a_cv_changes_the_key(corpus):
+    before = current_snapshot_key()
+    (corpus / "b.json").write_text(json.dumps({"name": "B"}))
+    assert current_snapshot_key() != before
+
+
+@pytest.mark.parametrize("name, value", [
+    ("CHUNKER_MODE", "legacy"),
+    ("RETRIEVER_MODE", "hybrid-bm25"),
+    ("RETRIEVER_MODE", "tfidf"),
+    ("SEMANTIC_MODEL_NAME", "sentence-transformers/all-mpnet-base-v2"),
+])
+def test_index_settings_change_the_key(corpus, monkeypatch, name, value):
+    before = current_snapshot_key()
+    monkeypatch.setenv(name, value)
+    assert current_snapshot_key() != before
+
+
+def test_chunker_version_changes_the_key(corpus, monkeypatch):
+    from app import chatbot
+
+    before = current_snapshot_key()
+    monkeypatch.setattr(chatbot, "chunker_version", lambda: "0-fine")
+    assert current_snapshot_key() != before
+
+
+def test_snapshot_with_other_documents_or_retriever_is_not_loaded(corpus):
+    documents = [Document(page_content=text, metadata={"parent_id": "skills"})
+                 for text in ("Python and SQL", "Led a data team")]
+    assert save_snapshot("key", HybridRetriever(documents)) is not None
+
+    assert load_snapshot("key", documents, None) is not None
+    edited = [documents[0], Document(page_content="Led a data team of five", metadata={"parent_id": "skills"})]
+    assert load_snapshot("key", edited, None) is None
+    assert load_snapshot("key", documents, None, sparse_retriever="bm25") is None
+    assert load_snapshot("other-key", documents, None) is None
+
+
+def test_no_snapshot_is_saved_when_the_model_fails_to_load(corpus, encoder, monkeypatch, tmp_path):
+    monkeypatch.setenv("SEMANTIC_MODEL_NAME", "test-encoder")
+    monkeypatch.setenv("EMBEDDING_DTYPE", "float32")
+    documents = [Document(page_content=text) for text in ("Python and SQL", "Led a data team")]
+    load_model = retrieval.get_sentence_model
+
+    def offline(model_name):
+        raise OSError("no network")
+
+    monkeypatch.setattr(retrieval, "get_sentence_model", offline)
+    assert retrieval.build_retriever(documents, snapshot_key="key").semantic is None
+    assert not (tmp_path / "index" / "key").exists()
+
+    monkeypatch.setattr(retrieval, "get_sentence_model", load_model)
+    assert retrieval.build_retriever(documents, snapshot_key="key").semantic is not None
+    assert load_snapshot("key", documents, "test-encoder") is not None
+
+
+def test_snapshot_without_embeddings_is_replaced(corpus, encoder, tmp_path):
+    documents = [Document(page_content=text) for text in ("Python and SQL", "Led a data team")]
+    # As written by an earlier version after the model failed to load
+    save_snapshot("key", HybridRetriever(documents))
+    assert load_snapshot("key", documents, "test-encoder") is None
+
+    save_snapshot("key", HybridRetriever(documents, semantic_model_name="test-encoder"))
+    manifest = json.loads((tmp_path / "index" / "key" / "manifest.json").read_text())
+    assert manifest["semantic_model_name"] == "test-encoder"
+    assert load_snapshot("key", documents, "test-encoder") is not None
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from app.chatbot import _candidate_facts
+from app.intents import IntentRouter, get_intent_router, skills
+
+CV_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "cv.json")
+
+
+@pytest.fixture(scope="module")
+def facts():
+    with open(CV_PATH, encoding="utf-8") as f:
+        return _candidate_facts("default", json.load(f))
+
+
+@pytest.fixture
+def router():
+    return IntentRouter("keywords", 0.8)
+
+
+def intent(router, facts, question):
+    answer = router.answer(question, facts)
+    return answer.intent if answer is not None else None
+
+
+def test_off_by_default(monkeypatch):
+    monkeypatch.delenv("INTENT_ROUTER", raising=False)
+    assert get_intent_router() is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("How many years of experience does she have?", "total_experience"),
+    ("What is her total work experience?", "total_experience"),
+    ("How long has she been working?", "total_experience"),
+    ("Where does she work now?", "current_job"),
+    ("What is her current job?", "current_job"),
+    ("Is she currently employed?", "current_job"),
+    ("What's her email?", "contact"),
+    ("What languages does she speak?", "languages"),
+    ("Does she speak German?", "languages"),
+    ("Does she speak French?", "languages"),
+])
+def test_structured_questions_get_templates(router, facts, question, expected):
+    assert intent(router, facts, question) == expected
+
+
+@pytest.mark.parametrize("question", [
+    # A skill, tool or role: experience with one thing, not the total
+    "How many years of Python experience does she have?",
+    "How much experience does she have with machine learning?",
+    "How many years of React experience?",
+    "How long has she been working as a data scientist?",
+    "How many years has she used SQL?",
+    "How many years of OpenShift Deployment and Management?",
+    "How many years at Omantel?",
+    "How many years did she study?",
+    # Not a language
+    "Can she speak to clients?",
+    "Does she speak Python?",
+    # Not "where does she work"
+    "Is she working remotely?",
+    "Is she working on her PhD?",
+    "Is she currently working as an engineer?",
+    "What are her current responsibilities?",
+    # Compound
+    "How many years of experience does she have and what are her skills?",
+])
+def test_other_questions_go_to_the_llm(router, facts, question):
+    assert router.answer(question, facts) is None
+
+
+def test_unlisted_language_is_answered_as_such(router, facts):
+    answer = router.answer("Does she speak French?", facts)
+    assert answer.text.startswith("French isn't listed")
+
+
+def test_skills_come_from_skill_sections_and_jobs():
+    cv = {
+        "top_skills": ["Machine Learning", "R"],
+        "coding_languages": ["React/JavaScript for front end"],
+        "experience": [{"skills": ["SQL for Data Analysis"]}],
+    }
+    assert skills(cv) == ("javascript", "machine learning", "react", "sql")
@@ -0,0 +1,93 @@
+import pytest
+
+from app import llm_client
+from app.llm_client import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_client.time, "monotonic", clock)
+    return clock
+
+
+def trip(breaker, failures=3):
+    for _ in range(failures):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+    trip(breaker, 2)
+    assert breaker.status()["state"] == "closed"
+    trip(breaker, 1)
+    assert breaker.status()["state"] == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.retry_after() == pytest.approx(30)
+
+
+def test_a_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+    trip(breaker, 2)
+    breaker.record_success()
+    trip(breaker, 2)
+    assert breaker.status()["state"] == "closed"
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.status()["state"] == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_a_successful_probe_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.status() == {
+        "state": "closed", "consecutive_failures": 0, "retry_after_seconds": None,
+    }
+    breaker.before_call()
+
+
+def test_a_failed_probe_reopens_for_a_full_cooldown(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.status()["state"] == "open"
+    assert breaker.retry_after() == pytest.approx(30)
+
+
+def test_an_unrelated_error_frees_the_probe_without_closing(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=30)
+    trip(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_other()
+    assert breaker.status()["state"] == "half_open"
+    breaker.before_call()
+
+
+def test_a_zero_threshold_disables_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=0, cooldown_seconds=30)
+    trip(breaker, 10)
+    breaker.before_call()
+    assert breaker.status()["state"] == "disabled"
@@ -0,0 +1,65 @@
+import time
+
+from langchain_core.documents import Document
+
+from app.rerank import RERANK_FALLBACKS, CrossEncoderReranker, get_reranker, register_cross_encoder
+
+DOCUMENTS = [Document(page_content=text) for text in (
+    "Led a team of data engineers",
+    "Python and SQL",
+    "Built Python data pipelines",
+    "Power BI dashboards",
+)]
+
+
+class Scorer:
+    """Cross-encoder stand-in: shared words with the question, after an optional delay"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False, **kwargs):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        self.pairs += len(pairs)
+        return [len(set(q.split()) & set(text.lower().split())) for q, text in pairs]
+
+
+def reranker(scorer, budget_seconds=1.0, name="test-scorer"):
+    register_cross_encoder(name, scorer)
+    return CrossEncoderReranker(name, top_n=2, budget_seconds=budget_seconds, batch_size=2)
+
+
+def test_keeps_the_best_top_n_and_caches_scores():
+    scorer = Scorer()
+    rerank = reranker(scorer)
+    assert rerank.rerank(["built python sql pipelines"], [[0, 1, 2, 3]], DOCUMENTS) == [[2, 1]]
+    assert scorer.pairs == 4
+
+    assert rerank.rerank(["Built Python SQL pipelines?"], [[0, 1, 2, 3]], DOCUMENTS) == [[2, 1]]
+    assert scorer.pairs == 4
+
+
+def test_missing_the_budget_keeps_the_fused_order():
+    before = RERANK_FALLBACKS.value("timeout")
+    rerank = reranker(Scorer(delay=0.5), budget_seconds=0.05, name="slow-scorer")
+
+    started = time.monotonic()
+    assert rerank.rerank(["python"], [[3, 0, 1, 2]], DOCUMENTS) == [[3, 0, 1, 2]]
+    assert time.monotonic() - started < 0.3
+    assert RERANK_FALLBACKS.value("timeout") == before + 1
+
+
+def test_a_failing_model_keeps_the_fused_order():
+    before = RERANK_FALLBACKS.value("error")
+    rerank = reranker(Scorer(fail=True), name="failing-scorer")
+    assert rerank.rerank(["python"], [[3, 0, 1, 2]], DOCUMENTS) == [[3, 0, 1, 2]]
+    assert RERANK_FALLBACKS.value("error") == before + 1
+
+
+def test_off_by_default(monkeypatch):
+    monkeypatch.delenv("RERANKER", raising=False)
+    assert get_reranker() is None
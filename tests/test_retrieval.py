@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from app.retrieval import reciprocal_rank_fusion
+from app.vector_index import top_k_rows
+
+
+def brute_force_rrf(ranked, weights, k, rrf_k=60):
+    """Dict-based fusion: ties go to the document that appeared first"""
+    scores, first_seen, position = {}, {}, 0
+    for rows, weight in zip(ranked, weights):
+        for rank, doc_id in enumerate(rows, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (rrf_k + rank)
+            first_seen.setdefault(doc_id, position)
+            position += 1
+    order = sorted(scores, key=lambda doc_id: (-scores[doc_id], first_seen[doc_id]))[:k]
+    return order, [scores[doc_id] for doc_id in order]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_reciprocal_rank_fusion_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    ranked = [rng.permutation(50)[:rng.integers(0, 20)] for _ in range(rng.integers(1, 4))]
+    weights = rng.choice([0.5, 1.0, 2.0], size=len(ranked)).tolist()
+    k = int(rng.integers(1, 30))
+
+    ids, scores = reciprocal_rank_fusion(ranked, weights, k)
+    expected_ids, expected_scores = brute_force_rrf([r.tolist() for r in ranked], weights, k)
+    assert ids.tolist() == expected_ids
+    np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_reciprocal_rank_fusion_ties_keep_first_appearance():
+    # Each document is first in one list and second in the other
+    ids, _ = reciprocal_rank_fusion([np.array([7, 3]), np.array([3, 7])], [1.0, 1.0], 2)
+    assert ids.tolist() == [7, 3]
+
+
+def test_reciprocal_rank_fusion_of_nothing_is_empty():
+    ids, scores = reciprocal_rank_fusion([np.array([], dtype=np.int64)], [1.0], 5)
+    assert ids.size == 0 and scores.size == 0
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 49, 50, 80])
+def test_top_k_rows_matches_a_full_sort(k):
+    scores = np.random.default_rng(k).standard_normal((6, 50)).astype(np.float32)
+    expected = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    np.testing.assert_array_equal(top_k_rows(scores, k), expected)
@@ -0,0 +1,48 @@
+import pytest
+
+from app.sessions import is_follow_up, new_session, refers_back
+
+
+@pytest.fixture
+def session():
+    session = new_session(None, "index")
+    session["turns"] = [{"question": "Tell me about her job at Omantel", "answer": "She is a data engineer."}]
+    session["topic"] = "Tell me about her job at Omantel"
+    session["rows"] = [3, 4, 5]
+    return session
+
+
+@pytest.mark.parametrize("question", [
+    "Where was that?",
+    "What did she do there?",
+    "Tell me more about that",
+    "Why?",
+])
+def test_questions_that_only_refer_back_are_follow_ups(session, question):
+    assert is_follow_up(session, question)
+
+
+@pytest.mark.parametrize("question", [
+    "What is their education?",
+    "What are their skills?",
+    "Does this candidate know Docker?",
+    "Why did she leave Omantel for a new role?",
+])
+def test_new_topics_are_not_follow_ups(session, question):
+    assert not is_follow_up(session, question)
+    assert not refers_back(session, question)
+
+
+def test_referring_back_to_a_new_subject_is_not_a_pure_follow_up(session):
+    question = "Which tools did she use there?"
+    assert refers_back(session, question)
+    assert not is_follow_up(session, question)
+
+
+def test_no_follow_ups_without_history_or_chunks(session):
+    assert not is_follow_up(None, "Where was that?")
+    session["rows"] = []
+    assert not is_follow_up(session, "Where was that?")
+    session["rows"] = [3]
+    session["turns"] = []
+    assert not is_follow_up(session, "Where was that?")
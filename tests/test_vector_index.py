@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.retrieval import SentenceTransformerRetriever
+from app.vector_index import ExactIndex, IVFIndex, QuantizedMatrix, build_vector_index, memory_map
+
+
+def normalized(rows, dim=32, seed=0):
+    vecs = np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def doc_vecs():
+    return normalized(2000)
+
+
+@pytest.fixture
+def q_vecs():
+    return normalized(10, seed=1)
+
+
+def brute_force(doc_vecs, q_vecs, k, rows=None):
+    allowed = np.arange(len(doc_vecs)) if rows is None else rows
+    sims = q_vecs @ doc_vecs[allowed].T
+    return [allowed[np.argsort(-row)[:k]] for row in sims]
+
+
+def test_exact_index_matches_brute_force(doc_vecs, q_vecs):
+    rows = np.arange(0, 2000, 7)
+    for rows_arg in (None, rows):
+        hits = ExactIndex(doc_vecs).search(q_vecs, 10, rows_arg)
+        for (ids, scores), expected, q_vec in zip(hits, brute_force(doc_vecs, q_vecs, 10, rows_arg), q_vecs):
+            np.testing.assert_array_equal(ids, expected)
+            np.testing.assert_allclose(scores, doc_vecs[ids] @ q_vec, rtol=1e-5)
+
+
+def test_ivf_probing_every_list_is_exact(doc_vecs, q_vecs):
+    index = IVFIndex(doc_vecs, nlist=16, nprobe=16)
+    for (ids, _), expected in zip(index.search(q_vecs, 10), brute_force(doc_vecs, q_vecs, 10)):
+        np.testing.assert_array_equal(ids, expected)
+
+
+def test_ivf_finds_near_duplicates_with_few_probes(doc_vecs):
+    index = IVFIndex(doc_vecs, nlist=32, nprobe=2)
+    noise = normalized(20, seed=2) * 0.05
+    queries = doc_vecs[:20] + noise
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    found = [i in ids for i, (ids, _) in enumerate(index.search(queries, 5))]
+    assert all(found)
+
+
+def test_ivf_returns_only_allowed_rows(doc_vecs, q_vecs):
+    index = IVFIndex(doc_vecs, nlist=16, nprobe=4)
+    # Few rows: scored exactly; many rows: filtered from the probed lists
+    for rows in (np.arange(0, 2000, 100), np.arange(0, 1500)):
+        for ids, _ in index.search(q_vecs, 10, rows):
+            assert len(ids) == 10
+            assert set(ids.tolist()) <= set(rows.tolist())
+
+
+def test_small_corpora_and_unknown_kinds_get_the_exact_index(monkeypatch):
+    monkeypatch.setenv("VECTOR_INDEX", "ivf")
+    monkeypatch.setenv("EMBEDDING_DTYPE", "float32")
+    assert isinstance(build_vector_index(normalized(10)), ExactIndex)
+    assert isinstance(build_vector_index(normalized(2000)), IVFIndex)
+    monkeypatch.setenv("VECTOR_INDEX", "hnsw")
+    assert isinstance(build_vector_index(normalized(2000)), ExactIndex)
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_quantized_rows_round_trip(doc_vecs, dtype, tolerance):
+    stored = QuantizedMatrix.from_float32(doc_vecs, dtype)
+    assert stored.dtype == dtype
+    assert stored.nbytes < doc_vecs.nbytes
+    np.testing.assert_allclose(stored.to_float32(), doc_vecs, atol=tolerance)
+    np.testing.assert_allclose(stored.norms(), 1.0, atol=tolerance * 10)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+@pytest.mark.parametrize("kind", ["exact", "ivf"])
+def test_quantized_search_is_rescored_in_float32(doc_vecs, q_vecs, dtype, kind):
+    if kind == "exact":
+        index = ExactIndex(doc_vecs, dtype=dtype)
+    else:
+        index = IVFIndex(doc_vecs, nlist=16, nprobe=16, dtype=dtype)
+    for (ids, scores), expected, q_vec in zip(index.search(q_vecs, 10), brute_force(doc_vecs, q_vecs, 10), q_vecs):
+        np.testing.assert_array_equal(ids, expected)
+        # Exact float32 scores, not the quantized approximations
+        np.testing.assert_allclose(scores, doc_vecs[ids] @ q_vec, rtol=1e-6)
+
+
+def test_rescoring_vectors_are_memory_mapped_from_the_cache_dir(doc_vecs, q_vecs, tmp_path, monkeypatch):
+    monkeypatch.setenv("CV_AGENT_CACHE_DIR", str(tmp_path))
+    mapped = memory_map(doc_vecs)
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(mapped, doc_vecs)
+    # Unlinked straight away; the mapping keeps the data alive
+    assert list((tmp_path / "vectors").iterdir()) == []
+    assert memory_map(mapped) is mapped
+
+    hits = ExactIndex(mapped, dtype="int8").search(q_vecs, 10)
+    for (ids, _), expected in zip(hits, brute_force(doc_vecs, q_vecs, 10)):
+        np.testing.assert_array_equal(ids, expected)
+
+
+def test_quantized_retriever_rescores_from_a_memory_map(encoder, tmp_path, monkeypatch):
+    monkeypatch.setenv("CV_AGENT_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("EMBEDDING_DTYPE", "int8")
+    documents = [Document(page_content=text) for text in ("Python pipelines", "Power BI dashboards", "SQL")]
+    retriever = SentenceTransformerRetriever(documents, "test-encoder")
+    assert isinstance(retriever.doc_vecs, np.memmap)
+    ids, _ = retriever.search_batch(["dashboards in Power BI"], 1)[0]
+    assert ids.tolist() == [1]
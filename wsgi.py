@@ -1,4 +1,13 @@
+import os
+
 from app.api import app
+from app.chatbot import import_llm_client_in_background, warm_up
+
+# Build the index at import time. Under gunicorn with preload_app (see
+# gunicorn.conf.py) this runs once in the master, before workers are forked.
+if os.getenv("WARM_UP_ON_START", "on").strip().lower() not in ("0", "off", "false", "no"):
+    warm_up()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8080)
\ No newline at end of file
+    import_llm_client_in_background()
+    app.run(host="0.0.0.0", port=8080)